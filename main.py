@@ -22,10 +22,14 @@ import logging
 import traceback
 import getpass
 import io
+import bisect
+import gzip
+import math
+import hashlib
 from typing import Union
 from telegram.constants import ParseMode
 from urllib.parse import urlparse
-from collections import deque
+from collections import deque, OrderedDict
 from datetime import datetime, timezone, timedelta
 
 import tzlocal # Assuming tzlocal is now a requirement
@@ -226,6 +230,7 @@ from telegram.ext import Application, CallbackQueryHandler
 from telegram import Update
 import telegram
 from telegram.ext import ApplicationBuilder, MessageHandler, filters, CommandHandler, ContextTypes
+import httpx # Async HTTP client (also used by python-telegram-bot)
 from dotenv import load_dotenv
 import functools
 
@@ -293,7 +298,6 @@ except (FileNotFoundError, json.JSONDecodeError):
     with open(KEYWORDS_FILE, 'w') as f:
         json.dump(KEYWORDS, f)
 
-TOKEN_PATTERN = r"(?<![/\"'=&?])(?:\b[A-Za-z0-9]{32,}\b)(?![/\"'&?])"
 AUTH_CODE = None
 WAITING_FOR_AUTH = False
 
@@ -486,8 +490,21 @@ is_backup_running = False
 cancel_backup_flag = False
 is_sync_running = False
 cancel_sync_flag = False
-PROCESSED_TWEETS_MAXLEN = 200 # Choose a suitable size
-processed_tweets = deque(maxlen=PROCESSED_TWEETS_MAXLEN)
+# Processed post IDs: ring (deque, insertion order) + set (O(1) membership), persisted across restarts.
+# New IDs are appended to a small log (one line each); the JSON snapshot is only rewritten
+# (and the log emptied) every PROCESSED_TWEETS_COMPACT_EVERY IDs and at exit.
+PROCESSED_TWEETS_FILE = "processed_tweets.json"
+PROCESSED_TWEETS_LOG_FILE = "processed_tweets.log"
+PROCESSED_TWEETS_MAXLEN = 50000 # IDs kept for de-duplication, oldest are evicted first
+PROCESSED_TWEETS_COMPACT_EVERY = 5000 # Logged IDs before the snapshot is rewritten
+processed_tweets = deque()
+processed_tweet_ids = set()
+processed_tweets_unsaved = 0 # IDs only in the log, not in the snapshot yet
+processed_tweets_log = None # Append handle for PROCESSED_TWEETS_LOG_FILE
+# Newest seen post per account (Following timeline is chronological), persisted
+WATERMARKS_FILE = "timeline_watermarks.json"
+timeline_watermarks = {} # {"account": {"tweet_id": "...", "time": "ISO UTC"}}
+timeline_watermarks_dirty = False
 current_account = 0
 driver = None
 application = None
@@ -506,6 +523,100 @@ first_run = True
 search_keywords_enabled = True # Default: Enabled
 search_ca_enabled = True       # Default: Enabled
 search_tickers_enabled = True  # Default: Enabled (existing)
+# Keyword matching options
+keyword_whole_words = False # True: keyword must not be glued to letters/digits ("sol" won't hit "solid")
+keyword_case_fold = True    # True: case-insensitive (Unicode casefold)
+
+# ===> Keyword Matcher <===
+# All keywords are compiled into one Aho-Corasick automaton so a post is scanned once,
+# independent of the number of keywords. Rebuilt whenever the keyword list
+# or the matching options change (save_keywords / /keywordmode / startup).
+keyword_automaton = None
+
+
+def build_keyword_automaton(keywords, case_fold=True):
+    """
+    Builds the goto/fail/output tables for the given keywords.
+    Returns a dict with "goto" (list of {char: state}), "fail" (list of state)
+    and "out" (list of keyword lists ending in that state).
+    """
+    goto = [{}]
+    out = [[]]
+    for keyword in keywords:
+        pattern = keyword.casefold() if case_fold else keyword
+        if not pattern:
+            continue
+        state = 0
+        for char in pattern:
+            next_state = goto[state].get(char)
+            if next_state is None:
+                next_state = len(goto)
+                goto[state][char] = next_state
+                goto.append({})
+                out.append([])
+            state = next_state
+        if keyword not in out[state]:
+            out[state].append(keyword)
+
+    # Breadth-first pass for failure links; outputs of the fail state are inherited
+    fail = [0] * len(goto)
+    queue = deque(goto[0].values())
+    while queue:
+        state = queue.popleft()
+        for char, next_state in goto[state].items():
+            queue.append(next_state)
+            fallback = fail[state]
+            while fallback and char not in goto[fallback]:
+                fallback = fail[fallback]
+            fail[next_state] = goto[fallback].get(char, 0)
+            out[next_state] = out[next_state] + out[fail[next_state]]
+    return {"goto": goto, "fail": fail, "out": out, "case_fold": case_fold,
+            "lengths": {kw: len(kw.casefold() if case_fold else kw) for kw in keywords if kw}}
+
+
+def rebuild_keyword_matcher():
+    """Recompiles the automaton from the current KEYWORDS and options."""
+    global keyword_automaton
+    keyword_automaton = build_keyword_automaton(KEYWORDS, keyword_case_fold)
+
+
+def _is_word_char(char):
+    return char.isalnum() or char == "_"
+
+
+def find_keyword_matches(text, automaton=None, whole_words=None):
+    """
+    Scans text once and returns [(keyword, start, end), ...] in order of
+    appearance; start/end are indices into the original text.
+    """
+    automaton = automaton or keyword_automaton
+    if whole_words is None:
+        whole_words = keyword_whole_words
+    if not automaton or not text:
+        return []
+    goto, fail, out, lengths = automaton["goto"], automaton["fail"], automaton["out"], automaton["lengths"]
+    case_fold = automaton["case_fold"]
+
+    matches = []
+    origin = [] # Original text index of every fed (possibly casefold-expanded) char
+    state = 0
+    for index, original_char in enumerate(text):
+        for char in (original_char.casefold() if case_fold else original_char):
+            origin.append(index)
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for keyword in out[state]:
+                start = origin[len(origin) - lengths[keyword]]
+                end = index + 1
+                if whole_words and ((start > 0 and _is_word_char(text[start - 1])) or (end < len(text) and _is_word_char(text[end]))):
+                    continue
+                matches.append((keyword, start, end))
+    return matches
+
+
+rebuild_keyword_matcher()
+# ===> END Keyword Matcher <===
 
 # Maximum post age in minutes to be considered recent
 max_tweet_age_minutes = 15 # Default value
@@ -513,6 +624,15 @@ max_tweet_age_minutes = 15 # Default value
 # Headless mode: True to run Chrome without GUI
 is_headless_enabled = False # Default: Disabled
 
+# Scan mode: how new posts are picked up from the timeline
+# "dom"      = "Show N posts" button + scrolling, batched extraction per scroll step
+# "observer" = in-page MutationObserver buffers new posts, drained every loop (falls back to "dom")
+# "network"  = HomeLatestTimeline JSON read from Chrome's network log (needs driver restart, falls back to "dom")
+# "snapshot" = like "dom", but each scroll step parses driver.page_source with BeautifulSoup in a worker thread
+SCAN_MODES = ("dom", "observer", "network", "snapshot")
+PUSH_SCAN_MODES = ("observer", "network") # Modes that get new posts pushed instead of scrolling for them
+scan_mode = "dom" # Default; the other modes are opt-in via /scanmode
+
 # Cloudflare Check Globals
 WAITING_FOR_CLOUDFLARE_CONFIRMATION = False
 CLOUDFLARE_ACCOUNT_INDEX = None
@@ -666,7 +786,11 @@ action_queue = asyncio.Queue()
 
 # ===>  Rating System <===
 RATINGS_FILE = "ratings.json"
+RATINGS_SAVE_DELAY = 30 # Seconds; ratings.json is a write-behind snapshot
 ratings_data = {} # Loaded on startup
+rating_index = {} # handle -> {"sum", "count", "avg"}, kept up to date by record_rating()
+rating_ranking = [] # Sorted (-avg, -count, handle) for top-N and threshold queries
+ratings_save_task = None # Pending write-behind save
 # ===> END Rating System <===
 
 # ===> Button Toggles <===
@@ -710,6 +834,9 @@ def load_settings():
     global max_tweet_age_minutes
     global like_repost_buttons_enabled, rating_buttons_enabled # Added
     global show_posts_from_unrated_enabled, min_average_rating_for_posts # Added for rating filters
+    global scan_mode
+    global keyword_whole_words, keyword_case_fold
+    global digest_mode_enabled, digest_window_seconds, digest_group_by
 
     # --- Define default values ---
     default_scraping_paused = True
@@ -724,6 +851,12 @@ def load_settings():
     default_rating_buttons_enabled = True
     default_show_unrated_enabled = True
     default_min_avg_rating = 0.0
+    default_scan_mode = "dom"
+    default_keyword_whole_words = False
+    default_keyword_case_fold = True
+    default_digest_mode_enabled = False
+    default_digest_window_seconds = 60
+    default_digest_group_by = "ca"
 
     try:
         if os.path.exists(SETTINGS_FILE):
@@ -758,6 +891,23 @@ def load_settings():
                 else:
                     print(f"WARNING: Invalid min_average_rating_for_posts ('{loaded_min_avg_rating}') in {SETTINGS_FILE}. Using default: {default_min_avg_rating}")
                     min_average_rating_for_posts = default_min_avg_rating                
+                loaded_scan_mode = settings.get("scan_mode", default_scan_mode)
+                if loaded_scan_mode in SCAN_MODES:
+                    scan_mode = loaded_scan_mode
+                else:
+                    print(f"WARNING: Invalid scan_mode ('{loaded_scan_mode}') in {SETTINGS_FILE}. Using default: {default_scan_mode}")
+                    scan_mode = default_scan_mode
+                keyword_whole_words = settings.get("keyword_whole_words", default_keyword_whole_words)
+                keyword_case_fold = settings.get("keyword_case_fold", default_keyword_case_fold)
+                digest_mode_enabled = settings.get("digest_mode_enabled", default_digest_mode_enabled)
+                loaded_digest_window = settings.get("digest_window_seconds", default_digest_window_seconds)
+                if isinstance(loaded_digest_window, int) and 5 <= loaded_digest_window <= 600:
+                    digest_window_seconds = loaded_digest_window
+                else:
+                    print(f"WARNING: Invalid digest_window_seconds ('{loaded_digest_window}') in {SETTINGS_FILE}. Using default: {default_digest_window_seconds}")
+                    digest_window_seconds = default_digest_window_seconds
+                loaded_digest_group_by = settings.get("digest_group_by", default_digest_group_by)
+                digest_group_by = loaded_digest_group_by if loaded_digest_group_by in DIGEST_GROUP_KEYS else default_digest_group_by
                 print(f"Settings loaded:")
                 print(f"  - Scraping: {'PAUSED' if is_scraping_paused else 'ACTIVE'}")
                 print(f"  - Auto-Follow Mode: {auto_follow_mode.upper()}")
@@ -772,6 +922,9 @@ def load_settings():
                 print(f"  - Min Avg Rating for Posts: {min_average_rating_for_posts:.1f}")                
                 print(f"  - Headless Mode: {'ENABLED' if is_headless_enabled else 'DISABLED'}")
                 print(f"  - Max post Age: {max_tweet_age_minutes} minutes")
+                print(f"  - Scan Mode: {scan_mode.upper()}")
+                print(f"  - Keyword Matching: {'whole words' if keyword_whole_words else 'substrings'}, {'case-insensitive' if keyword_case_fold else 'case-sensitive'}")
+                print(f"  - Digest Mode: {'ENABLED' if digest_mode_enabled else 'DISABLED'} ({digest_window_seconds}s window, by {digest_group_by})")
 
         else:
             print("No settings file found, setting default values and creating file...")
@@ -787,6 +940,12 @@ def load_settings():
             rating_buttons_enabled = default_rating_buttons_enabled
             show_posts_from_unrated_enabled = default_show_unrated_enabled
             min_average_rating_for_posts = default_min_avg_rating            
+            scan_mode = default_scan_mode
+            keyword_whole_words = default_keyword_whole_words
+            keyword_case_fold = default_keyword_case_fold
+            digest_mode_enabled = default_digest_mode_enabled
+            digest_window_seconds = default_digest_window_seconds
+            digest_group_by = default_digest_group_by
             save_settings()
             print(f"Default settings file '{SETTINGS_FILE}' has been created.")
 
@@ -804,6 +963,12 @@ def load_settings():
         rating_buttons_enabled = default_rating_buttons_enabled
         show_posts_from_unrated_enabled = default_show_unrated_enabled
         min_average_rating_for_posts = default_min_avg_rating        
+        scan_mode = default_scan_mode
+        keyword_whole_words = default_keyword_whole_words
+        keyword_case_fold = default_keyword_case_fold
+        digest_mode_enabled = default_digest_mode_enabled
+        digest_window_seconds = default_digest_window_seconds
+        digest_group_by = default_digest_group_by
 
     # --- IMPORTANT: Set asyncio.Event based on loaded status ---
     if is_scraping_paused:
@@ -820,6 +985,9 @@ def save_settings():
     global max_tweet_age_minutes
     global like_repost_buttons_enabled, rating_buttons_enabled # Added
     global show_posts_from_unrated_enabled, min_average_rating_for_posts # Added for rating filters
+    global scan_mode
+    global keyword_whole_words, keyword_case_fold
+    global digest_mode_enabled, digest_window_seconds, digest_group_by
     try:
         settings = {
             "is_scraping_paused": is_scraping_paused,
@@ -834,6 +1002,12 @@ def save_settings():
             "rating_buttons_enabled": rating_buttons_enabled,
             "show_posts_from_unrated_enabled": show_posts_from_unrated_enabled,
             "min_average_rating_for_posts": min_average_rating_for_posts,            
+            "scan_mode": scan_mode,
+            "keyword_whole_words": keyword_whole_words,
+            "keyword_case_fold": keyword_case_fold,
+            "digest_mode_enabled": digest_mode_enabled,
+            "digest_window_seconds": digest_window_seconds,
+            "digest_group_by": digest_group_by,
         }
         with open(SETTINGS_FILE, 'w') as f:
             json.dump(settings, f, indent=4)
@@ -942,6 +1116,7 @@ def load_ratings():
         print(f"Error loading rating data: {e}. Initializing empty and attempting to save.")
         ratings_data = {}
         save_ratings() # Attempt to create a new, empty ratings file
+    rebuild_rating_index()
 
 def save_ratings():
     """Saves the current rating data to the file."""
@@ -953,6 +1128,223 @@ def save_ratings():
     except Exception as e:
         print(f"Error saving rating data: {e}")
 
+def _set_rating_aggregate(source_key, rating_sum, rating_count):
+    """Stores the aggregate of one author and moves it to its place in the ranking."""
+    previous = rating_index.get(source_key)
+    if previous and previous["count"] > 0:
+        old_key = (-previous["avg"], -previous["count"], source_key)
+        position = bisect.bisect_left(rating_ranking, old_key)
+        if position < len(rating_ranking) and rating_ranking[position] == old_key:
+            del rating_ranking[position]
+    average = rating_sum / rating_count if rating_count > 0 else None
+    rating_index[source_key] = {"sum": rating_sum, "count": rating_count, "avg": average}
+    if rating_count > 0:
+        bisect.insort(rating_ranking, (-average, -rating_count, source_key))
+
+def rebuild_rating_index():
+    """Builds the reputation index from ratings_data (startup / after loading)."""
+    rating_index.clear()
+    rating_ranking.clear()
+    for source_key, data in ratings_data.items():
+        rating_counts = data.get("ratings", {}) if isinstance(data, dict) else {}
+        if not isinstance(rating_counts, dict):
+            print(f"WARNING: Invalid rating data for {source_key}, skipping.")
+            continue
+        rating_sum = 0
+        rating_count = 0
+        for star_str, count in rating_counts.items():
+            try:
+                star = int(star_str)
+                if 1 <= star <= 5:
+                    rating_count += count
+                    rating_sum += star * count
+            except (ValueError, TypeError): continue
+        _set_rating_aggregate(source_key, rating_sum, rating_count)
+
+def record_rating(source_key, name, stars):
+    """Adds one rating: updates the star counts and the author aggregate, then schedules a save."""
+    entry = ratings_data.get(source_key)
+    if not isinstance(entry, dict) or not isinstance(entry.get("ratings"), dict):
+        if entry is not None:
+            logger.warning(f"Fixed rating structure for {source_key}, using name '{name}'")
+        entry = ratings_data[source_key] = {"name": name, "ratings": {str(i): 0 for i in range(1, 6)}}
+        rating_index.pop(source_key, None)
+    elif entry.get("name") != name:
+        entry["name"] = name
+        logger.info(f"Updated name for {source_key} to '{name}'")
+    rating_key_str = str(stars)
+    entry["ratings"][rating_key_str] = entry["ratings"].get(rating_key_str, 0) + 1
+
+    aggregate = rating_index.get(source_key) or {"sum": 0, "count": 0}
+    _set_rating_aggregate(source_key, aggregate["sum"] + stars, aggregate["count"] + 1)
+    schedule_ratings_save()
+
+def schedule_ratings_save():
+    """Write-behind: bursts of ratings end up in one save after RATINGS_SAVE_DELAY."""
+    global ratings_save_task
+    if ratings_save_task is None or ratings_save_task.done():
+        ratings_save_task = asyncio.create_task(_save_ratings_later())
+
+async def _save_ratings_later():
+    await asyncio.sleep(RATINGS_SAVE_DELAY)
+    save_ratings()
+
+def flush_ratings():
+    """Saves pending ratings immediately (shutdown)."""
+    global ratings_save_task
+    if ratings_save_task is not None and not ratings_save_task.done():
+        ratings_save_task.cancel()
+        ratings_save_task = None
+        save_ratings()
+
+def top_rated_authors(limit):
+    """[(handle, avg, count)] of the best rated authors, best first."""
+    return [(source_key, -neg_avg, -neg_count) for neg_avg, neg_count, source_key in rating_ranking[:limit]]
+
+def count_authors_with_avg_at_least(threshold):
+    """Number of rated authors whose average is >= threshold."""
+    return bisect.bisect_right(rating_ranking, (-threshold, float("inf")))
+
+def _remember_processed_id(tweet_id):
+    """Adds an ID to the ring + set (no persistence); returns False if it was known."""
+    if tweet_id in processed_tweet_ids:
+        return False
+    processed_tweet_ids.add(tweet_id)
+    processed_tweets.append(tweet_id)
+    if len(processed_tweets) > PROCESSED_TWEETS_MAXLEN:
+        processed_tweet_ids.discard(processed_tweets.popleft())
+    return True
+
+def load_processed_tweets():
+    """Loads the snapshot plus the append log of processed post IDs so restarts don't re-alert posts already sent."""
+    global processed_tweets, processed_tweet_ids, processed_tweets_unsaved
+    processed_tweets = deque()
+    processed_tweet_ids = set()
+    processed_tweets_unsaved = 0
+    try:
+        if os.path.exists(PROCESSED_TWEETS_FILE):
+            with open(PROCESSED_TWEETS_FILE, 'r') as f:
+                loaded_ids = json.load(f)
+            if not isinstance(loaded_ids, list):
+                raise ValueError("expected a list of IDs")
+            for tweet_id in loaded_ids[-PROCESSED_TWEETS_MAXLEN:]:
+                _remember_processed_id(str(tweet_id))
+        else:
+            print(f"No processed posts file found ({PROCESSED_TWEETS_FILE}), starting empty.")
+    except (json.JSONDecodeError, ValueError) as e:
+        print(f"ERROR: {PROCESSED_TWEETS_FILE} is corrupt ({e}). Starting with an empty ID store.")
+    except Exception as e:
+        print(f"Error loading processed post IDs: {e}. Starting with an empty ID store.")
+    try:
+        if os.path.exists(PROCESSED_TWEETS_LOG_FILE):
+            with open(PROCESSED_TWEETS_LOG_FILE, 'r') as f:
+                for line in f:
+                    tweet_id = line.strip()
+                    if tweet_id and _remember_processed_id(tweet_id):
+                        processed_tweets_unsaved += 1
+    except Exception as e:
+        print(f"Error reading {PROCESSED_TWEETS_LOG_FILE}: {e}. Using the snapshot only.")
+    print(f"Processed post IDs loaded: {len(processed_tweets)} ({processed_tweets_unsaved} from the log)")
+
+def save_processed_tweets():
+    """Compaction: writes all processed post IDs (oldest first) atomically, then empties the log."""
+    global processed_tweets_unsaved, processed_tweets_log
+    try:
+        temp_file = PROCESSED_TWEETS_FILE + ".tmp"
+        with open(temp_file, 'w') as f:
+            json.dump(list(processed_tweets), f)
+        os.replace(temp_file, PROCESSED_TWEETS_FILE)
+        if processed_tweets_log is not None:
+            processed_tweets_log.close()
+        processed_tweets_log = open(PROCESSED_TWEETS_LOG_FILE, 'w', buffering=1) # Truncate; IDs are in the snapshot now
+        processed_tweets_unsaved = 0
+    except Exception as e:
+        print(f"Error saving processed post IDs: {e}")
+
+def is_tweet_processed(tweet_id):
+    """O(1) check whether a post ID was already processed (also before a restart)."""
+    return tweet_id in processed_tweet_ids
+
+def mark_tweet_processed(tweet_id):
+    """Remembers a processed post ID (evicting the oldest when full), appends it to the log and compacts periodically."""
+    global processed_tweets_unsaved, processed_tweets_log
+    if not _remember_processed_id(tweet_id):
+        return
+    processed_tweets_unsaved += 1
+    try:
+        if processed_tweets_log is None:
+            processed_tweets_log = open(PROCESSED_TWEETS_LOG_FILE, 'a', buffering=1) # Line buffered: one small write per ID
+        processed_tweets_log.write(f"{tweet_id}\n")
+    except Exception as e:
+        print(f"Error appending to {PROCESSED_TWEETS_LOG_FILE}: {e}")
+    if processed_tweets_unsaved >= PROCESSED_TWEETS_COMPACT_EVERY:
+        save_processed_tweets()
+
+def unmark_tweet_processed(tweet_ids):
+    """Shutdown: forgets IDs that were queued but never handled so they are scanned again after a restart."""
+    global processed_tweets_unsaved
+    forgotten = [tweet_id for tweet_id in tweet_ids if tweet_id in processed_tweet_ids]
+    for tweet_id in forgotten:
+        processed_tweet_ids.discard(tweet_id)
+        processed_tweets.remove(tweet_id)
+    if forgotten:
+        processed_tweets_unsaved += 1 # Forces the compaction in cleanup(), which also clears them from the log
+    return len(forgotten)
+
+def load_watermarks():
+    """Loads the per-account timeline high-watermarks."""
+    global timeline_watermarks
+    try:
+        if os.path.exists(WATERMARKS_FILE):
+            with open(WATERMARKS_FILE, 'r') as f:
+                loaded = json.load(f)
+            timeline_watermarks = loaded if isinstance(loaded, dict) else {}
+            print(f"Timeline watermarks loaded for {len(timeline_watermarks)} account(s).")
+        else:
+            timeline_watermarks = {}
+            print(f"No watermark file found ({WATERMARKS_FILE}), starting without watermarks.")
+    except (json.JSONDecodeError, Exception) as e:
+        print(f"Error loading timeline watermarks ({type(e).__name__}): {e}. Starting without watermarks.")
+        timeline_watermarks = {}
+
+def save_watermarks():
+    """Saves the per-account timeline high-watermarks."""
+    global timeline_watermarks_dirty
+    try:
+        with open(WATERMARKS_FILE, 'w') as f:
+            json.dump(timeline_watermarks, f, indent=4)
+        timeline_watermarks_dirty = False
+    except Exception as e:
+        print(f"Error saving timeline watermarks: {e}")
+
+def current_account_key():
+    """Key for per-account data (watermarks, scan activity). The timeline differs between accounts."""
+    return get_current_account_username() or f"account_{current_account + 1}"
+
+def get_timeline_watermark():
+    """Returns the newest seen post ID (int) of the current account, 0 if none."""
+    entry = timeline_watermarks.get(current_account_key()) or {}
+    try:
+        return int(entry.get("tweet_id", 0))
+    except (TypeError, ValueError):
+        return 0
+
+def advance_timeline_watermark(tweet_id):
+    """Moves the current account's watermark forward if tweet_id is newer. Saved once per round."""
+    global timeline_watermarks_dirty
+    try:
+        id_int = int(tweet_id)
+    except (TypeError, ValueError):
+        return
+    if id_int <= get_timeline_watermark():
+        return
+    id_time = snowflake_to_datetime(tweet_id)
+    timeline_watermarks[current_account_key()] = {
+        "tweet_id": str(tweet_id),
+        "time": id_time.isoformat() if id_time else datetime.now(timezone.utc).isoformat(),
+    }
+    timeline_watermarks_dirty = True
+
 def load_following_database():
     """Loads the following database from the file."""
     global following_database
@@ -1206,6 +1598,12 @@ def create_driver():
     else:
         print("INFO: Headless mode is DISABLED.")
 
+    # Network capture scan mode: record DevTools network events in the performance log
+    if scan_mode == "network":
+        print("INFO: Scan mode NETWORK. Enabling performance log with network events.")
+        options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
+        options.add_experimental_option('perfLoggingPrefs', {'enableNetwork': True, 'enablePage': False})
+
     # User Agent - use a more recent user agent
     user_agents = [
         "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
@@ -1301,6 +1699,10 @@ def create_driver():
         # Mask WebDriver presence
         driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
 
+        if scan_mode == "network":
+            # Keep response bodies in Chrome's buffer until Network.getResponseBody reads them
+            driver.execute_cdp_cmd('Network.enable', {'maxTotalBufferSize': 10000000, 'maxResourceBufferSize': 5000000})
+
         # Der JavaScript Zoom wurde entfernt, da er unzuverlässig war.
         # Der Zoom wird jetzt über '--force-device-scale-factor' gesetzt (siehe oben).
 
@@ -1812,11 +2214,11 @@ async def check_rate_limit():
     # First, check the internet connection
     try:
         # Quick ping test (5-second timeout)
-        response = requests.get("https://api.x.com/ping", timeout=5)
+        response = await http_get("https://api.x.com/ping", timeout=5)
     except:
         # Try again with another service
         try:
-            response = requests.get("https://www.google.com", timeout=5)
+            response = await http_get("https://www.google.com", timeout=5)
         except Exception as e:
             print(f"Internet connection might be interrupted: {e}")
             # Treat as a rate limit since we can't fetch data
@@ -3348,8 +3750,8 @@ async def check_github_for_updates():
     print(f"INFO: Checking for updates from {github_api_url}...")
 
     try:
-        # Run requests.get in a separate thread to avoid blocking asyncio loop
-        response = await asyncio.to_thread(requests.get, github_api_url, headers=headers, timeout=10)
+        # Shared async client, does not block the asyncio loop
+        response = await http_get(github_api_url, headers=headers, timeout=10)
         response.raise_for_status() # Raises HTTPError for bad responses (4XX or 5XX)
         release_data = response.json()
         
@@ -3382,9 +3784,9 @@ async def check_github_for_updates():
             print(f"INFO: Script is up to date (Current: {SCRIPT_VERSION}, Latest: {latest_tag_name}).")
             return None
 
-    except requests.exceptions.Timeout:
+    except httpx.TimeoutException:
         print("WARNING: Timeout while checking for updates.")
-    except requests.exceptions.HTTPError as e:
+    except httpx.HTTPStatusError as e:
         if e.response.status_code == 404:
             print("INFO: No releases found on GitHub repository (or repo not found).")
         elif e.response.status_code == 403: # Rate limit
@@ -4598,22 +5000,7 @@ async def button_callback_handler(update: Update, context: ContextTypes.DEFAULT_
                     await query.answer("❌ Invalid value (1-5).", show_alert=True)
                     return
 
-                entry_needs_update = False
-                if source_key not in ratings_data:
-                    ratings_data[source_key] = {"name": decoded_name, "ratings": {str(i): 0 for i in range(1, 6)}}; entry_needs_update = True
-                    logger.debug(f"Initialized new rating entry for {source_key} with name '{decoded_name}'")
-                elif "ratings" not in ratings_data[source_key] or not isinstance(ratings_data[source_key].get("ratings"), dict):
-                     ratings_data[source_key] = {"name": decoded_name, "ratings": {str(i): 0 for i in range(1, 6)}}; entry_needs_update = True
-                     logger.warning(f"Fixed rating structure for {source_key}, using name '{decoded_name}'")
-                elif ratings_data[source_key].get("name") != decoded_name:
-                     ratings_data[source_key]["name"] = decoded_name; entry_needs_update = True
-                     logger.info(f"Updated name for {source_key} to '{decoded_name}'")
-
-                rating_key_str = str(rating_value)
-                current_count = ratings_data[source_key]["ratings"].get(rating_key_str, 0)
-                ratings_data[source_key]["ratings"][rating_key_str] = current_count + 1
-                entry_needs_update = True
-                if entry_needs_update: save_ratings()
+                record_rating(source_key, decoded_name, rating_value) # O(1) index update, ratings.json is written behind
                 logger.info(f"Rating saved: {source_key} -> {rating_value} stars")
 
                 try: # Optional: Remove buttons
@@ -5251,6 +5638,13 @@ async def status_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         f"💲 {ticker_status_text} **Ticker 🔎** \n"
         f"⏰ **Main Schedule:** {schedule_details}\n"
         f"👻 {headless_status_text} **Headless Mode**\n" 
+        f"📡 **Scan Mode:** {scan_mode.upper()}\n"
+        f"⏱️ **Adaptive Poll:** {poll_state['delay']:.1f}s (expected {expected_arrival_rate() or 0:.2f} posts/min this hour)\n"
+        f"📨 **Alert Latency:** {_latency_total_display()}\n"
+        f"🧩 **Enrichment:** {alert_enrichment_stats['edited']} edited, {alert_enrichment_stats['over_budget']} over {ENRICHMENT_BUDGET_SECONDS}s budget\n"
+        f"   └ {format_circuit_breakers()}\n"
+        f"📬 **Telegram Delivery:** {format_telegram_delivery_status()}\n"
+        f"🧵 **Post Pipeline:** {post_pipeline_queue.qsize()}/{POST_PIPELINE_QUEUE_SIZE} queued, {sum(1 for t in post_pipeline_tasks if not t.done())} worker(s)\n"
         f"🌍 **Global Follow List:** {global_list_info}\n"
         f"🤖 **Auto-Follow (Curr. Acc):** {autofollow_stat}\n"
         f"🗓️ **Other Schedules:**\n   └ {new_schedules_info}\n" 
@@ -5665,7 +6059,10 @@ async def show_post_counts(update: Update):
         f"Thu: {weekday_averages['Thursday']}\n"
         f"Fri: {weekday_averages['Friday']}\n"
         f"Sat: {weekday_averages['Saturday']}\n"
-        f"Sun: {weekday_averages['Sunday']}"
+        f"Sun: {weekday_averages['Sunday']}\n\n"
+
+        "⏱️ Latency per Stage (created → sent):\n"
+        f"{format_latency_summary()}"
     ) # <<--- Ensure THIS parenthesis closes the one opened after 'message = ('
 
     # The message += (...) block is completely removed
@@ -5820,6 +6217,16 @@ async def show_help_message(update: Update):
         "   <code>/keywords</code>  - Shows list\n" # Changed to <code>
         "   <code>/addkeyword word1,word2...</code>\n" # Changed to <code>
         "   <code>/removekeyword word1,word2...</code>\n" # Changed to <code>
+        "   <code>/keywordmode words|case on|off</code>\n"
+        "      └ Whole-word / case-insensitive matching\n"
+        "   <code>/filterrules</code>  - Relevance rules\n"
+        "   <code>/addrule ca AND avg&gt;=3</code>\n"
+        "   <code>/removerule 1|all</code>\n"
+        "   <code>/replay 24</code>  - Test rules on archived posts\n"
+        "      └ hours, or YYYY-MM-DD[-HH] [YYYY-MM-DD[-HH]]\n"
+        "   <code>/cachestats</code>  - CA lookup cache (or <code>clear</code>)\n"
+        "   <code>/digest on|off</code>  - Bundle post bursts per token\n"
+        "      └ <code>/digest window 60</code>, <code>/digest by ca|ticker</code>\n"
         "  \n"
         "🥷    Accounts    🥷\n"
         "   <code>/account</code>  - Show active account\n" # Changed to <code>
@@ -5834,6 +6241,8 @@ async def show_help_message(update: Update):
         "      └ scan for $Tickers on|off\n"
         f"   <code>/setmaxage {max_tweet_age_minutes}</code>\n"
         "      └ Sets max post age(min) (default: 15)\n"
+        f"   <code>/scanmode {'|'.join(SCAN_MODES)}</code>\n"
+        f"      └ How new posts are picked up (now: {scan_mode})\n"
         "  \n"
         "🔗    CA Link configuration    🔗\n"
         "   <code>/togglelink</code> - opens link display\n"
@@ -7793,9 +8202,10 @@ async def show_keywords(update: Update):
     await resume_scraping()
 
 async def save_keywords():
-    """Saves the keywords to a file"""
+    """Saves the keywords to a file and recompiles the keyword matcher"""
     with open(KEYWORDS_FILE, 'w') as f:
         json.dump(KEYWORDS, f)
+    rebuild_keyword_matcher()
 
 async def add_keyword(update: Update, keyword_text: str):
     """Adds one or more comma-separated keywords"""
@@ -7865,22 +8275,22 @@ async def _send_long_message(application, chat_id, text, reply_markup, tweet_url
             for i, chunk in enumerate(chunks):
                 # Add buttons only to the last chunk
                 current_reply_markup = reply_markup if i == len(chunks) - 1 else None
-                message_sent = await application.bot.send_message(
+                message_sent = await telegram_api_call("send_message",
                     chat_id=chat_id,
                     text=chunk,
                     parse_mode=ParseMode.HTML,
                     disable_web_page_preview=True,
                     reply_markup=current_reply_markup
                 )
-                await asyncio.sleep(0.5) # Avoid rate limits
 
             # Store post URL if buttons were on the last message
             if reply_markup and tweet_url:
                  last_tweet_urls[chat_id] = tweet_url
+            return message_sent
 
         else:
             # Message is short enough, send in one go
-            message_sent = await application.bot.send_message(
+            message_sent = await telegram_api_call("send_message",
                 chat_id=chat_id,
                 text=text,
                 parse_mode=ParseMode.HTML,
@@ -7890,13 +8300,18 @@ async def _send_long_message(application, chat_id, text, reply_markup, tweet_url
              # Store post URL if buttons were present
             if reply_markup and tweet_url:
                 last_tweet_urls[chat_id] = tweet_url
+            return message_sent
 
+    except telegram.error.RetryAfter as flood_error:
+        # Retries are used up (see telegram_api_call); fallbacks would only hit the same limit again
+        print(f"Telegram flood control, message dropped: {flood_error}")
+        return None
     except Exception as send_error:
         print(f"Error sending Telegram message (Text): {send_error}")
         # Fallback 1: Try sending without HTML parsing
         try:
             plain_text_fallback = html.unescape(text) # Try to remove HTML entities for plain text
-            await application.bot.send_message(
+            message_sent = await telegram_api_call("send_message",
                 chat_id=chat_id,
                 text=plain_text_fallback, # Send plain text
                 parse_mode=None,
@@ -7907,6 +8322,7 @@ async def _send_long_message(application, chat_id, text, reply_markup, tweet_url
             # Store post URL here too if buttons were present
             if reply_markup and tweet_url:
                  last_tweet_urls[chat_id] = tweet_url
+            return message_sent
         except Exception as plain_error:
             print(f"Sending without HTML parsing also failed: {plain_error}")
             # Fallback 2: Send a very short, simple message
@@ -7914,15 +8330,16 @@ async def _send_long_message(application, chat_id, text, reply_markup, tweet_url
                 # Extract the first part of the original text as a hint
                 error_indicator_text = text.split('\n')[0] # First line as a clue
                 simple_text = error_indicator_text[:200] + "... [Error sending]"
-                await application.bot.send_message(chat_id=chat_id, text=simple_text)
+                await telegram_api_call("send_message", chat_id=chat_id, text=simple_text)
             except Exception as final_error:
                 print(f"Final attempt to send simple error message failed: {final_error}")
 
-async def send_telegram_message(text, images=None, tweet_url=None, reply_markup=None):
+async def _deliver_telegram_message(text, images=None, tweet_url=None, reply_markup=None):
     """
-    Sends a message to Telegram.
+    Sends a message to Telegram (runs in a delivery worker, see Telegram Delivery).
     If images are present AND the text is > 1024 characters long,
     a text message with a 🖼️ emoji is sent instead.
+    Returns the sent Message (the last one if the text was split), or None.
     """
     global application, last_tweet_urls # Access global variables
 
@@ -7942,8 +8359,6 @@ async def send_telegram_message(text, images=None, tweet_url=None, reply_markup=
         final_reply_markup = reply_markup
         # --- End Button Logic ---
 
-        await asyncio.sleep(0.5) # Reduce potential conflicts
-
         caption_limit = 1024
         image_emoji = "🖼️" # Emoji indicating images were present
 
@@ -7953,9 +8368,9 @@ async def send_telegram_message(text, images=None, tweet_url=None, reply_markup=
             if text_length <= caption_limit:
                 # Case 1: Images present, text short enough -> Send with send_photo
                 try:
-                    await application.bot.send_photo(
+                    sent_message = await send_photo_cached(
                         chat_id=CHANNEL_ID,
-                        photo=images[0], # Send only the first image
+                        photo_url=images[0], # Send only the first image (by file_id if Telegram has it)
                         caption=full_text, # Entire text fits
                         parse_mode=ParseMode.HTML,
                         reply_markup=final_reply_markup
@@ -7963,193 +8378,484 @@ async def send_telegram_message(text, images=None, tweet_url=None, reply_markup=
                     # Store post URL since image was sent and buttons might be present
                     if tweet_url:
                         last_tweet_urls[CHANNEL_ID] = tweet_url
+                    return sent_message
+                except telegram.error.RetryAfter as flood_error:
+                    print(f"Telegram flood control, photo dropped (no text fallback): {flood_error}")
+                    return None
                 except Exception as send_photo_error:
                     print(f"Error sending photo (despite fitting length): {send_photo_error}")
                     # Fallback: Try sending as text message with emoji
                     modified_text = f"{image_emoji} {full_text}"
-                    await _send_long_message(application, CHANNEL_ID, modified_text, final_reply_markup, tweet_url)
+                    return await _send_long_message(application, CHANNEL_ID, modified_text, final_reply_markup, tweet_url)
 
             else:
                 # Case 2: Images present, text too long for caption -> Send as text with emoji
                 print(f"Message too long for caption ({text_length} > {caption_limit}), sending as text with emoji.")
                 modified_text = f"{image_emoji} {full_text}" # Prepend emoji
-                await _send_long_message(application, CHANNEL_ID, modified_text, final_reply_markup, tweet_url)
+                return await _send_long_message(application, CHANNEL_ID, modified_text, final_reply_markup, tweet_url)
 
         else:
             # Case 3: No images -> Send as normal text message
-            await _send_long_message(application, CHANNEL_ID, full_text, final_reply_markup, tweet_url)
+            return await _send_long_message(application, CHANNEL_ID, full_text, final_reply_markup, tweet_url)
 
     except Exception as e:
-        print(f"Unexpected error in send_telegram_message: {e}")
+        print(f"Unexpected error in _deliver_telegram_message: {e}")
+
+# ===> Single-Flight <===
+# Concurrent calls for the same key share one outstanding operation: the first
+# caller starts it, everyone else awaits the same task and gets the same result
+# (or exception). Used for DexScreener lookups per CA and full-text fetches per post.
+inflight_operations = {} # key -> asyncio.Task
+single_flight_stats = {"started": 0, "coalesced": 0}
+
+
+async def single_flight(key, operation):
+    """Runs operation() once per key at a time; operation is a zero-argument coroutine function."""
+    task = inflight_operations.get(key)
+    if task is None:
+        task = asyncio.ensure_future(operation())
+        inflight_operations[key] = task
+        task.add_done_callback(lambda done, key=key: inflight_operations.pop(key, None) if inflight_operations.get(key) is done else None)
+        single_flight_stats["started"] += 1
+    else:
+        single_flight_stats["coalesced"] += 1
+        logger.info(f"[Single-Flight] Joining in-flight operation {key}")
+    # shield: a cancelled waiter must not cancel the shared operation for the others
+    return await asyncio.shield(task)
+# ===> END Single-Flight <===
+
+
+# ===> Circuit Breaker <===
+# One breaker per external endpoint. Closed: calls go through and outcomes are kept
+# in a rolling window. Calls slower than CIRCUIT_SLOW_CALL_SECONDS count as failures.
+# The breaker opens after CIRCUIT_FAILURE_THRESHOLD consecutive failures, or when the
+# failure rate of the window reaches CIRCUIT_FAILURE_RATE. While open, calls are
+# refused immediately. After CIRCUIT_OPEN_SECONDS one probe call is let through
+# (half open): success closes the breaker, failure opens it again.
+CIRCUIT_WINDOW_SIZE = 20
+CIRCUIT_MIN_CALLS = 10 # Calls in the window before the failure rate counts
+CIRCUIT_FAILURE_RATE = 0.5
+CIRCUIT_FAILURE_THRESHOLD = 5
+CIRCUIT_SLOW_CALL_SECONDS = 4.0
+CIRCUIT_OPEN_SECONDS = 30
+circuit_breakers = {} # endpoint -> state dict, see _get_circuit_breaker()
+
+
+def _get_circuit_breaker(endpoint):
+    breaker = circuit_breakers.get(endpoint)
+    if breaker is None:
+        breaker = circuit_breakers[endpoint] = {
+            "state": "closed", "consecutive_failures": 0, "opened_at": 0.0, "probe_running": False,
+            "window": deque(maxlen=CIRCUIT_WINDOW_SIZE), # (failed, seconds)
+            "rejected": 0, "opened_count": 0,
+        }
+    return breaker
 
-def detect_chain(contract):
-    """Detect which blockchain a contract address belongs to"""
-    if re.match(r'^[1-9A-HJ-NP-Za-km-z]{32,44}$', contract):
-        return 'solana'
-    elif re.match(r'^0x[a-fA-F0-9]{40}$', contract):
-        return 'bsc'
-    return 'unknown'
 
+def circuit_allows(endpoint):
+    """True if a call to the endpoint may go out now. In half open state only one probe at a time."""
+    breaker = _get_circuit_breaker(endpoint)
+    if breaker["state"] == "open" and time.time() - breaker["opened_at"] >= CIRCUIT_OPEN_SECONDS:
+        breaker["state"] = "half_open"
+        logger.info(f"[Circuit Breaker] {endpoint}: half open, probing")
+    if breaker["state"] == "closed" or (breaker["state"] == "half_open" and not breaker["probe_running"]):
+        breaker["probe_running"] = breaker["state"] == "half_open"
+        return True
+    breaker["rejected"] += 1
+    return False
+
+
+def circuit_record(endpoint, success, seconds):
+    """Records the outcome of a call that circuit_allows() let through."""
+    breaker = _get_circuit_breaker(endpoint)
+    failed = not success or seconds > CIRCUIT_SLOW_CALL_SECONDS
+    breaker["window"].append((failed, seconds))
+    breaker["consecutive_failures"] = breaker["consecutive_failures"] + 1 if failed else 0
+    breaker["probe_running"] = False
+    if breaker["state"] == "half_open":
+        if failed:
+            _open_circuit(endpoint, breaker, "probe failed")
+        else:
+            breaker["state"] = "closed"
+            breaker["window"].clear()
+            logger.info(f"[Circuit Breaker] {endpoint}: closed again after successful probe")
+        return
+    failures = sum(1 for was_failure, _ in breaker["window"] if was_failure)
+    if breaker["state"] == "closed" and failed and (
+            breaker["consecutive_failures"] >= CIRCUIT_FAILURE_THRESHOLD or
+            (len(breaker["window"]) >= CIRCUIT_MIN_CALLS and failures / len(breaker["window"]) >= CIRCUIT_FAILURE_RATE)):
+        _open_circuit(endpoint, breaker, f"{failures}/{len(breaker['window'])} failed or slow calls")
+
+
+def _open_circuit(endpoint, breaker, reason):
+    breaker["state"] = "open"
+    breaker["opened_at"] = time.time()
+    breaker["opened_count"] += 1
+    logger.warning(f"[Circuit Breaker] {endpoint}: OPEN for {CIRCUIT_OPEN_SECONDS}s ({reason})")
+
+
+def format_circuit_breakers():
+    """One line per endpoint for /status."""
+    if not circuit_breakers:
+        return "no calls yet"
+    icons = {"closed": "🟢", "half_open": "🟡", "open": "🔴"}
+    lines = []
+    for endpoint, breaker in sorted(circuit_breakers.items()):
+        window = breaker["window"]
+        failures = sum(1 for failed, _ in window if failed)
+        average = sum(seconds for _, seconds in window) / len(window) if window else 0.0
+        line = f"{icons[breaker['state']]} {endpoint}: {breaker['state'].replace('_', ' ')}, {failures}/{len(window)} failed/slow, avg {average:.2f}s"
+        if breaker["state"] == "open":
+            line += f", retry in {max(0, CIRCUIT_OPEN_SECONDS - (time.time() - breaker['opened_at'])):.0f}s"
+        if breaker["rejected"]:
+            line += f", {breaker['rejected']} refused"
+        lines.append(line)
+    return "\n   └ ".join(lines)
+# ===> END Circuit Breaker <===
+
+
+# ===> HTTP Client <===
+# One shared httpx.AsyncClient for all outbound HTTP calls of the bot (DexScreener,
+# connectivity checks, update check). Keep-alive connections are pooled, every host
+# gets its own concurrency limit, and every request has a timeout, so a slow API
+# only delays the alert waiting for it - never the scan loop or Telegram commands.
+# DEXSCREENER_API_BASE can point to a local stub server for testing.
+HTTP_TIMEOUT_SECONDS = 10
+HTTP_CONNECT_TIMEOUT_SECONDS = 5
+HTTP_MAX_CONNECTIONS = 20
+HTTP_MAX_KEEPALIVE_CONNECTIONS = 10
+HTTP_PER_HOST_LIMIT = 4 # Concurrent requests per host (default)
+HTTP_HOST_LIMITS = {"api.dexscreener.com": 4, "api.github.com": 1}
+DEXSCREENER_API_BASE = os.getenv("DEXSCREENER_API_BASE", "https://api.dexscreener.com").rstrip("/")
+http_client = None
+http_host_semaphores = {}
+
+
+def get_http_client():
+    """Returns the shared client, creating it on first use."""
+    global http_client
+    if http_client is None or http_client.is_closed:
+        http_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(HTTP_TIMEOUT_SECONDS, connect=HTTP_CONNECT_TIMEOUT_SECONDS),
+            limits=httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS, max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS),
+            follow_redirects=True,
+        )
+    return http_client
 
-def get_dexscreener_pair_address_for_solana(contract_address: str) -> Union[str, None]:
-    """
-    Fetches the pairAddress from DexScreener for a given Solana contract address.
-    Tries to find the most relevant pair if multiple exist.
-    Returns the pairAddress string or None if not found or an error occurs.
-    """
-    search_url = f"https://api.dexscreener.com/latest/dex/search?q={contract_address}"
-    logger.info(f"[DexScreener] Fetching pair data for {contract_address} from {search_url}")
 
-    try:
-        response = requests.get(search_url, timeout=10) # Synchroner Aufruf
-        response.raise_for_status()  # Prüft auf HTTP-Fehler
-        data = response.json()
+def _host_semaphore(url):
+    host = urlparse(url).hostname or ""
+    semaphore = http_host_semaphores.get(host)
+    if semaphore is None:
+        semaphore = http_host_semaphores[host] = asyncio.Semaphore(HTTP_HOST_LIMITS.get(host, HTTP_PER_HOST_LIMIT))
+    return semaphore
 
-        if not data or not data.get("pairs") or not isinstance(data["pairs"], list) or len(data["pairs"]) == 0:
-            logger.info(f"[DexScreener] No pairs found for {contract_address}. API Response: {str(data)[:300]}")
-            return None
-        
-        target_pairs = []
-        for pair in data["pairs"]:
-            if not isinstance(pair, dict):
-                continue
-            
-            if pair.get("chainId", "").lower() != "solana":
-                logger.debug(f"[DexScreener] Skipping pair {pair.get('pairAddress')} for {contract_address} - wrong chainId: {pair.get('chainId')}")
-                continue
 
-            base_token_address = pair.get("baseToken", {}).get("address", "").lower()
-            quote_token_address = pair.get("quoteToken", {}).get("address", "").lower()
-            if contract_address.lower() == base_token_address or contract_address.lower() == quote_token_address:
-                target_pairs.append(pair)
-        
-        if not target_pairs:
-            logger.info(f"[DexScreener] No pairs found where {contract_address} is base or quote token on Solana chain.")
-            return None
-        best_pair_data = target_pairs[0] 
-        pair_address = best_pair_data.get("pairAddress")
+async def http_get(url, timeout=None, **kwargs):
+    """GET through the shared pool, limited per host. Raises httpx exceptions like requests would."""
+    async with _host_semaphore(url):
+        return await get_http_client().get(url, timeout=timeout or HTTP_TIMEOUT_SECONDS, **kwargs)
 
-        if pair_address:
-            logger.info(f"[DexScreener] Found pairAddress '{pair_address}' for {contract_address} (Base: {best_pair_data.get('baseToken',{}).get('symbol')}, Quote: {best_pair_data.get('quoteToken',{}).get('symbol')})")
-            return pair_address
-        else:
-            logger.warning(f"[DexScreener] First matching pair for {contract_address} has no pairAddress. Pair data: {str(best_pair_data)[:300]}")
-            return None
 
-    except requests.exceptions.Timeout:
-        logger.error(f"[DexScreener] Timeout fetching data for {contract_address}.")
-    except requests.exceptions.HTTPError as e:
-        logger.error(f"[DexScreener] HTTP error for {contract_address}: {e}. Status: {e.response.status_code}. Response: {e.response.text[:300]}")
-    except requests.exceptions.RequestException as e:
-        logger.error(f"[DexScreener] Request error for {contract_address}: {e}")
-    except json.JSONDecodeError as e:
-        logger.error(f"[DexScreener] JSON decode error for {contract_address}: {e}. Response text: {response.text[:300] if 'response' in locals() else 'N/A'}")
-    except Exception as e:
-        logger.error(f"[DexScreener] Unexpected error for {contract_address}: {e}", exc_info=True)
-    
-    return None
+async def close_http_client():
+    """Closes the pooled connections (shutdown)."""
+    global http_client
+    if http_client is not None and not http_client.is_closed:
+        await http_client.aclose()
+    http_client = None
+# ===> END HTTP Client <===
 
-def get_dexscreener_image_url_for_solana(contract_address: str) -> Union[str, None]:
+
+def parse_dexscreener_search(contract_address, data):
     """
-    Fetches the image URL EXCLUSIVELY from the 'openGraph' field (expected within an 'info' object) 
-    from DexScreener for the first relevant Solana pair matching the contract_address.
-    Returns the image URL string or None if 'openGraph' is not found or not a valid URL.
+    Turns a DexScreener pair list ({"pairs": [...]}, as from /latest/dex/search or
+    one CA's share of a batched /tokens/v1 response) into the token info used by
+    the image logic and the link builders. Keys (None when not available):
+      found          - a Solana pair with the CA as base or quote token exists
+      pair_address   - pairAddress of that pair (Axiom link); falls back to the first pair
+      image_url      - info.openGraph of that pair, only if it is an http(s) URL
+      symbol, name   - of the CA's token in that pair
+      liquidity_usd  - liquidity.usd of that pair
+      dex_id         - e.g. "raydium", "pumpswap"
     """
-    search_url = f"https://api.dexscreener.com/latest/dex/search?q={contract_address}"
-    logger.info(f"[DexScreenerImage] Fetching image data for CA: {contract_address} from URL: {search_url} (TARGETING 'info.openGraph')")
-    print(f"DEBUG IMAGE FUNC: Called for CA: {contract_address}")
+    token_info = {"found": False, "pair_address": None, "image_url": None, "symbol": None,
+                  "name": None, "liquidity_usd": None, "dex_id": None}
+    pairs = data.get("pairs") if isinstance(data, dict) else None
+    if not isinstance(pairs, list) or not pairs:
+        return token_info
+
+    contract_lower = contract_address.lower()
+    for pair in pairs:
+        if not isinstance(pair, dict) or (pair.get("chainId") or "").lower() != "solana":
+            continue
+        base_token = pair.get("baseToken") or {}
+        quote_token = pair.get("quoteToken") or {}
+        if contract_lower not in ((base_token.get("address") or "").lower(), (quote_token.get("address") or "").lower()):
+            continue
+        token = base_token if (base_token.get("address") or "").lower() == contract_lower else quote_token
+        info_object = pair.get("info") if isinstance(pair.get("info"), dict) else {}
+        open_graph_url = info_object.get("openGraph")
+        liquidity = pair.get("liquidity") if isinstance(pair.get("liquidity"), dict) else {}
+        token_info.update({
+            "found": True,
+            "pair_address": pair.get("pairAddress"),
+            "image_url": open_graph_url if isinstance(open_graph_url, str) and open_graph_url.startswith("http") else None,
+            "symbol": token.get("symbol"),
+            "name": token.get("name"),
+            "liquidity_usd": liquidity.get("usd"),
+            "dex_id": pair.get("dexId"),
+        })
+        return token_info
+
+    first_pair = pairs[0] if isinstance(pairs[0], dict) else {}
+    token_info["pair_address"] = first_pair.get("pairAddress") # Previous Axiom behaviour: first pair of the search
+    return token_info
+
+
+def format_usd_compact(value):
+    """12345.6 -> "$12.3K" """
+    for divisor, suffix in ((1e9, "B"), (1e6, "M"), (1e3, "K")):
+        if abs(value) >= divisor:
+            return f"${value / divisor:.1f}{suffix}"
+    return f"${value:.0f}"
+
+
+# ===> DexScreener Batch Lookups <===
+# The tokens endpoint resolves up to 30 comma-separated addresses per request.
+# Lookups are collected for DEXSCREENER_BATCH_WINDOW_SECONDS (the alerts of one scan
+# round arrive together), then resolved with as few requests as possible; every
+# waiting caller gets the result for its own CA back through a future.
+DEXSCREENER_BATCH_MAX_ADDRESSES = 30
+DEXSCREENER_BATCH_WINDOW_SECONDS = 0.3
+dexscreener_batch_pending = {} # CA -> asyncio.Future waiting for the next batch
+dexscreener_batch_timer = None
+dexscreener_batch_tasks = set() # Strong references to running flushes
+dexscreener_batch_stats = {"requests": 0, "addresses": 0}
+
+
+def split_pairs_by_token(contract_addresses, pairs):
+    """Assigns the pairs of a batched response to the requested CAs (base or quote token)."""
+    pairs_by_token = {contract: [] for contract in contract_addresses}
+    lower_to_contract = {contract.lower(): contract for contract in contract_addresses}
+    for pair in pairs if isinstance(pairs, list) else []:
+        if not isinstance(pair, dict):
+            continue
+        for side in ("baseToken", "quoteToken"):
+            token = pair.get(side) if isinstance(pair.get(side), dict) else {}
+            contract = lower_to_contract.get((token.get("address") or "").lower())
+            if contract is not None:
+                pairs_by_token[contract].append(pair)
+    return pairs_by_token
+
 
+async def fetch_dexscreener_tokens(contract_addresses):
+    """
+    One DexScreener tokens request for up to DEXSCREENER_BATCH_MAX_ADDRESSES Solana CAs.
+    Returns {CA: parse_dexscreener_search() output}, or None on network/API errors
+    (so errors are never cached as "no pairs").
+    """
+    if not circuit_allows("dexscreener"):
+        logger.info(f"[DexScreener] Circuit open, skipping lookup for {len(contract_addresses)} CA(s).")
+        return None
+    tokens_url = f"{DEXSCREENER_API_BASE}/tokens/v1/solana/{','.join(contract_addresses)}"
+    logger.info(f"[DexScreener] Fetching token data for {len(contract_addresses)} CA(s) from {tokens_url}")
+    dexscreener_batch_stats["requests"] += 1
+    dexscreener_batch_stats["addresses"] += len(contract_addresses)
+    started = time.monotonic()
+    success = False
     try:
-        response = requests.get(search_url, timeout=15)
-        logger.debug(f"[DexScreenerImage] Response status for {contract_address}: {response.status_code}")
-        print(f"DEBUG IMAGE FUNC: Response status for {contract_address}: {response.status_code}")
+        response = await http_get(tokens_url, timeout=10)
         response.raise_for_status()
-        
         data = response.json()
-        logger.debug(f"[DexScreenerImage] API JSON data for {contract_address} (first 500 chars): {str(data)[:500]}")
-        print(f"DEBUG IMAGE FUNC: API JSON data for {contract_address} (first 500 chars): {str(data)[:500]}")
-
-        if not data or not data.get("pairs") or not isinstance(data["pairs"], list) or len(data["pairs"]) == 0:
-            logger.info(f"[DexScreenerImage] No 'pairs' array or empty for {contract_address}.")
-            print(f"DEBUG IMAGE FUNC: No 'pairs' array or empty for {contract_address}.")
-            return None
+        success = True
+        pairs = data.get("pairs") if isinstance(data, dict) else data # Older API versions wrap the list
+        token_infos = {}
+        for contract, token_pairs in split_pairs_by_token(contract_addresses, pairs).items():
+            token_info = parse_dexscreener_search(contract, {"pairs": token_pairs})
+            logger.info(f"[DexScreener] {contract}: found={token_info['found']}, symbol={token_info['symbol']}, "
+                        f"pair={token_info['pair_address']}, image={'yes' if token_info['image_url'] else 'no'}, liquidity={token_info['liquidity_usd']}")
+            token_infos[contract] = token_info
+        return token_infos
+    except httpx.TimeoutException:
+        logger.error(f"[DexScreener] Timeout fetching data for {contract_addresses}.")
+    except httpx.HTTPStatusError as e:
+        logger.error(f"[DexScreener] HTTP error for {contract_addresses}: {e}. Status: {e.response.status_code}. Response: {e.response.text[:300]}")
+    except httpx.RequestError as e:
+        logger.error(f"[DexScreener] Request error for {contract_addresses}: {e}")
+    except json.JSONDecodeError as e:
+        logger.error(f"[DexScreener] JSON decode error for {contract_addresses}: {e}")
+    except Exception as e:
+        logger.error(f"[DexScreener] Unexpected error for {contract_addresses}: {e}", exc_info=True)
+    finally:
+        circuit_record("dexscreener", success, time.monotonic() - started)
+    return None
 
-        logger.info(f"[DexScreenerImage] Found {len(data['pairs'])} pair(s) for {contract_address}. Iterating...")
-        print(f"DEBUG IMAGE FUNC: Found {len(data['pairs'])} pair(s) for {contract_address}. Iterating...")
 
-        for i, pair_data_candidate in enumerate(data["pairs"]):
-            print(f"DEBUG IMAGE FUNC: Checking pair #{i} for {contract_address}: {str(pair_data_candidate)[:300]}")
+async def fetch_dexscreener_token(contract_address: str) -> Union[dict, None]:
+    """Token info for one CA via the next batch; None on network/API errors."""
+    future = dexscreener_batch_pending.get(contract_address)
+    if future is None:
+        future = dexscreener_batch_pending[contract_address] = asyncio.get_running_loop().create_future()
+    _schedule_dexscreener_batch()
+    return await asyncio.shield(future)
+
+
+def _schedule_dexscreener_batch():
+    """Full batch -> flush now; otherwise flush when the collection window ends."""
+    global dexscreener_batch_timer
+    if len(dexscreener_batch_pending) >= DEXSCREENER_BATCH_MAX_ADDRESSES:
+        if dexscreener_batch_timer is not None:
+            dexscreener_batch_timer.cancel()
+            dexscreener_batch_timer = None
+        _start_dexscreener_flush()
+    elif dexscreener_batch_timer is None:
+        dexscreener_batch_timer = asyncio.get_running_loop().call_later(DEXSCREENER_BATCH_WINDOW_SECONDS, _start_dexscreener_flush)
+
+
+def _start_dexscreener_flush():
+    task = asyncio.create_task(flush_dexscreener_batch())
+    dexscreener_batch_tasks.add(task)
+    task.add_done_callback(dexscreener_batch_tasks.discard)
+
+
+async def flush_dexscreener_batch():
+    """Resolves everything collected so far, in chunks of DEXSCREENER_BATCH_MAX_ADDRESSES."""
+    global dexscreener_batch_timer, dexscreener_batch_pending
+    dexscreener_batch_timer = None
+    batch, dexscreener_batch_pending = dexscreener_batch_pending, {}
+    contracts = list(batch)
+    chunks = [contracts[i:i + DEXSCREENER_BATCH_MAX_ADDRESSES] for i in range(0, len(contracts), DEXSCREENER_BATCH_MAX_ADDRESSES)]
+    try:
+        results = await asyncio.gather(*(fetch_dexscreener_tokens(chunk) for chunk in chunks))
+        for chunk, token_infos in zip(chunks, results):
+            for contract in chunk:
+                if not batch[contract].done():
+                    batch[contract].set_result(token_infos.get(contract) if token_infos is not None else None)
+    finally:
+        for future in batch.values(): # Cancelled flush: waiting alerts get "lookup failed" instead of hanging
+            if not future.done():
+                future.set_result(None)
+# ===> END DexScreener Batch Lookups <===
+
+
+# ===> Enrichment Cache <===
+# DexScreener results per CA in a bounded LRU (OrderedDict, most recent last).
+# Tokens with pairs are kept for ENRICHMENT_TTL_SECONDS; "no pairs found" results get a
+# shorter TTL, since fresh tokens get their first pair within minutes. Errors are not cached.
+# Persisted to enrichment_cache.json so a restart doesn't start cold.
+ENRICHMENT_CACHE_FILE = "enrichment_cache.json"
+ENRICHMENT_CACHE_MAX_ENTRIES = 2000
+ENRICHMENT_TTL_SECONDS = 600
+ENRICHMENT_NEGATIVE_TTL_SECONDS = 90
+ENRICHMENT_CACHE_SAVE_EVERY = 20 # New entries between saves
+enrichment_cache = OrderedDict() # CA -> {"info": token_info, "expires": epoch seconds}
+enrichment_cache_stats = {"hits": 0, "negative_hits": 0, "misses": 0, "expired": 0, "evictions": 0, "errors": 0}
+enrichment_cache_unsaved = 0
+
+
+def load_enrichment_cache():
+    """Loads the persisted cache, skipping expired entries."""
+    global enrichment_cache
+    enrichment_cache = OrderedDict()
+    try:
+        if os.path.exists(ENRICHMENT_CACHE_FILE):
+            with open(ENRICHMENT_CACHE_FILE, 'r') as f:
+                loaded = json.load(f)
+            now = time.time()
+            for contract, entry in loaded.items() if isinstance(loaded, dict) else []:
+                if isinstance(entry, dict) and isinstance(entry.get("info"), dict) and entry.get("expires", 0) > now:
+                    enrichment_cache[contract] = entry
+            print(f"[Enrichment Cache] {len(enrichment_cache)} cached CA lookups loaded.")
+    except (json.JSONDecodeError, Exception) as e:
+        print(f"Error loading enrichment cache: {e}. Starting empty.")
+        enrichment_cache = OrderedDict()
 
-            if not isinstance(pair_data_candidate, dict):
-                print(f"DEBUG IMAGE FUNC: Pair #{i} is not a dict. Skipping.")
-                continue
 
-            candidate_chain_id = pair_data_candidate.get("chainId", "").lower()
-            print(f"DEBUG IMAGE FUNC: Pair #{i} chainId: '{candidate_chain_id}'")
+def save_enrichment_cache():
+    """Writes the cache snapshot (tmp file + replace)."""
+    global enrichment_cache_unsaved
+    try:
+        tmp_file = ENRICHMENT_CACHE_FILE + ".tmp"
+        with open(tmp_file, 'w') as f:
+            json.dump(enrichment_cache, f)
+        os.replace(tmp_file, ENRICHMENT_CACHE_FILE)
+        enrichment_cache_unsaved = 0
+    except Exception as e:
+        print(f"Error saving enrichment cache: {e}")
 
-            if candidate_chain_id == "solana":
-                base_token_addr = pair_data_candidate.get("baseToken", {}).get("address", "").lower()
-                quote_token_addr = pair_data_candidate.get("quoteToken", {}).get("address", "").lower()
-                print(f"DEBUG IMAGE FUNC: Pair #{i} (Solana) - Base: '{base_token_addr}', Quote: '{quote_token_addr}', Searched CA: '{contract_address.lower()}'")
 
-                if contract_address.lower() == base_token_addr or contract_address.lower() == quote_token_addr:
-                    logger.info(f"[DexScreenerImage] Found RELEVANT Solana pair #{i} for {contract_address}.")
-                    print(f"DEBUG IMAGE FUNC: Pair #{i} IS RELEVANT for {contract_address}.")
-                    
-                    info_object = pair_data_candidate.get("info")
-                    open_graph_url = None
-
-                    if isinstance(info_object, dict):
-                        print(f"DEBUG IMAGE FUNC: 'info' object found in pair #{i}: {str(info_object)[:200]}")
-                        # EXAKT das Feld "openGraph" innerhalb des "info"-Objekts suchen
-                        open_graph_url = info_object.get("openGraph")
-                        print(f"DEBUG IMAGE FUNC: Value of 'info.openGraph' in pair #{i}: '{open_graph_url}'")
-                    else:
-                        print(f"DEBUG IMAGE FUNC: 'info' object NOT found or not a dict in pair #{i}. Cannot get 'openGraph'.")
-                        # Da "openGraph" im "info"-Objekt erwartet wird, hier None zurückgeben, wenn "info" fehlt.
-                        return None 
-
-                    if open_graph_url and isinstance(open_graph_url, str) and open_graph_url.startswith("http"):
-                        logger.info(f"[DexScreenerImage] SUCCESS: Found and using 'openGraph' URL from 'info' object in pair #{i} for {contract_address}: {open_graph_url}")
-                        print(f"DEBUG IMAGE FUNC: SUCCESS: Using 'openGraph' URL from 'info': {open_graph_url}")
-                        return open_graph_url
-                    
-                    if open_graph_url: # "openGraph" war da, aber ungültig
-                        logger.warning(f"[DexScreenerImage] Field 'info.openGraph' (value: '{open_graph_url}') found in pair #{i} for {contract_address}, but it's not a valid starting HTTP URL. No image will be used.")
-                        print(f"DEBUG IMAGE FUNC: 'info.openGraph' in pair #{i} was not a valid HTTP URL: '{open_graph_url}'")
-                    else: # "openGraph" Feld nicht im "info"-Objekt gefunden
-                        logger.info(f"[DexScreenerImage] 'openGraph' field NOT FOUND or is None in 'info' object of relevant pair #{i} for {contract_address}. No image will be used.")
-                        print(f"DEBUG IMAGE FUNC: 'openGraph' field NOT FOUND or None in 'info' object of relevant pair #{i}.")
-                    
-                    return None # Nur "openGraph" aus "info" zählt, und es war nicht gültig/vorhanden
-                else:
-                    print(f"DEBUG IMAGE FUNC: Pair #{i} (Solana) is NOT relevant for CA {contract_address} (base/quote mismatch).")
-            else:
-                print(f"DEBUG IMAGE FUNC: Pair #{i} is NOT on Solana chain (is '{candidate_chain_id}').")
-        
-        logger.info(f"[DexScreenerImage] No relevant Solana pair containing a valid 'info.openGraph' URL was found for {contract_address} after checking all {len(data['pairs'])} pairs.")
-        print(f"DEBUG IMAGE FUNC: No relevant Solana pair with 'info.openGraph' found for {contract_address}.")
+def enrichment_cache_get(contract, count=True):
+    """
+    Cached token info for a CA, or None on miss/expiry. Counts hits and misses;
+    re-reads of a post that was already counted (digests) pass count=False.
+    """
+    entry = enrichment_cache.get(contract)
+    if entry is None:
+        if count:
+            enrichment_cache_stats["misses"] += 1
         return None
+    if entry["expires"] <= time.time():
+        del enrichment_cache[contract]
+        if count:
+            enrichment_cache_stats["expired"] += 1
+            enrichment_cache_stats["misses"] += 1
+        return None
+    enrichment_cache.move_to_end(contract)
+    if count:
+        enrichment_cache_stats["hits" if entry["info"]["found"] else "negative_hits"] += 1
+    return entry["info"]
+
+
+def enrichment_cache_put(contract, token_info):
+    """Stores a lookup result with the TTL matching its outcome; evicts least recently used entries."""
+    global enrichment_cache_unsaved
+    ttl = ENRICHMENT_TTL_SECONDS if token_info["found"] else ENRICHMENT_NEGATIVE_TTL_SECONDS
+    enrichment_cache[contract] = {"info": token_info, "expires": time.time() + ttl}
+    enrichment_cache.move_to_end(contract)
+    while len(enrichment_cache) > ENRICHMENT_CACHE_MAX_ENTRIES:
+        enrichment_cache.popitem(last=False)
+        enrichment_cache_stats["evictions"] += 1
+    enrichment_cache_unsaved += 1
+    if enrichment_cache_unsaved >= ENRICHMENT_CACHE_SAVE_EVERY:
+        save_enrichment_cache()
+
+
+async def fetch_token_info_coalesced(contract_address):
+    """Cache-miss path (the only DexScreener lookup path): posts with the same CA arriving together share one request."""
+    return await single_flight(("dexscreener", contract_address), lambda: _fetch_and_cache_token_info(contract_address))
+
+
+async def _fetch_and_cache_token_info(contract_address):
+    token_info = await fetch_dexscreener_token(contract_address)
+    if token_info is None:
+        enrichment_cache_stats["errors"] += 1
+        return None
+    enrichment_cache_put(contract_address, token_info)
+    start_photo_hash_prefetch(token_info["image_url"]) # Off the sending path, see Telegram File ID Cache
+    return token_info
+
+
+def format_enrichment_cache_stats():
+    """Plain text summary for /cachestats."""
+    stats = enrichment_cache_stats
+    lookups = stats["hits"] + stats["negative_hits"] + stats["misses"]
+    hit_rate = (stats["hits"] + stats["negative_hits"]) / lookups * 100 if lookups else 0.0
+    negative_entries = sum(1 for entry in enrichment_cache.values() if not entry["info"]["found"])
+    return (
+        f"🗄️ Enrichment Cache (DexScreener per CA)\n"
+        f"Size: {len(enrichment_cache)}/{ENRICHMENT_CACHE_MAX_ENTRIES} ({negative_entries} 'no pairs')\n"
+        f"Hit rate: {hit_rate:.1f}% of {lookups} lookups\n"
+        f"Hits: {stats['hits']} | Negative hits: {stats['negative_hits']} | Misses: {stats['misses']}\n"
+        f"Expired: {stats['expired']} | Evicted: {stats['evictions']} | Fetch errors (not cached): {stats['errors']}\n"
+        f"TTL: {ENRICHMENT_TTL_SECONDS}s found / {ENRICHMENT_NEGATIVE_TTL_SECONDS}s not found\n"
+        f"Single-flight: {single_flight_stats['coalesced']} lookups joined an in-flight request ({single_flight_stats['started']} started)\n"
+        f"Batching: {dexscreener_batch_stats['addresses']} CAs resolved with {dexscreener_batch_stats['requests']} DexScreener requests"
+    )
+# ===> END Enrichment Cache <===
 
-    # ... (Rest der Fehlerbehandlung bleibt gleich) ...
-    except requests.exceptions.Timeout:
-        logger.error(f"[DexScreenerImage] Timeout fetching image data for {contract_address}.")
-        print(f"DEBUG IMAGE FUNC: Timeout for {contract_address}.")
-    except requests.exceptions.HTTPError as e:
-        logger.error(f"[DexScreenerImage] HTTP error for {contract_address}: {e}. Status: {e.response.status_code}. Response: {e.response.text[:300]}")
-        print(f"DEBUG IMAGE FUNC: HTTP Error for {contract_address}: {e.response.status_code}")
-    except json.JSONDecodeError as e:
-        logger.error(f"[DexScreenerImage] JSON decode error for {contract_address}: {e}. Response text: {response.text[:300] if 'response' in locals() else 'N/A'}")
-        print(f"DEBUG IMAGE FUNC: JSON Decode Error for {contract_address}.")
-    except Exception as e: 
-        logger.error(f"[DexScreenerImage] Unexpected error fetching/processing image URL for {contract_address}: {e}", exc_info=True)
-        print(f"DEBUG IMAGE FUNC: Unexpected Error for {contract_address}: {e}")
-    
-    print(f"DEBUG IMAGE FUNC: Returning None at the end for {contract_address}.")
-    return None
-
-def get_contract_links(contract, chain):
-    """Generate links for exploring a contract on various platforms based on config."""
+def get_contract_links(contract, chain, token_info=None):
+    """Generate links for exploring a contract on various platforms based on config.
+    token_info is the fetch_dexscreener_token() result for Solana CAs (Axiom needs its pair address)."""
     global link_display_config # Zugriff auf die globale Konfiguration
     # ===== START: get_contract_links =====
     # print(f"--- GET_CONTRACT_LINKS --- ENTERED for contract: {contract}, chain: {chain}") # Kann für Debugging bleiben
@@ -8163,19 +8869,7 @@ def get_contract_links(contract, chain):
         # --- Axiom link generation (conditional) ---
         if link_display_config.get("sol_axiom", False):
             # print(f"--- GET_CONTRACT_LINKS --- Attempting Axiom link generation for {contract}.")
-            contractaxiom_pair_address = None
-            dex_api_url = f"https://api.dexscreener.com/latest/dex/search?q={contract}"
-            try:
-                response = requests.get(dex_api_url, timeout=10)
-                response.raise_for_status()
-                data = response.json()
-                if data and data.get("pairs") and isinstance(data["pairs"], list) and len(data["pairs"]) > 0:
-                    first_pair = data["pairs"][0]
-                    if isinstance(first_pair, dict) and first_pair.get("pairAddress"):
-                        contractaxiom_pair_address = first_pair["pairAddress"]
-            except Exception: # Einfaches Fehlerhandling hier, da es nur ein Link ist
-                pass # print(f"--- GET_CONTRACT_LINKS --- Axiom API UNEXPECTED ERROR for {contract}: {e}")
-
+            contractaxiom_pair_address = token_info.get("pair_address") if token_info else None
             if contractaxiom_pair_address:
                 links_list.append(f"  <a href=\"https://axiom.trade/meme/{contractaxiom_pair_address}\">AXIOM 🔺</a>\n")
         # --- End Axiom link generation ---
@@ -8288,83 +8982,176 @@ def format_time(datetime_str):
     return formatted_string, is_recent
 
 
-def format_token_info(tweet_text):
+# ===> Token Scanner <===
+# One regex pass over the post text yields $tickers, Solana and EVM address
+# candidates. Candidates are validated structurally before anything touches
+# the network: Solana addresses must base58-decode to exactly 32 bytes,
+# mixed-case EVM addresses must carry a valid EIP-55 checksum.
+# A ticker ends at the first non-word character, so "$SOL:<CA>" still yields the CA;
+# "$PEPE/<CA>" is matched as a pair (a "/" before an address otherwise means a URL path).
+TOKEN_SCAN_PATTERN = re.compile(
+    r"""(?<!\S)(?P<ticker>\$[A-Za-z0-9_]+)(?:/(?:(?P<pair_evm>0x[0-9a-fA-F]{40})|(?P<pair_sol>[1-9A-HJ-NP-Za-km-z]{32,44}))(?![A-Za-z0-9/"'&?]))?"""
+    r"""|(?<![A-Za-z0-9/"'=&?])(?:(?P<evm>0x[0-9a-fA-F]{40})|(?P<sol>[1-9A-HJ-NP-Za-km-z]{32,44}))(?![A-Za-z0-9/"'&?])"""
+)
+TICKER_AMOUNT_PATTERN = re.compile(r"^[0-9][0-9,.]*([KkMmBbTt])?$") # $100, $1.5k, $2M are amounts, not tickers
+
+BASE58_ALPHABET = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+_BASE58_INDEX = {char: index for index, char in enumerate(BASE58_ALPHABET)}
+
+
+def base58_decode(value):
+    """Decodes a base58 (Bitcoin alphabet) string to bytes, None if it contains invalid characters."""
+    number = 0
+    for char in value:
+        digit = _BASE58_INDEX.get(char)
+        if digit is None:
+            return None
+        number = number * 58 + digit
+    leading_zeros = len(value) - len(value.lstrip("1"))
+    body = number.to_bytes((number.bit_length() + 7) // 8, "big") if number else b""
+    return b"\x00" * leading_zeros + body
+
+
+def is_valid_solana_address(address):
+    """A Solana address (public key) is 32 bytes encoded as 32-44 base58 characters."""
+    if not 32 <= len(address) <= 44:
+        return False
+    decoded = base58_decode(address)
+    return decoded is not None and len(decoded) == 32
+
+
+# Keccak-256 (the pre-NIST padding Ethereum uses; hashlib.sha3_256 gives different digests)
+_KECCAK_ROUND_CONSTANTS = (
+    0x0000000000000001, 0x0000000000008082, 0x800000000000808A, 0x8000000080008000,
+    0x000000000000808B, 0x0000000080000001, 0x8000000080008081, 0x8000000000008009,
+    0x000000000000008A, 0x0000000000000088, 0x0000000080008009, 0x000000008000000A,
+    0x000000008000808B, 0x800000000000008B, 0x8000000000008089, 0x8000000000008003,
+    0x8000000000008002, 0x8000000000000080, 0x000000000000800A, 0x800000008000000A,
+    0x8000000080008081, 0x8000000000008080, 0x0000000080000001, 0x8000000080008008,
+)
+_KECCAK_ROTATIONS = ( # [x][y]
+    (0, 36, 3, 41, 18), (1, 44, 10, 45, 2), (62, 6, 43, 15, 61), (28, 55, 25, 21, 56), (27, 20, 39, 8, 14),
+)
+_KECCAK_MASK = (1 << 64) - 1
+
+
+def _keccak_f1600(lanes):
+    for round_constant in _KECCAK_ROUND_CONSTANTS:
+        columns = [lanes[x] ^ lanes[x + 5] ^ lanes[x + 10] ^ lanes[x + 15] ^ lanes[x + 20] for x in range(5)]
+        for x in range(5):
+            rotated = ((columns[(x + 1) % 5] << 1) | (columns[(x + 1) % 5] >> 63)) & _KECCAK_MASK
+            d = columns[(x - 1) % 5] ^ rotated
+            for y in range(0, 25, 5):
+                lanes[x + y] ^= d
+        moved = [0] * 25
+        for x in range(5):
+            for y in range(5):
+                shift = _KECCAK_ROTATIONS[x][y]
+                lane = lanes[x + 5 * y]
+                moved[y + 5 * ((2 * x + 3 * y) % 5)] = ((lane << shift) | (lane >> (64 - shift))) & _KECCAK_MASK if shift else lane
+        for y in range(0, 25, 5):
+            row = moved[y:y + 5]
+            for x in range(5):
+                lanes[x + y] = row[x] ^ (~row[(x + 1) % 5] & row[(x + 2) % 5])
+        lanes[0] ^= round_constant
+
+
+def keccak256(data):
+    """Keccak-256 digest of bytes."""
+    rate = 136
+    padded = bytearray(data) + b"\x01" + b"\x00" * ((rate - len(data) - 1) % rate)
+    padded[-1] |= 0x80
+    lanes = [0] * 25
+    for offset in range(0, len(padded), rate):
+        for i in range(rate // 8):
+            lanes[i] ^= int.from_bytes(padded[offset + 8 * i:offset + 8 * i + 8], "little")
+        _keccak_f1600(lanes)
+    return b"".join(lane.to_bytes(8, "little") for lane in lanes[:4])
+
+
+def is_valid_evm_address(address):
+    """0x + 40 hex chars; all-lower/all-upper is accepted, mixed case must match the EIP-55 checksum."""
+    if len(address) != 42 or not address.startswith("0x"):
+        return False
+    body = address[2:]
+    if any(char not in "0123456789abcdefABCDEF" for char in body):
+        return False
+    if body == body.lower() or body == body.upper():
+        return True
+    digest = keccak256(body.lower().encode("ascii")).hex()
+    return all(
+        char.isdigit() or (char.isupper() == (int(digest[i], 16) >= 8))
+        for i, char in enumerate(body)
+    )
+
+
+def scan_token_candidates(text):
+    """
+    Single pass over text. Returns (tickers, contracts): tickers as cleaned
+    "$XYZ" strings, contracts as [(address, chain)] in order of appearance,
+    both de-duplicated. Only validated addresses are returned.
+    """
+    tickers = []
+    contracts = []
+    seen = set()
+    for match in TOKEN_SCAN_PATTERN.finditer(text or ""):
+        ticker = match.group("ticker")
+        if ticker and not TICKER_AMOUNT_PATTERN.fullmatch(ticker[1:]) and ticker not in seen:
+            seen.add(ticker)
+            tickers.append(ticker)
+        sol_address = match.group("sol") or match.group("pair_sol")
+        evm_address = match.group("evm") or match.group("pair_evm")
+        for value, chain, is_valid in ((sol_address, "solana", is_valid_solana_address), (evm_address, "bsc", is_valid_evm_address)):
+            if value and value not in seen:
+                seen.add(value)
+                if is_valid(value):
+                    contracts.append((value, chain))
+    return tickers, contracts
+# ===> END Token Scanner <===
+
+
+def format_token_info(tweet_text, token_infos=None):
     """
     Extracts and formats Tickers ($) and Contract Addresses (CA)
     from a post text. Filters out pure currency amounts and amounts
     with K/M/B/T suffixes from tickers. Ticker extraction is conditional.
+    CAs are validated by scan_token_candidates(). No network: DexScreener data
+    (image, symbol, liquidity, Axiom pair) is taken from token_infos {CA: token info}
+    when present, so the same function renders the first alert and its enriched edit.
     """
     global search_tickers_enabled # Access the global setting
 
-    # --- Ticker ($) Extraction and Cleanup (Conditional) ---
+    # --- Tickers ($) and Contract Addresses (CA) in one validated pass ---
+    tickers, filtered_ca_matches = scan_token_candidates(tweet_text)
+
     ticker_section = "" # Initialize ticker_section to empty string
+    if search_tickers_enabled and tickers:
+        unique_tickers = sorted(tickers)
+        ticker_section = "\n💲 " + "".join(f"<code>{html.escape(ticker)}</code> " for ticker in unique_tickers).strip()
 
-    # Check if ticker search should be performed
-    if search_tickers_enabled:
-        all_potential_tickers = [word for word in tweet_text.split() if word.startswith("$")]
-        tickers = []
-        punctuation_to_strip = '.,;:!?()&"\'+-/' # Remove punctuation at the end
-
-        # Regex to recognize pure numeric amounts (optional with .,) and those with K/M/B/T
-        currency_pattern = r"^[0-9][0-9,.]*([KkMmBbTt])?$"
-
-        # Loop for processing potential tickers
-        for potential_ticker in all_potential_tickers:
-            cleaned = potential_ticker.rstrip(punctuation_to_strip)
-            if len(cleaned) <= 1: continue
-            value_part = cleaned[1:]
-            if re.fullmatch(currency_pattern, value_part, re.IGNORECASE): continue
-            tickers.append(cleaned)
-
-        # Assign to ticker_section only if tickers were found
-        if tickers:
-            unique_tickers = sorted(list(set(tickers)))
-            ticker_section = "\n💲 " + "".join(f"<code>{html.escape(ticker)}</code> " for ticker in unique_tickers).strip()
-
-    # --- Contract Address (CA) Extraction and Formatting ---
     dexscreener_image_url_for_post = None 
 
-    try:
-        ca_matches = re.findall(TOKEN_PATTERN, tweet_text)
-    except NameError:
-        print("ERROR: TOKEN_PATTERN is not defined!")
-        ca_matches = []
-
-    filtered_ca_matches = []
-    seen_tokens = set()
-
-    for match in ca_matches:
-        try:
-            chain = detect_chain(match)
-            if chain != 'unknown' and match not in seen_tokens:
-                filtered_ca_matches.append(match)
-                seen_tokens.add(match)
-        except NameError:
-            # Handle case where detect_chain might be missing during development/error
-            if match not in seen_tokens:
-                seen_tokens.add(match) # Still track to avoid duplicates if pattern matches
-            continue # Skip chain/link processing if detect_chain fails
-
     contract_section = ""
     if filtered_ca_matches:
         contract_section += "\n📝 " # A blank line before
-        for contract in filtered_ca_matches:
-            try:
-                chain = detect_chain(contract)
-            except NameError:
-                chain = "unknown" # Fallback if detect_chain is missing
-
-            if chain == 'solana' and dexscreener_image_url_for_post is None:
-                img_url = get_dexscreener_image_url_for_solana(contract) # 'contract' ist hier deine Schleifenvariable
-                if img_url:
-                    dexscreener_image_url_for_post = img_url
-                    logger.info(f"[FormatTokenInfo]    Using DexScreener image for post (from CA {contract}): {dexscreener_image_url_for_post}")
+        for contract, chain in filtered_ca_matches:
+            # One DexScreener lookup per Solana CA serves both the post image and the Axiom link
+            token_info = (token_infos or {}).get(contract) if chain == 'solana' else None
+            if token_info and token_info["image_url"] and dexscreener_image_url_for_post is None:
+                dexscreener_image_url_for_post = token_info["image_url"]
+                logger.info(f"[FormatTokenInfo]    Using DexScreener image for post (from CA {contract}): {dexscreener_image_url_for_post}")
 
             contract_section += f"<code>{html.escape(contract)}</code>\n"
-            contract_section += f"🧬 {chain.upper()}\n"
+            chain_line = f"🧬 {chain.upper()}"
+            if token_info and token_info["found"]:
+                if token_info["symbol"]:
+                    chain_line += f" · ${html.escape(str(token_info['symbol']))}"
+                if isinstance(token_info["liquidity_usd"], (int, float)):
+                    chain_line += f" · 💧 {format_usd_compact(token_info['liquidity_usd'])}"
+            contract_section += chain_line + "\n"
 
             try:
-                links_html = get_contract_links(contract, chain)
+                links_html = get_contract_links(contract, chain, token_info)
                 if links_html:
                     contract_section += "\n" + links_html
             except NameError:
@@ -8381,557 +9168,1828 @@ def format_token_info(tweet_text):
     logger.debug(f"[FormatTokenInfo] Returning: ticker_found_flag={ticker_found_flag}, dexscreener_og_image_url='{dexscreener_image_url_for_post}'")
     return ticker_section, contract_section, ticker_found_flag, dexscreener_image_url_for_post
 
-async def process_tweets():
-    """
-    Process posts in the timeline. Optimized to only search when necessary,
-    scrolls down, and processes posts *immediately* upon finding them
-    to avoid StaleElementReferenceExceptions. INCLUDES ENHANCED DEBUG LOGGING FOR AUTHOR EXTRACTION.
-    """
-    global driver, is_scraping_paused, first_run, processed_tweets, KEYWORDS, TOKEN_PATTERN, search_mode, ratings_data
-
-    if is_scraping_paused: return
-    if driver is None:
-        logger.warning("process_tweets called but driver is None. Skipping.")
-        return
-
-    try:
-        button_tweet_count = await check_new_tweets_button()
-        should_search_and_process = first_run or button_tweet_count > 0
+# ===> Batched Post Extraction <===
+# One article -> one raw record, evaluated inside the page. Kept as a standalone
+# JS function so other page-side code can reuse the exact same extraction.
+POST_RECORD_JS = r"""
+function rawbotPostRecord(article, cutoffMs) {
+    var link = article.querySelector('a[href*="/status/"]');
+    if (!link) return null;
+    var url = link.href || '';
+    var idMatch = url.match(/\/status\/(\d+)/);
+    if (!idMatch) return null;
+
+    var isAd = Array.prototype.some.call(article.querySelectorAll('span'), function (s) {
+        var t = (s.textContent || '').trim();
+        return t === 'Ad' || t === 'Anzeige';
+    });
+
+    var sc = article.querySelector('span[data-testid="socialContext"]');
+    var scText = sc ? (sc.innerText || '').trim() : '';
+
+    // Snowflake ID -> creation time; stale posts are returned without further detail extraction.
+    // Ad and repost flags are kept, the scroll loop needs them for its stop condition.
+    if (cutoffMs) {
+        var createdMs = Number(BigInt(idMatch[1]) >> BigInt(22)) + 1288834974657;
+        if (createdMs < cutoffMs) {
+            return {id: idMatch[1], url: url, is_stale: true, is_ad: isAd, social_context_text: scText};
+        }
+    }
 
-        if not should_search_and_process:
-            return
+    var scLink = sc ? (sc.querySelector('a[href]') || sc.closest('a[href]')) : null;
 
-        print("Searching and processing new posts (with scrolling)...") # Translated
-        target_new_button_tweets = button_tweet_count
-        processed_in_this_round = set()
-        newly_processed_count = 0
-        #  Counter for posts processed since the button click
-        processed_since_button_click = 0
-        max_scroll_attempts = 20 # Keep safety limit
-        scroll_attempt = 0
-        consecutive_scrolls_without_new = 0
-        max_consecutive_scrolls_without_new = 3 # Keep fallback limit
-        target_met_flag = False # Flag to break outer loop when target is met
+    var timeEl = article.querySelector('time[datetime]');
 
-        # The loop runs until the target is reached OR fallbacks trigger
-        while scroll_attempt < max_scroll_attempts:
-            # The primary break condition is checked *inside* the loop
-            scroll_attempt += 1
-            found_in_this_scroll = 0
-            current_containers = []
-            try:
-                current_containers = driver.find_elements(By.XPATH, '//article[@data-testid="tweet"]')
-                if not current_containers:
-                    print(f"Scroll attempt {scroll_attempt}/{max_scroll_attempts}: No post containers found.") # Translated
-                    await asyncio.sleep(1)
-                    continue
-            except Exception as e_find:
-                 print(f"Error finding post containers (Scroll loop {scroll_attempt}): {e_find}") # Translated
-                 break
+    var userBlock = article.querySelector('div[data-testid="User-Name"]');
+    var userLink = userBlock ? userBlock.querySelector('a[href*="/"]') : null;
+    var nameSpan = userBlock ? userBlock.querySelector('span') : null;
 
-            print(f"Scroll attempt {scroll_attempt}/{max_scroll_attempts}: {len(current_containers)} containers found. Processing new ones...") # Translated
+    var textEl = article.querySelector('div[data-testid="tweetText"]');
 
-            for container in current_containers:
-                tweet_id = None
-                tweet_url = None
-                # === 1. Extract ID and URL ===
-                try:
-                    link_element = WebDriverWait(container, 0.5).until(
-                        EC.presence_of_element_located((By.XPATH, './/a[contains(@href, "/status/")]'))
-                    )
-                    tweet_url = link_element.get_attribute('href')
-                    tweet_id_match = re.search(r'/status/(\d+)', tweet_url)
-                    if tweet_id_match:
-                        tweet_id = tweet_id_match.group(1)
-                    else:
-                        continue
-                except (TimeoutException, NoSuchElementException, StaleElementReferenceException):
-                    continue
-                except Exception as e_id_extract:
-                    print(f"WARNING: Unexpected error extracting ID/URL: {e_id_extract}") # Translated
-                    continue
+    var images = [];
+    article.querySelectorAll('div[data-testid="tweetPhoto"] img[alt="Image"]').forEach(function (img) {
+        var src = img.getAttribute('src');
+        if (src && images.indexOf(src) === -1) images.push(src);
+    });
 
-                # === 2. Check if already processed ===
-                if tweet_id in processed_tweets or tweet_id in processed_in_this_round:
-                    continue
+    var showMore = !!article.querySelector('[data-testid="tweet-text-show-more-link"]');
+    if (!showMore && textEl) {
+        showMore = Array.prototype.some.call(textEl.querySelectorAll('span, a, button'), function (el) {
+            var t = (el.textContent || '').trim();
+            return el.tagName === 'SPAN' ? t === 'Show more' : t.indexOf('Show more') !== -1;
+        });
+    }
 
+    return {
+        id: idMatch[1],
+        url: url,
+        is_ad: isAd,
+        social_context_text: scText,
+        reposter_href: scLink ? scLink.href : null,
+        reposter_link_text: scLink ? (scLink.innerText || '').trim() : null,
+        datetime: timeEl ? timeEl.getAttribute('datetime') : null,
+        author_href: userLink ? userLink.href : null,
+        author_name_span: nameSpan ? (nameSpan.innerText || '').trim() : null,
+        author_block_text: userBlock ? (userBlock.innerText || '').trim() : null,
+        text: textEl ? textEl.innerText : null,
+        images: images,
+        show_more: showMore,
+        detected_ms: Date.now()
+    };
+}
+"""
 
-                # === TARGET COUNTING AND CHECK ===
-                # This is a NEW post for this round. Increment counter if target exists.
-                if target_new_button_tweets > 0:
-                    processed_since_button_click += 1
-                    print(f"    (Target Counter: {processed_since_button_click}/{target_new_button_tweets})") # Optional debug log
+TIMELINE_EXTRACT_JS = POST_RECORD_JS + r"""
+var cutoffMs = arguments[0];
+return Array.prototype.map.call(
+    document.querySelectorAll('article[data-testid="tweet"]'),
+    function (article) { return rawbotPostRecord(article, cutoffMs); }
+).filter(function (r) { return r !== null; });
+"""
 
-                    # Check if target is met *before* processing details
-                    if processed_since_button_click > target_new_button_tweets:
-                         # This handles cases where the button count was slightly off
-                         # or we already processed enough in previous iterations of the *outer* loop.
-                         print(f"Target of {target_new_button_tweets} already met or exceeded. Setting flag and breaking inner loop.")
-                         target_met_flag = True
-                         break # Exit the inner 'for' loop
+SNOWFLAKE_EPOCH_MS = 1288834974657 # X/Twitter Snowflake epoch (2010-11-04 01:42:54.657 UTC)
+SNOWFLAKE_MIN_ID = 1 << 32 # Older (pre-Snowflake) IDs carry no timestamp
+SNOWFLAKE_TIME_TOLERANCE_SECONDS = 120 # Allowed difference between ID time and <time> before logging
 
-                    # If exactly the target number is reached now, process this one last post
-                    # and then set the flag to break the outer loop afterwards.
-                    if processed_since_button_click == target_new_button_tweets:
-                        print(f"Target of {target_new_button_tweets} will be met after processing this post.")
-                        # We don't break here yet, process this post first.
-                        # The flag will be checked after the inner loop.
-                        target_met_flag = True # Set flag to break outer loop *after* this inner loop finishes
 
-                # === 3. Process post IMMEDIATELY ===
-                print(f"  -> Processing new post: {tweet_id}") # Translated
-                increment_scanned_count()
+def snowflake_to_datetime(tweet_id):
+    """Decodes the UTC creation time from a post ID ((id >> 22) + epoch in ms). Returns None if not a Snowflake."""
+    try:
+        id_int = int(tweet_id)
+    except (TypeError, ValueError):
+        return None
+    if id_int < SNOWFLAKE_MIN_ID:
+        return None
+    return datetime.fromtimestamp(((id_int >> 22) + SNOWFLAKE_EPOCH_MS) / 1000, tz=timezone.utc)
 
-                process_success = False # Will be set to True later if processing succeeds
-                try:
-                    # --- Ad Check ---
-                    is_ad = False
-                    try:
-                        # Search directly, without waiting
-                        ad_indicators = container.find_elements(By.XPATH, './/span[text()="Ad" or text()="Anzeige"]') # Keep "Anzeige" for German UI? Or remove? Let's remove for consistency.
-                        # ad_indicators = container.find_elements(By.XPATH, './/span[text()="Ad"]') # English only
-                        # If the list is not empty, an indicator was found
-                        if ad_indicators:
-                            is_ad = True
-                    except (NoSuchElementException, StaleElementReferenceException): pass # Catch errors during search itself
-
-                    if is_ad:
-                        print(f"    post {tweet_id} is an ad -> skipping") # Translated
-                        increment_ad_total_count()
-                        processed_in_this_round.add(tweet_id)
-                        processed_tweets.append(tweet_id)
-                        found_in_this_scroll += 1
-                        continue
 
-                    # --- Repost Check ---
-                    is_repost = False; repost_text = ""
-                    try:
-                        # Search directly, without waiting
-                        sc_elements = container.find_elements(By.XPATH, './/span[@data-testid="socialContext"]')
-                        # If the list is not empty, the element was found
-                        if sc_elements:
-                            repost_text = sc_elements[0].text.strip() # Take the text of the first found element
-                            is_repost = bool(repost_text) # Check if text is present
-                            if is_repost: print(f"    Repost found: {repost_text}") # Translated
-                    except (NoSuchElementException, StaleElementReferenceException): pass # Catch errors during search itself
-
-                    # --- Time ---
-                    datetime_str = ""; time_str = "📅 Time Unknown"; tweet_is_recent = False # Translated
-                    try:
-                        te = WebDriverWait(container, 0.3).until(EC.presence_of_element_located((By.XPATH, './/time[@datetime]'))) # <-- Timeout reduced
-                        datetime_str = te.get_attribute('datetime')
-                        if datetime_str: time_str, tweet_is_recent = format_time(datetime_str)
-                    except (TimeoutException, NoSuchElementException, StaleElementReferenceException): pass
-
-                    # --- Skip if older than 15 minutes (strict check) ---
-                    # This check now uses the updated 'is_recent' which is True only if < max_tweet_age_minutes
-                    if not tweet_is_recent:
-                        # Use the global variable in the log message
-                        print(f"    post {tweet_id} skipped: Too old ({time_str} > {max_tweet_age_minutes} min)")
-                        # Mark as processed so we don't check it again in this round
-                        processed_in_this_round.add(tweet_id)
-                        processed_tweets.append(tweet_id)
-                        # IMPORTANT: Do not increment processed_since_button_click here
-                        # because this post doesn't count towards the button's target.
-                        found_in_this_scroll += 1 # Still counts as found in this scroll view for the scroll logic
-                        continue # Skip to the next container immediately
-
-
-                    # --- Variables for both authors (reposter and original) ---
-                    author_name = "Unknown"  # Original author
-                    author_handle = "@unknown"  # Original author
-                    reposter_name = None  # Reposter (only for reposts)
-                    reposter_handle = None  # Reposter (only for reposts)
-
-
-                    # --- Reposter Extraction (only if is_repost is True) ---
-                    if is_repost:
-                        try:
-                            # Extract reposter info from the social context
-                            sc_element = WebDriverWait(container, 0.5).until(
-                                EC.presence_of_element_located((By.XPATH, './/span[@data-testid="socialContext"]'))
-                            )
+def snowflake_age_cutoff_ms():
+    """Oldest acceptable Snowflake creation time (epoch ms) for the current max_tweet_age_minutes."""
+    return int((time.time() - max_tweet_age_minutes * 60) * 1000)
 
-                            # Case where we can find the link directly
-                            try:
-                                # The social context link contains the reposter
-                                reposter_link = sc_element.find_element(By.XPATH, './/a[contains(@href, "/")]')
-                                reposter_href = reposter_link.get_attribute('href')
-
-                                # Extract the handle from the href
-                                if reposter_href:
-                                    raw_handle = reposter_href.split('/')[-1]
-                                    if re.match(r'^[A-Za-z0-9_]{1,15}$', raw_handle):
-                                        reposter_handle = "@" + raw_handle
-                                    else:
-                                        reposter_handle = "@unknown" # Translated
-
-                                # Extract the name from the link text
-                                full_text = reposter_link.text.strip()
-                                if " reposted" in full_text.lower():
-                                    reposter_name = full_text.lower().split(" reposted")[0].strip()
-                                else:
-                                    reposter_name = full_text.strip()
 
-                                print(f"    Reposter extracted (direct): Name='{reposter_name}', Handle='{reposter_handle}'") # Translated
-                            except (NoSuchElementException, StaleElementReferenceException):
-                                print("    DEBUG REPOST: Direct reposter link not found. Trying alternative method.") # Translated
+def _handle_from_href(href):
+    """Returns '@handle' from a profile link, or None if the last path part is no valid handle."""
+    if not href:
+        return None
+    raw_handle = href.rstrip('/').split('/')[-1]
+    if re.match(r'^[A-Za-z0-9_]{1,15}$', raw_handle):
+        return "@" + raw_handle
+    return None
 
-                                # Alternative: Extract the text and try to get the name
-                                full_context_text = sc_element.text.strip()
-                                if " reposted" in full_context_text.lower():
-                                    reposter_name = full_context_text.lower().split(" reposted")[0].strip()
-                                else:
-                                    reposter_name = "Unknown" # Translated
 
-                                # Try another alternative XPath for the link
-                                try:
-                                    alt_reposter_link = container.find_element(By.XPATH,
-                                        './/div[1]/div/div/div/div/div[2]/div/div/div/a[contains(@href, "/")]')
-                                    alt_href = alt_reposter_link.get_attribute('href')
-                                    if alt_href:
-                                        raw_handle = alt_href.split('/')[-1]
-                                        if re.match(r'^[A-Za-z0-9_]{1,15}$', raw_handle):
-                                            reposter_handle = "@" + raw_handle
-                                            print(f"    Reposter Handle found with alternative method: {reposter_handle}") # Translated
-                                except (NoSuchElementException, StaleElementReferenceException):
-                                    print("    DEBUG REPOST: Alternative reposter link also not found.") # Translated
-                                    reposter_handle = "@unknown" # Translated
-
-                                print(f"    Reposter extracted (alternative): Name='{reposter_name}', Handle='{reposter_handle}'") # Translated
+def normalize_post_record(raw):
+    """
+    Turns a raw page-side record into the post record used by process_tweets:
+    id, url, is_ad, is_repost, repost_text, reposter_name, reposter_handle,
+    author_name, author_handle, datetime, text, images, show_more.
+    """
+    repost_text = (raw.get("social_context_text") or "").strip()
+    is_repost = bool(repost_text)
+
+    reposter_name = None
+    reposter_handle = None
+    if is_repost:
+        reposter_handle = _handle_from_href(raw.get("reposter_href")) or "@unknown"
+        name_source = raw.get("reposter_link_text") or repost_text
+        if " reposted" in name_source.lower():
+            reposter_name = name_source.lower().split(" reposted")[0].strip()
+        else:
+            reposter_name = name_source.strip() or "Unknown"
+
+    author_handle = _handle_from_href(raw.get("author_href")) or "@unknown"
+    temp_name = (raw.get("author_name_span") or "").strip()
+    author_name = temp_name if temp_name and not temp_name.startswith('@') else (raw.get("author_block_text") or "").strip()
+    if author_handle != "@unknown" and author_handle in author_name:
+        author_name = author_name.replace(author_handle, '').strip()
+    if not author_name or author_name == author_handle:
+        author_name = f"Unknown ({author_handle})"
+
+    images = []
+    for src in raw.get("images") or []:
+        if src and 'profile_images' not in src and 'emoji' not in src and src not in images:
+            images.append(src)
+
+    return {
+        "id": str(raw.get("id")),
+        "url": raw.get("url"),
+        "is_ad": bool(raw.get("is_ad")),
+        "is_repost": is_repost,
+        "repost_text": repost_text,
+        "reposter_name": reposter_name,
+        "reposter_handle": reposter_handle,
+        "author_name": author_name,
+        "author_handle": author_handle,
+        "datetime": raw.get("datetime") or "",
+        "text": raw.get("text"),
+        "images": images,
+        "show_more": bool(raw.get("show_more")),
+        "is_stale": bool(raw.get("is_stale")), # Rejected by Snowflake age before detail extraction
+        "trace": new_post_trace(raw.get("id"), raw.get("detected_ms")),
+    }
 
-                        except (TimeoutException, NoSuchElementException, StaleElementReferenceException):
-                            print("    WARNING: Could not find socialContext for repost.") # Translated
-                            reposter_name = "Unknown" # Translated
-                            reposter_handle = "@unknown" # Translated
-                        except Exception as e_repost_context:
-                            print(f"    WARNING: Error extracting repost context: {e_repost_context}") # Translated
-                            reposter_name = "Unknown" # Translated
-                            reposter_handle = "@unknown" # Translated
-                    # --- Original Author Extraction (for every post) ---
-                    try:
-                        # Extract original author (User-Name) - always present
-                        try:
-                            nc_id = "User-Name"
-                            nc = WebDriverWait(container, 0.5).until(
-                                EC.presence_of_element_located((By.XPATH, f'.//div[@data-testid="{nc_id}"]'))
-                            )
 
-                            # Extract author link (Handle) from User-Name
-                            try:
-                                user_link = nc.find_element(By.XPATH, './/a[contains(@href, "/")]')
-                                user_href = user_link.get_attribute('href')
-                                if user_href:
-                                    raw_handle = user_href.split('/')[-1]
-                                    if re.match(r'^[A-Za-z0-9_]{1,15}$', raw_handle):
-                                        author_handle = "@" + raw_handle
-                            except (NoSuchElementException, StaleElementReferenceException):
-                                print("    WARNING: Could not find original author link.") # Translated
-
-                            # Extract name from the first span (or fallback to whole text)
-                            try:
-                                name_span = nc.find_element(By.XPATH, './/span[1]')
-                                temp_name = name_span.text.strip()
-                                author_name = temp_name if temp_name and not temp_name.startswith('@') else nc.text.strip()
-                            except (NoSuchElementException, StaleElementReferenceException):
-                                author_name = nc.text.strip()
+def _normalize_raw_records(raw_records):
+    """Normalizes a list of raw records, dropping (and logging) malformed ones."""
+    records = []
+    for raw in raw_records:
+        try:
+            records.append(normalize_post_record(raw))
+        except Exception as e_norm:
+            logger.warning(f"[Extract] Could not normalize record {raw.get('id') if isinstance(raw, dict) else raw}: {e_norm}")
+    return records
 
-                            # Remove handle from name if present
-                            if author_handle != "@unknown" and author_handle in author_name: # Translated
-                                author_name = author_name.replace(author_handle, '').strip()
 
-                            # Fallback for empty name
-                            if not author_name or author_name == author_handle:
-                                author_name = f"Unknown ({author_handle})" # Translated
+def extract_visible_posts():
+    """Extracts all post articles currently in the DOM with a single execute_script round trip."""
+    return _normalize_raw_records(driver.execute_script(TIMELINE_EXTRACT_JS, snowflake_age_cutoff_ms()) or [])
+# ===> END Batched Post Extraction <===
 
-                            print(f"    Original author extracted: {author_name} ({author_handle})") # Translated
-                        except (TimeoutException, NoSuchElementException, StaleElementReferenceException):
-                            print("    WARNING: Could not find original author.") # Translated
-                            author_name = f"Unknown ({author_handle})" # Translated
-                    except Exception as e_auth:
-                        print(f"    WARNING: Author extraction error: {e_auth}") # Translated
-                        author_name = f"Unknown ({author_handle})" # Translated
-
-                    # --- Content ---
-                    tweet_content = "[Content not found]" # Translated
-                    try:
-                        tt = WebDriverWait(container, 1).until(EC.presence_of_element_located((By.XPATH, './/div[@data-testid="tweetText"]')))
-                        tweet_content = tt.text
-                    except (TimeoutException, StaleElementReferenceException): print(f"    WARNING: Content not found for {tweet_id}.") # Translated
+# ===> Page Snapshot Parser (scan_mode "snapshot") <===
+# driver.page_source is transferred once per scroll step and parsed with
+# BeautifulSoup in a worker thread, producing the same raw records as POST_RECORD_JS.
+try:
+    import lxml # Optional, noticeably faster than the built-in parser
+    SNAPSHOT_HTML_PARSER = "lxml"
+except ImportError:
+    SNAPSHOT_HTML_PARSER = "html.parser"
 
-                    # --- Images ---
-                    image_urls = []
-                    try:
-                        pds = container.find_elements(By.XPATH, './/div[@data-testid="tweetPhoto"]')
-                        for div in pds:
-                            try:
-                                imgs = div.find_elements(By.XPATH, './/img[@alt="Image"]')
-                                for img in imgs:
-                                    try: src = img.get_attribute('src'); image_urls.append(src) if src and 'profile_images' not in src and 'emoji' not in src else None
-                                    except StaleElementReferenceException: pass
-                            except StaleElementReferenceException: pass
-                        image_urls = list(set(image_urls))
-                    except StaleElementReferenceException: pass
-
-                    # --- Relevance Check and Sending ---
-                    # format_token_info now returns: ticker_section, contract_section, ticker_actually_found_and_enabled
-                    # ticker_found from format_token_info already considers if search_tickers_enabled is True
-                    ticker_section, contract_section, ticker_found_and_enabled, dexscreener_img_url = format_token_info(tweet_content)
-                    
-                    contains_keyword_match = any(keyword.lower() in tweet_content.lower() for keyword in KEYWORDS)
-                    contains_ca_match = bool(contract_section) # True if a CA was found and formatted
+X_BASE_URL = "https://x.com"
 
-                    is_relevant = False
-                    reasons = []
 
-                    if search_keywords_enabled and contains_keyword_match:
-                        is_relevant = True
-                        # Add specific found keywords to reasons
-                        found_kws_in_post = [kw for kw in KEYWORDS if kw.lower() in tweet_content.lower()]
-                        if found_kws_in_post: reasons.extend(found_kws_in_post)
-                    
-                    if search_ca_enabled and contains_ca_match:
-                        is_relevant = True
-                        reasons.append("CA") # Generic "CA" reason if CA search is on and a CA is present
-                        
-                    # ticker_found_and_enabled is already true if search_tickers_enabled AND a ticker was found
-                    if ticker_found_and_enabled: 
-                        is_relevant = True
-                        reasons.append("Ticker")
-
-                    if is_relevant:
-                        # --- Rating Filter Check ---
-                        author_avg_rating = -1.0 # Default for unrated or error
-                        author_total_ratings = 0
-                        is_author_rated = author_handle in ratings_data
-
-                        if is_author_rated:
-                            rating_info = ratings_data[author_handle].get("ratings", {})
-                            if isinstance(rating_info, dict):
-                                for star_str, count in rating_info.items():
-                                    try:
-                                        star = int(star_str)
-                                        if 1 <= star <= 5:
-                                            author_total_ratings += count
-                                            author_avg_rating += star * count # Temporarily sum, will divide later
-                                    except ValueError: continue
-                                if author_total_ratings > 0:
-                                    author_avg_rating = author_avg_rating / author_total_ratings
-                                else: # Has entry but no actual ratings
-                                    author_avg_rating = -1.0 # Treat as unrated for filtering
-                                    is_author_rated = False # Correct flag
-                            else: # Invalid rating structure
-                                author_avg_rating = -1.0
-                                is_author_rated = False
-                        
-                        # Decision logic based on filters
-                        passes_rating_filter = False
-                        if not is_author_rated: # Author has no rating data at all
-                            if show_posts_from_unrated_enabled:
-                                passes_rating_filter = True
-                                print(f"    post {tweet_id} from unrated author @{author_handle} passes (Show Unrated: ON).")
-                            else:
-                                print(f"    post {tweet_id} from unrated author @{author_handle} SKIPPED (Show Unrated: OFF).")
-                        else: # Author is rated
-                            if author_avg_rating >= min_average_rating_for_posts:
-                                passes_rating_filter = True
-                                print(f"    post {tweet_id} from @{author_handle} (Avg: {author_avg_rating:.1f}) passes (Min Avg: {min_average_rating_for_posts:.1f}).")
-                            else:
-                                print(f"    post {tweet_id} from @{author_handle} (Avg: {author_avg_rating:.1f}) SKIPPED (Min Avg: {min_average_rating_for_posts:.1f}).")
-                        
-                        if not passes_rating_filter:
-                            # If it doesn't pass the rating filter, it's no longer relevant for sending
-                            is_relevant = False 
-                            print(f"    post {tweet_id} marked as NOT relevant due to rating filter.")
-                        # --- End Rating Filter Check ---
-
-                    # Continue with the original "if is_relevant:" block
-                    if is_relevant: # This 'is_relevant' might have been changed by the rating filter
-                        # reasons list is already built above
-                        
-                        reasons = sorted(list(set(reasons))) # Final list of reasons for display
-                        
-                        # Log the reasons
-                        if reasons:
-                            print(f"    post {tweet_id} relevant due to: {', '.join(sorted(list(set(reasons))))}")
-                        else:
-                            # This case should ideally not happen if is_relevant is True,
-                            # but as a fallback or for debugging:
-                            print(f"    post {tweet_id} marked relevant, but no specific reason (CA/Keyword/Ticker) captured for logging. Check logic.")
-                        
-                        increment_found_count()
-
-                        # --- Build message (corrected version) ---
-                        handle_for_command = author_handle.lstrip('@')
-
-                        # --- Get rating info ---
-                        rating_display = ""
-                        # Check if rating buttons are enabled before trying to display the rating
-                        if rating_buttons_enabled and author_handle in ratings_data: # Added rating_buttons_enabled check
-                            rating_info = ratings_data[author_handle].get("ratings", {})
-                            if isinstance(rating_info, dict):
-                                total_ratings = 0
-                                weighted_sum = 0
-                                for star_str, count in rating_info.items():
-                                    try:
-                                        star = int(star_str)
-                                        if 1 <= star <= 5:
-                                            total_ratings += count
-                                            weighted_sum += star * count
-                                    except ValueError: continue
-                                if total_ratings > 0:
-                                    average_rating = weighted_sum / total_ratings
-                                    rating_display = f" {average_rating:.1f}💎({total_ratings})" # Space at the beginning
-                        # --- End rating info ---
-
-                        user_info_line = f"👤 <b><a href=\"https://x.com/{html.escape(author_handle.lstrip('@'))}\">{html.escape(author_name)}</a></b> (<code><i>{html.escape(author_handle)}</i></code>){rating_display}" # Rating appended here (will be empty if ratings disabled)
-                        message_parts = [user_info_line]
-
-                        # --- Build message (for repost) ---
-                        if is_repost:
-                            # Use reposter_name and reposter_handle for repost info
-                            reposter_handle_for_command = reposter_handle.lstrip('@') if reposter_handle and reposter_handle != "@unknown" else "unknown" # Translated
-                            repost_info = f"🔄 <b><a href=\"https://x.com/{html.escape(reposter_handle_for_command.lstrip('@'))}\">{html.escape(reposter_name or 'Unknown')}</a></b> (<code><i>{html.escape(reposter_handle or '@unknown')}</i></code>) reposted" # Translated
-                            message_parts.append(repost_info)
-
-                        message_parts.append(f"<blockquote>{html.escape(tweet_content)}</blockquote>")
-                        message_parts.append(f"<b>{time_str}</b>")
-                        message_parts.append(f"🌐 <a href='{tweet_url}'>Post Link</a>") # Translated
-                        if ticker_section: message_parts.append(ticker_section)
-                        if contract_section: message_parts.append(contract_section)
-                        if reasons: message_parts.append(f"💎 {', '.join(sorted(list(set(reasons))))} 💎")
-                        final_message = "\n".join(message_parts)
-                        # --- End build message ---
-
-                        # --- Check for "Show more" ---
-                        show_more_present = False
-                        try:
-                            # Search for the "Show more" link/span *within* the postText div
-                            tweet_text_div = container.find_element(By.XPATH, './/div[@data-testid="tweetText"]')
-                            # Check various possible texts/elements for "Show more"
-                            WebDriverWait(tweet_text_div, 0.2).until(
-                                EC.presence_of_element_located((By.XPATH, './/span[text()="Show more"] | .//a[contains(@href, "/status/") and contains(text(), "Show more")] | .//button[contains(., "Show more")]'))
-                            )
-                            show_more_present = True
-                            print(f"    'Show more' indicator found for post {tweet_id}") # Translated
-                        except (TimeoutException, NoSuchElementException, StaleElementReferenceException):
-                            pass # No "Show more" found
-                        except Exception as e_show_more:
-                            print(f"    WARNING: Error checking for 'Show more': {e_show_more}") # Translated
+def _soup_abs_url(href):
+    """Makes a relative X link from the page source absolute (like element.href in the browser)."""
+    if not href:
+        return None
+    return href if href.startswith("http") else X_BASE_URL + href
+
+
+def _soup_inner_text(element):
+    """Approximates innerText: text nodes, emoji <img> alt texts and <br> line breaks."""
+    parts = []
+    for node in element.descendants:
+        if isinstance(node, str):
+            parts.append(str(node))
+        elif node.name == "img" and node.get("alt"):
+            parts.append(node["alt"])
+        elif node.name == "br":
+            parts.append("\n")
+    return "".join(parts)
+
+
+def _soup_article_to_raw_record(article, cutoff_ms=None):
+    """Builds a raw record (same keys as POST_RECORD_JS) from one parsed <article>."""
+    link = article.select_one('a[href*="/status/"]')
+    if not link:
+        return None
+    url = _soup_abs_url(link.get("href"))
+    id_match = re.search(r'/status/(\d+)', url or "")
+    if not id_match:
+        return None
 
-                        show_full_text_needed = show_more_present
-                        # --- End Check for "Show more" ---
+    is_ad = any(span.get_text(strip=True) in ("Ad", "Anzeige") for span in article.find_all("span"))
+
+    sc = article.select_one('span[data-testid="socialContext"]')
+
+    id_time = snowflake_to_datetime(id_match.group(1))
+    if cutoff_ms and id_time and id_time.timestamp() * 1000 < cutoff_ms:
+        return {"id": id_match.group(1), "url": url, "is_stale": True, "is_ad": is_ad,
+                "social_context_text": _soup_inner_text(sc).strip() if sc else ""}
+
+    sc_link = None
+    if sc:
+        sc_link = sc.select_one('a[href]') or sc.find_parent("a", href=True)
+
+    time_el = article.select_one('time[datetime]')
+    user_block = article.select_one('div[data-testid="User-Name"]')
+    user_link = user_block.select_one('a[href*="/"]') if user_block else None
+    name_span = user_block.find("span") if user_block else None
+    text_el = article.select_one('div[data-testid="tweetText"]')
+
+    images = []
+    for img in article.select('div[data-testid="tweetPhoto"] img[alt="Image"]'):
+        src = img.get("src")
+        if src and src not in images:
+            images.append(src)
+
+    show_more = article.select_one('[data-testid="tweet-text-show-more-link"]') is not None
+    if not show_more and text_el:
+        for el in text_el.find_all(["span", "a", "button"]):
+            t = el.get_text(strip=True)
+            if (t == "Show more") if el.name == "span" else ("Show more" in t):
+                show_more = True
+                break
 
-                        # --- Build Markup ---
-                        final_reply_markup = None
-                        combined_keyboard = []  # Initialize this once, at the beginning
+    return {
+        "id": id_match.group(1),
+        "url": url,
+        "is_ad": is_ad,
+        "social_context_text": _soup_inner_text(sc).strip() if sc else "",
+        "reposter_href": _soup_abs_url(sc_link.get("href")) if sc_link else None,
+        "reposter_link_text": _soup_inner_text(sc_link).strip() if sc_link else None,
+        "datetime": time_el.get("datetime") if time_el else None,
+        "author_href": _soup_abs_url(user_link.get("href")) if user_link else None,
+        "author_name_span": _soup_inner_text(name_span).strip() if name_span else None,
+        "author_block_text": _soup_inner_text(user_block).strip() if user_block else None,
+        "text": _soup_inner_text(text_el) if text_el else None,
+        "images": images,
+        "show_more": show_more,
+    }
 
-                        # Rating Buttons (if post is relevant AND ratings are enabled)
-                        if rating_buttons_enabled:
-                            source_key = author_handle # This is the @handle, e.g., @RAFAELA_RIGO_
-                            
-                            # author_name is the display name, e.g., R🌟🌟🌟ELO🌟 RIGO
-                            author_name_for_display_logic = str(author_name) if author_name else source_key
 
-                            # Determine what to use for the 'name' part in callback_data for ratings
-                            name_to_encode_for_callback = author_name_for_display_logic
-                            try:
-                                # Check if author_name_for_display_logic contains only ASCII characters
-                                author_name_for_display_logic.encode('ascii')
-                                # If no error, it's ASCII, so we can use it directly for encoding
-                            except UnicodeEncodeError:
-                                # Contains non-ASCII characters. For callback_data robustness,
-                                # we'll use the source_key (the @handle) instead of the complex name.
-                                logger.info(f"Author name '{author_name_for_display_logic}' for {source_key} contains non-ASCII. "
-                                            f"Using handle '{source_key}' for rating callback_data's encoded name part.")
-                                name_to_encode_for_callback = source_key
-                            
-                            # Now, base64 encode the chosen name_to_encode_for_callback
-                            # This will be either the original ASCII author_name or the source_key (handle)
-                            try:
-                                encoded_name_for_callback_data = base64.urlsafe_b64encode(name_to_encode_for_callback.encode()).decode()
-                            except Exception as enc_err_cb:
-                                # Fallback if even encoding the handle fails (highly unlikely)
-                                logger.warning(f"Encoding for callback name part ('{name_to_encode_for_callback}') failed: {enc_err_cb}. "
-                                               f"Super-fallback: encoding source_key '{source_key}' again for callback.")
-                                encoded_name_for_callback_data = base64.urlsafe_b64encode(source_key.encode()).decode()
-                            
-                            # Create Rating Buttons. The callback_data will now only contain rate:value:source_key
-                            # The encoded_name is removed to save space.
-                            # The name for ratings_data will be handled in the callback.
-                            rating_buttons_row = [
-                                InlineKeyboardButton(str(i) + "💎", callback_data=f"rate:{i}:{source_key}")
-                                for i in range(1, 6)
-                            ]
-                            combined_keyboard.append(rating_buttons_row)
-
-                        # Like/Repost/FullText Buttons
-                        action_buttons = []
-                        if like_repost_buttons_enabled and tweet_id:  # Check if L/R buttons are enabled
-                            action_buttons.append(InlineKeyboardButton("👍 Like", callback_data=f"like:{tweet_id}"))
-                            action_buttons.append(InlineKeyboardButton("🔄 Repost", callback_data=f"repost:{tweet_id}"))
-
-                            # Add "Show Full Text" button if needed
-                            if show_full_text_needed:
-                                print(f"    Adding 'Show Full Text' button forpost{tweet_id}") # Translated
-                                action_buttons.append(InlineKeyboardButton("📄 Full Text", callback_data=f"full:{tweet_id}")) # Translated
-
-                        # Important: Add the action buttons anyway if they exist
-                        if action_buttons:
-                            combined_keyboard.append(action_buttons)
-
-                        if combined_keyboard:
-                            final_reply_markup = InlineKeyboardMarkup(combined_keyboard)
-                        # --- End Build Markup ---
-
-                        # --- Update names in DB (Original Author) ---
-                        # This block is empty in your code. If you had logic here,
-                        # it needs to be correctly indented. If it should remain empty,
-                        # 'pass' is good practice.
-                        if search_ca_enabled and contains_ca_match:
-                            pass # Add 'pass' if the block is intentionally empty
-
-                        # --- Send (ALWAYS if is_relevant) ---
-                        # Correctly indented, one level deeper than 'if is_relevant:',
-                        # but at the same level as 'if contains_token:'
-                        # +++ DEBUG LOGGING (before sending) +++
-                        logger.debug(f"post {tweet_id}: final_reply_markup before sending: {'Set' if final_reply_markup else 'None'}") # Translated
-                        if final_reply_markup:
-                            # Try to safely output the structure
-                            try:
-                                keyboard_repr = repr(final_reply_markup.inline_keyboard)
-                                logger.debug(f"post {tweet_id}: Keyboard structure: {keyboard_repr[:500]}...") # Shortened for readability
-                            except Exception as log_e:
-                                logger.error(f"Error logging keyboard structure: {log_e}") # Translated
-                        # +++ END DEBUG LOGGING +++
-
-                        # The original send line follows here:
-                        final_images_to_send = []
-                        if dexscreener_img_url: # Diese Variable kommt jetzt von format_token_info
-                            final_images_to_send.append(dexscreener_img_url)
-                            logger.info(f"    Using DexScreener image for post {tweet_id}: {dexscreener_img_url}")
-                        elif image_urls: 
-                            final_images_to_send.extend(image_urls)
-                            logger.info(f"    Using originally scraped images for post {tweet_id}: {image_urls}")
-                        
-                        await send_telegram_message(final_message, final_images_to_send, tweet_url, reply_markup=final_reply_markup)
-                        process_success = True # Belongs to sending
+def parse_page_snapshot(page_source, cutoff_ms=None):
+    """Parses all post articles of a page source snapshot into raw records. Runs in a worker thread."""
+    soup = BeautifulSoup(page_source, SNAPSHOT_HTML_PARSER)
+    raw_records = []
+    for article in soup.select('article[data-testid="tweet"]'):
+        try:
+            raw = _soup_article_to_raw_record(article, cutoff_ms)
+        except Exception as e_article:
+            logger.warning(f"[Snapshot] Could not parse article: {e_article}")
+            continue
+        if raw:
+            raw_records.append(raw)
+    return raw_records
+
+
+async def extract_posts_from_snapshot():
+    """Grabs page_source once and parses it off the event loop, keeping Telegram callbacks responsive."""
+    detected_ms = int(time.time() * 1000)
+    page_source = driver.page_source
+    raw_records = await asyncio.to_thread(parse_page_snapshot, page_source, snowflake_age_cutoff_ms())
+    for raw in raw_records:
+        raw["detected_ms"] = detected_ms
+    return _normalize_raw_records(raw_records)
+# ===> END Page Snapshot Parser <===
+
+# ===> Feed Observer (scan_mode "observer") <===
+# A MutationObserver inside the page captures every post article as X inserts it
+# and buffers its record in window.__rawbotFeed.queue. It also clicks the
+# "Show N posts" pill as soon as it appears, so the run loop only has to drain.
+FEED_QUEUE_LIMIT = 500 # Max buffered records in the page (oldest are dropped)
+FEED_SEEN_LIMIT = 5000 # Max remembered IDs in the page for de-duplication
+FEED_RESYNC_SECONDS = 300 # Run a full DOM scan round at least this often as safety net
+last_feed_resync_time = 0
+
+FEED_OBSERVER_INSTALL_JS = POST_RECORD_JS + r"""
+if (window.__rawbotFeed && window.__rawbotFeed.observer) return false;
+var queueLimit = arguments[0], seenLimit = arguments[1];
+var feed = {queue: [], seen: {}, seenOrder: [], pending: [], timer: null, observer: null};
+
+function remember(id) {
+    feed.seen[id] = true;
+    feed.seenOrder.push(id);
+    if (feed.seenOrder.length > seenLimit) delete feed.seen[feed.seenOrder.shift()];
+}
+
+function clickNewPostsPill() {
+    var buttons = document.querySelectorAll('button');
+    for (var i = 0; i < buttons.length; i++) {
+        var spans = buttons[i].querySelectorAll('span');
+        for (var j = 0; j < spans.length; j++) {
+            var t = spans[j].textContent || '';
+            if (t.indexOf('Show') !== -1 && t.indexOf('post') !== -1) { buttons[i].click(); return; }
+        }
+    }
+}
+
+function flush() {
+    feed.timer = null;
+    var articles = feed.pending; feed.pending = [];
+    articles.forEach(function (article) {
+        if (!article.isConnected) return;
+        var rec = rawbotPostRecord(article);
+        if (!rec || feed.seen[rec.id]) return;
+        remember(rec.id);
+        feed.queue.push(rec);
+        if (feed.queue.length > queueLimit) feed.queue.shift();
+    });
+    clickNewPostsPill();
+}
+
+function collect(node) {
+    if (node.nodeType !== 1) return;
+    if (node.matches('article[data-testid="tweet"]')) feed.pending.push(node);
+    else node.querySelectorAll('article[data-testid="tweet"]').forEach(function (a) { feed.pending.push(a); });
+}
+
+feed.observer = new MutationObserver(function (mutations) {
+    mutations.forEach(function (m) { m.addedNodes.forEach(collect); });
+    // Short delay so React has filled in text, time and images of the new cell
+    if (!feed.timer) feed.timer = setTimeout(flush, 250);
+});
+feed.observer.observe(document.body, {childList: true, subtree: true});
+window.__rawbotFeed = feed;
+collect(document.body);
+flush();
+return true;
+"""
+
+FEED_OBSERVER_DRAIN_JS = r"""
+var feed = window.__rawbotFeed;
+if (!feed || !feed.observer) return null;
+var out = feed.queue;
+feed.queue = [];
+return out;
+"""
+
+
+def install_feed_observer():
+    """Installs the feed observer in the current page. Returns False if it was already installed."""
+    return bool(driver.execute_script(FEED_OBSERVER_INSTALL_JS, FEED_QUEUE_LIMIT, FEED_SEEN_LIMIT))
+
+
+def drain_feed_observer():
+    """Returns the records buffered since the last drain, or None if no observer is installed (e.g. after a page load)."""
+    raw_records = driver.execute_script(FEED_OBSERVER_DRAIN_JS)
+    if raw_records is None:
+        return None
+    return _normalize_raw_records(raw_records)
+
+
+async def process_feed_records(feed_records, source="Feed Observer"):
+    """Processes records pushed by the feed observer or network capture. No button polling and no scrolling needed."""
+    new_records = [r for r in feed_records if not is_tweet_processed(r["id"])]
+    if not new_records:
+        return
+    print(f"[{source}] {len(new_records)} new post(s) from the page feed.")
+    for record in new_records:
+        tweet_id = record["id"]
+        print(f"  -> Processing new post: {tweet_id}")
+        increment_scanned_count()
+        await submit_post_record(record)
+        mark_tweet_processed(tweet_id)
+        if not record["is_repost"] and not record["is_ad"]:
+            advance_timeline_watermark(tweet_id)
+        print("    ____________________________________")
+    if timeline_watermarks_dirty:
+        save_watermarks()
+# ===> END Feed Observer <===
+
+# ===> Network Capture (scan_mode "network") <===
+# create_driver() enables Chrome's performance log with Network events in this
+# mode. The HomeLatestTimeline GraphQL responses the page downloads anyway are
+# read via CDP and parsed into the same raw record shape as the DOM extractor.
+NETWORK_TIMELINE_OPERATION = "/HomeLatestTimeline"
+NETWORK_PENDING_LIMIT = 100 # Max responses waiting for Network.loadingFinished
+network_pending_requests = {} # requestId -> url
+network_capture_warned = False
+
+
+def _graphql_tweet_result(result):
+    """Unwraps TweetWithVisibilityResults and similar wrappers down to the Tweet object."""
+    if not isinstance(result, dict):
+        return None
+    if result.get("__typename") == "TweetWithVisibilityResults" or ("tweet" in result and "legacy" not in result):
+        result = result.get("tweet") or {}
+    return result if result.get("legacy") else None
+
+
+def _graphql_user(tweet):
+    """Returns (screen_name, name) of the tweet author. Handles the old (legacy) and new (core) user layout."""
+    user = (((tweet.get("core") or {}).get("user_results") or {}).get("result") or {})
+    core = user.get("core") or {}
+    legacy = user.get("legacy") or {}
+    return core.get("screen_name") or legacy.get("screen_name"), core.get("name") or legacy.get("name")
+
+
+def _graphql_created_at_to_iso(created_at):
+    """Converts 'Wed Oct 10 20:19:24 +0000 2018' into the ISO format of the <time datetime> attribute."""
+    try:
+        return datetime.strptime(created_at, "%a %b %d %H:%M:%S %z %Y").astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+    except (TypeError, ValueError):
+        return None
+
+
+def _graphql_tweet_text(tweet):
+    """Visible post text: long-form note text if present, else full_text without reply mentions and media links, URLs expanded."""
+    note_text = ((((tweet.get("note_tweet") or {}).get("note_tweet_results") or {}).get("result") or {}).get("text"))
+    if note_text:
+        return note_text
+    legacy = tweet.get("legacy") or {}
+    text = legacy.get("full_text") or ""
+    text_range = legacy.get("display_text_range")
+    if isinstance(text_range, list) and len(text_range) == 2:
+        text = text[text_range[0]:text_range[1]]
+    entities = legacy.get("entities") or {}
+    for url_entity in entities.get("urls") or []:
+        if url_entity.get("url"):
+            text = text.replace(url_entity["url"], url_entity.get("expanded_url") or url_entity.get("display_url") or "")
+    for media in entities.get("media") or []:
+        if media.get("url"):
+            text = text.replace(media["url"], "")
+    return html.unescape(text).strip()
+
+
+def _graphql_tweet_to_raw_record(tweet, is_ad=False):
+    """Builds a raw record (same keys as POST_RECORD_JS) from a GraphQL Tweet object."""
+    legacy = tweet.get("legacy") or {}
+    retweeter_screen_name, retweeter_name = None, None
+    original = _graphql_tweet_result((legacy.get("retweeted_status_result") or {}).get("result"))
+    if original:
+        # Repost: the article shows the original post, the outer author is the reposter
+        retweeter_screen_name, retweeter_name = _graphql_user(tweet)
+        tweet, legacy = original, original.get("legacy") or {}
+
+    screen_name, name = _graphql_user(tweet)
+    tweet_id = tweet.get("rest_id") or legacy.get("id_str")
+    if not tweet_id:
+        return None
+
+    images = []
+    for media in (legacy.get("extended_entities") or legacy.get("entities") or {}).get("media") or []:
+        if media.get("type") == "photo" and media.get("media_url_https"):
+            images.append(media["media_url_https"])
+
+    return {
+        "id": str(tweet_id),
+        "url": f"https://x.com/{screen_name or 'i'}/status/{tweet_id}",
+        "is_ad": is_ad,
+        "social_context_text": f"{retweeter_name or retweeter_screen_name} reposted" if original else "",
+        "reposter_href": f"https://x.com/{retweeter_screen_name}" if retweeter_screen_name else None,
+        "reposter_link_text": f"{retweeter_name} reposted" if retweeter_name else None,
+        "datetime": _graphql_created_at_to_iso(legacy.get("created_at")),
+        "author_href": f"https://x.com/{screen_name}" if screen_name else None,
+        "author_name_span": name,
+        "author_block_text": f"{name or ''} @{screen_name or ''}".strip(),
+        "text": _graphql_tweet_text(tweet),
+        "images": images,
+        "show_more": False, # Network payload already contains the full text
+    }
+
+
+def parse_home_timeline_response(payload):
+    """
+    Parses one HomeLatestTimeline GraphQL response (dict or JSON string) into raw post records,
+    newest first. Pure function without driver access, so recorded responses can be replayed.
+    """
+    if isinstance(payload, (str, bytes)):
+        payload = json.loads(payload)
+    timeline = (((payload.get("data") or {}).get("home") or {}).get("home_timeline_urt") or {})
+    raw_records = []
+    for instruction in timeline.get("instructions") or []:
+        for entry in instruction.get("entries") or ([instruction["entry"]] if instruction.get("entry") else []):
+            content = entry.get("content") or {}
+            item_contents = []
+            if content.get("itemContent"):
+                item_contents.append(content["itemContent"])
+            for module_item in content.get("items") or []: # TimelineTimelineModule (conversations)
+                item_content = (module_item.get("item") or {}).get("itemContent")
+                if item_content:
+                    item_contents.append(item_content)
+            for item_content in item_contents:
+                if item_content.get("itemType") != "TimelineTweet":
+                    continue
+                tweet = _graphql_tweet_result((item_content.get("tweet_results") or {}).get("result"))
+                if not tweet:
+                    continue
+                is_ad = "promotedMetadata" in item_content or str(entry.get("entryId", "")).startswith("promoted")
+                raw = _graphql_tweet_to_raw_record(tweet, is_ad=is_ad)
+                if raw:
+                    raw_records.append(raw)
+    return raw_records
+
+
+def capture_timeline_responses():
+    """
+    Reads new entries of the performance log and returns the parsed JSON bodies of all
+    finished HomeLatestTimeline responses. Returns None if network capture is not available.
+    """
+    global network_pending_requests
+    try:
+        entries = driver.get_log('performance')
+    except Exception as e_log:
+        logger.debug(f"[Network Capture] Performance log not available: {e_log}")
+        return None
+
+    finished_ids = []
+    for entry in entries:
+        try:
+            message = json.loads(entry["message"])["message"]
+        except (KeyError, TypeError, ValueError):
+            continue
+        method = message.get("method")
+        params = message.get("params") or {}
+        request_id = params.get("requestId")
+        if method == "Network.responseReceived":
+            url = (params.get("response") or {}).get("url", "")
+            if NETWORK_TIMELINE_OPERATION in url:
+                network_pending_requests[request_id] = url
+        elif method == "Network.loadingFinished" and request_id in network_pending_requests:
+            finished_ids.append(request_id)
+        elif method == "Network.loadingFailed":
+            network_pending_requests.pop(request_id, None)
+
+    payloads = []
+    for request_id in finished_ids:
+        network_pending_requests.pop(request_id, None)
+        try:
+            body = driver.execute_cdp_cmd('Network.getResponseBody', {'requestId': request_id})
+            text = body.get("body", "")
+            if body.get("base64Encoded"):
+                text = base64.b64decode(text).decode("utf-8", "replace")
+            payloads.append(json.loads(text))
+        except Exception as e_body:
+            logger.warning(f"[Network Capture] Could not read timeline response {request_id}: {e_body}")
+
+    # Responses that never finish (navigation, aborted requests) must not pile up
+    while len(network_pending_requests) > NETWORK_PENDING_LIMIT:
+        network_pending_requests.pop(next(iter(network_pending_requests)))
+    return payloads
+# ===> END Network Capture <===
+
+
+def collect_pushed_records():
+    """
+    Returns new post records from the active push source ("observer" / "network" scan mode),
+    or None if the source is not available (or network capture found no posts) and a DOM
+    scan round is needed instead.
+    """
+    global network_capture_warned
+    if scan_mode == "observer":
+        records = drain_feed_observer()
+        if records is None:
+            install_feed_observer()
+            print("[Feed Observer] Installed on current page. Running one DOM scan round to catch up.")
+        return records
+    if scan_mode == "network":
+        payloads = capture_timeline_responses()
+        if payloads is None:
+            if not network_capture_warned:
+                print("[Network Capture] Performance log not available (driver started in another scan mode?). Falling back to DOM scan until the next driver restart.")
+                network_capture_warned = True
+            return None
+        network_capture_warned = False
+        records = []
+        detected_ms = int(time.time() * 1000)
+        for payload in payloads:
+            try:
+                raw_records = parse_home_timeline_response(payload)
+                for raw in raw_records:
+                    raw["detected_ms"] = detected_ms
+                records.extend(_normalize_raw_records(raw_records))
+            except Exception as e_parse:
+                logger.warning(f"[Network Capture] Could not parse timeline response: {e_parse}")
+        if not records:
+            # Nothing captured (no timeline request since the last tick, or unparseable bodies):
+            # the DOM extractor checks the page instead of silently scanning nothing
+            logger.debug(f"[Network Capture] No posts in {len(payloads)} captured response(s), running a DOM scan round.")
+            return None
+        return records
+    return None
+
+def prefilter_post_record(record):
+    """
+    Scanner stage: cheap checks on data the extractor already delivered (ID age, ad, <time>).
+    Returns False if the post is filtered out. Stores the display time in record["time_str"].
+    """
+    tweet_id = record["id"]
+
+    # --- Snowflake age check (the ID encodes the creation time, no <time> element needed) ---
+    id_time_utc = snowflake_to_datetime(tweet_id)
+    if id_time_utc is not None:
+        id_age_seconds = (datetime.now(timezone.utc) - id_time_utc).total_seconds()
+        if id_age_seconds >= max_tweet_age_minutes * 60:
+            print(f"    post {tweet_id} skipped: Too old by ID timestamp ({id_age_seconds / 60:.0f} min > {max_tweet_age_minutes} min)")
+            return False # Filtered before matching; the scanner still marks the ID processed, so it is not checked again
+
+    # --- Ad Check ---
+    is_ad = record["is_ad"]
+
+    if is_ad:
+        print(f"    post {tweet_id} is an ad -> skipping") # Translated
+        increment_ad_total_count()
+        return False # Filtered before matching; the scanner still marks the ID processed, so it is not checked again
+
+    # --- Repost Check ---
+    is_repost = record["is_repost"]; repost_text = record["repost_text"]
+    if is_repost: print(f"    Repost found: {repost_text}") # Translated
+
+    # --- Time ---
+    datetime_str = record["datetime"]; time_str = "📅 Time Unknown"; tweet_is_recent = False # Translated
+    if id_time_utc is not None:
+        # <time> is only a cross-check now, the ID timestamp is authoritative
+        if datetime_str:
+            try:
+                element_time_utc = datetime.fromisoformat(datetime_str.replace('Z', '+00:00'))
+                if abs((element_time_utc - id_time_utc).total_seconds()) > SNOWFLAKE_TIME_TOLERANCE_SECONDS:
+                    logger.warning(f"post {tweet_id}: <time> {datetime_str} differs from ID timestamp {id_time_utc.isoformat()}")
+            except ValueError:
+                pass
+        datetime_str = id_time_utc.strftime("%Y-%m-%dT%H:%M:%S.000Z")
+        time_str, _ = format_time(datetime_str)
+        tweet_is_recent = True # Age already checked above
+    elif datetime_str: time_str, tweet_is_recent = format_time(datetime_str)
+
+    # --- Skip if older than 15 minutes (strict check) ---
+    # This check now uses the updated 'is_recent' which is True only if < max_tweet_age_minutes
+    if not tweet_is_recent:
+        # Use the global variable in the log message
+        print(f"    post {tweet_id} skipped: Too old ({time_str} > {max_tweet_age_minutes} min)")
+        # The scanner marks it as processed so we don't check it again in this round
+        # IMPORTANT: Do not increment processed_since_button_click here
+        # because this post doesn't count towards the button's target.
+        return False # Filtered before matching
+
+    record["time_str"] = time_str
+    return True
+
+
+async def handle_post_record(record):
+    """
+    Worker stage: matching, enrichment (DexScreener), rating filter, rendering and sending
+    of one prefiltered record. Returns whether processing succeeded.
+    """
+    tweet_id = record["id"]
+    tweet_url = record["url"]
+    is_repost = record["is_repost"]
+    time_str = record["time_str"]
+
+    process_success = False # Will be set to True later if processing succeeds
+    try:
+        # --- Both authors (reposter and original), normalized by the batch extractor ---
+        author_name = record["author_name"]  # Original author
+        author_handle = record["author_handle"]  # Original author
+        reposter_name = record["reposter_name"]  # Reposter (only for reposts)
+        reposter_handle = record["reposter_handle"]  # Reposter (only for reposts)
+        if is_repost:
+            print(f"    Reposter extracted: Name='{reposter_name}', Handle='{reposter_handle}'") # Translated
+        print(f"    Original author extracted: {author_name} ({author_handle})") # Translated
+
+        # --- Content ---
+        tweet_content = record["text"]
+        if tweet_content is None:
+            tweet_content = "[Content not found]" # Translated
+            print(f"    WARNING: Content not found for {tweet_id}.") # Translated
+
+        # --- Images ---
+        image_urls = record["images"]
+
+        # --- Relevance Check (filter rules, no network) ---
+        matched_rule, rule_facts = evaluate_filter_rules(record, tweet_content)
+        record["trace"]["matched"] = time.time()
+        is_relevant = matched_rule is not None
+        reasons = filter_rule_reasons(matched_rule, rule_facts) if is_relevant else [] # Final list of reasons for display
+
+        if is_relevant:
+            print(f"    post {tweet_id} relevant due to rule #{matched_rule['index'] + 1} ({matched_rule['expression']}): {', '.join(reasons) or 'no content condition'}")
+
+            # --- Token info: send first, enrich later ---
+            # Cached DexScreener results are used right away; CAs that still need a lookup
+            # are fetched after the alert is out and added by editing the sent message.
+            solana_contracts = [contract for contract, chain in scan_token_candidates(tweet_content)[1] if chain == 'solana']
+            token_infos = {contract: enrichment_cache_get(contract) for contract in solana_contracts}
+            pending_lookups = [contract for contract, token_info in token_infos.items() if token_info is None]
+            ticker_section, contract_section, ticker_found_and_enabled, dexscreener_img_url = format_token_info(tweet_content, token_infos)
+            contains_ca_match = bool(contract_section) # True if a CA was found and formatted
+
+            increment_found_count()
+
+            # --- Build message (corrected version) ---
+            handle_for_command = author_handle.lstrip('@')
+
+            # --- Get rating info ---
+            rating_display = ""
+            # Check if rating buttons are enabled before trying to display the rating
+            if rating_buttons_enabled: # Added rating_buttons_enabled check
+                average_rating, total_ratings = rule_facts["rating"] # Already looked up by the filter rules
+                if average_rating is not None:
+                    rating_display = f" {average_rating:.1f}💎({total_ratings})" # Space at the beginning
+            # --- End rating info ---
+
+            user_info_line = f"👤 <b><a href=\"https://x.com/{html.escape(author_handle.lstrip('@'))}\">{html.escape(author_name)}</a></b> (<code><i>{html.escape(author_handle)}</i></code>){rating_display}" # Rating appended here (will be empty if ratings disabled)
+            message_parts = [user_info_line]
+
+            # --- Build message (for repost) ---
+            if is_repost:
+                # Use reposter_name and reposter_handle for repost info
+                reposter_handle_for_command = reposter_handle.lstrip('@') if reposter_handle and reposter_handle != "@unknown" else "unknown" # Translated
+                repost_info = f"🔄 <b><a href=\"https://x.com/{html.escape(reposter_handle_for_command.lstrip('@'))}\">{html.escape(reposter_name or 'Unknown')}</a></b> (<code><i>{html.escape(reposter_handle or '@unknown')}</i></code>) reposted" # Translated
+                message_parts.append(repost_info)
+
+            message_parts.append(f"<blockquote>{html.escape(tweet_content)}</blockquote>")
+            message_parts.append(f"<b>{time_str}</b>")
+            message_parts.append(f"🌐 <a href='{tweet_url}'>Post Link</a>") # Translated
+            message_head = "\n".join(message_parts) # Everything above the token info, reused by the enrichment edit
+            reasons_line = f"💎 {', '.join(sorted(list(set(reasons))))} 💎" if reasons else ""
+            final_message = compose_alert_text(message_head, ticker_section, contract_section, reasons_line)
+            # --- End build message ---
+
+            # --- Check for "Show more" ---
+            show_more_present = record["show_more"]
+            if show_more_present:
+                print(f"    'Show more' indicator found for post {tweet_id}") # Translated
+
+            show_full_text_needed = show_more_present
+            # --- End Check for "Show more" ---
+
+            # --- Build Markup ---
+            final_reply_markup = None
+            combined_keyboard = []  # Initialize this once, at the beginning
+
+            # Rating Buttons (if post is relevant AND ratings are enabled)
+            if rating_buttons_enabled:
+                source_key = author_handle # This is the @handle, e.g., @RAFAELA_RIGO_
+
+                # author_name is the display name, e.g., R🌟🌟🌟ELO🌟 RIGO
+                author_name_for_display_logic = str(author_name) if author_name else source_key
+
+                # Determine what to use for the 'name' part in callback_data for ratings
+                name_to_encode_for_callback = author_name_for_display_logic
+                try:
+                    # Check if author_name_for_display_logic contains only ASCII characters
+                    author_name_for_display_logic.encode('ascii')
+                    # If no error, it's ASCII, so we can use it directly for encoding
+                except UnicodeEncodeError:
+                    # Contains non-ASCII characters. For callback_data robustness,
+                    # we'll use the source_key (the @handle) instead of the complex name.
+                    logger.info(f"Author name '{author_name_for_display_logic}' for {source_key} contains non-ASCII. "
+                                f"Using handle '{source_key}' for rating callback_data's encoded name part.")
+                    name_to_encode_for_callback = source_key
+
+                # Now, base64 encode the chosen name_to_encode_for_callback
+                # This will be either the original ASCII author_name or the source_key (handle)
+                try:
+                    encoded_name_for_callback_data = base64.urlsafe_b64encode(name_to_encode_for_callback.encode()).decode()
+                except Exception as enc_err_cb:
+                    # Fallback if even encoding the handle fails (highly unlikely)
+                    logger.warning(f"Encoding for callback name part ('{name_to_encode_for_callback}') failed: {enc_err_cb}. "
+                                   f"Super-fallback: encoding source_key '{source_key}' again for callback.")
+                    encoded_name_for_callback_data = base64.urlsafe_b64encode(source_key.encode()).decode()
+
+                # Create Rating Buttons. The callback_data will now only contain rate:value:source_key
+                # The encoded_name is removed to save space.
+                # The name for ratings_data will be handled in the callback.
+                rating_buttons_row = [
+                    InlineKeyboardButton(str(i) + "💎", callback_data=f"rate:{i}:{source_key}")
+                    for i in range(1, 6)
+                ]
+                combined_keyboard.append(rating_buttons_row)
+
+            # Like/Repost/FullText Buttons
+            action_buttons = []
+            if like_repost_buttons_enabled and tweet_id:  # Check if L/R buttons are enabled
+                action_buttons.append(InlineKeyboardButton("👍 Like", callback_data=f"like:{tweet_id}"))
+                action_buttons.append(InlineKeyboardButton("🔄 Repost", callback_data=f"repost:{tweet_id}"))
+
+                # Add "Show Full Text" button if needed
+                if show_full_text_needed:
+                    print(f"    Adding 'Show Full Text' button forpost{tweet_id}") # Translated
+                    action_buttons.append(InlineKeyboardButton("📄 Full Text", callback_data=f"full:{tweet_id}")) # Translated
+
+            # Important: Add the action buttons anyway if they exist
+            if action_buttons:
+                combined_keyboard.append(action_buttons)
+
+            if combined_keyboard:
+                final_reply_markup = InlineKeyboardMarkup(combined_keyboard)
+            # --- End Build Markup ---
+
+            # --- Update names in DB (Original Author) ---
+            # This block is empty in your code. If you had logic here,
+            # it needs to be correctly indented. If it should remain empty,
+            # 'pass' is good practice.
+            if search_ca_enabled and contains_ca_match:
+                pass # Add 'pass' if the block is intentionally empty
+
+            # --- Send (ALWAYS if is_relevant) ---
+            # Correctly indented, one level deeper than 'if is_relevant:',
+            # but at the same level as 'if contains_token:'
+            # +++ DEBUG LOGGING (before sending) +++
+            logger.debug(f"post {tweet_id}: final_reply_markup before sending: {'Set' if final_reply_markup else 'None'}") # Translated
+            if final_reply_markup:
+                # Try to safely output the structure
+                try:
+                    keyboard_repr = repr(final_reply_markup.inline_keyboard)
+                    logger.debug(f"post {tweet_id}: Keyboard structure: {keyboard_repr[:500]}...") # Shortened for readability
+                except Exception as log_e:
+                    logger.error(f"Error logging keyboard structure: {log_e}") # Translated
+            # +++ END DEBUG LOGGING +++
+
+            # The original send line follows here:
+            final_images_to_send = []
+            if dexscreener_img_url: # Diese Variable kommt jetzt von format_token_info
+                final_images_to_send.append(dexscreener_img_url)
+                logger.info(f"    Using DexScreener image for post {tweet_id}: {dexscreener_img_url}")
+            elif image_urls: 
+                final_images_to_send.extend(image_urls)
+                logger.info(f"    Using originally scraped images for post {tweet_id}: {image_urls}")
+
+            # Digest mode: later posts of a burst wait for the group's digest
+            digest_key = digest_group_key(tweet_content) if digest_mode_enabled else None
+            if digest_key and add_to_digest(digest_key, {
+                    "author_handle": author_handle, "tweet_url": tweet_url, "tweet_content": tweet_content,
+                    "text": final_message, "images": final_images_to_send, "reply_markup": final_reply_markup,
+                    "reasons": reasons, "trace": record["trace"]}):
+                print(f"    post {tweet_id} added to digest for {digest_key}")
+                process_success = True
+                return process_success # Latency trace is recorded when the digest goes out
+
+            # Queued with alert priority; the worker stays free for the next post
+            delivery = queue_telegram_message(final_message, final_images_to_send, tweet_url, reply_markup=final_reply_markup, priority=TELEGRAM_PRIORITY_ALERT)
+            process_success = True # Belongs to sending
+
+            alert_state = {
+                "delivery": delivery, "message": None, "tweet_id": tweet_id, "tweet_content": tweet_content,
+                "message_head": message_head, "reasons_line": reasons_line, "text": final_message,
+                "image_url": final_images_to_send[0] if final_images_to_send else None,
+                "reply_markup": final_reply_markup, "token_infos": token_infos, "trace": record["trace"],
+            }
+            start_alert_followup(alert_state, pending_lookups) # Stamps "sent", enriches, records the latency trace
+            return process_success
+
+        else: # Belongs to 'if is_relevant:'
+            print(f"    post {tweet_id} skipped (no filter rule matched)")
+            process_success = True # Belongs to skipping
+
+    except Exception as e_process:
+        print(f"    !!!!!!!! ERROR during detail processing of post {tweet_id} !!!!!!!! : {e_process}") # Translated
+        logger.error(f"Error processing details for post {tweet_id}", exc_info=True)
+        process_success = False
+
+    record_post_latency(record["trace"])
+    return process_success
+
+
+# ===> Alert Enrichment (send first, edit later) <===
+# Alerts go out as soon as the post matched, with CA, chain and static links.
+# DexScreener data that was not cached yet (image, symbol/liquidity, Axiom link)
+# is fetched afterwards and added by editing the sent message in place.
+TELEGRAM_CAPTION_LIMIT = 1024
+TELEGRAM_TEXT_LIMIT = 4096
+ENRICHMENT_BUDGET_SECONDS = 5 # Per alert; later results stay in the cache, the alert is not edited
+alert_enrichment_tasks = set() # Strong references to running edit tasks
+alert_enrichment_stats = {"edited": 0, "unchanged": 0, "over_budget": 0}
+
+
+def compose_alert_text(message_head, ticker_section, contract_section, reasons_line):
+    """Joins the alert parts the same way for the first send and the edit."""
+    return "\n".join(part for part in (message_head, ticker_section, contract_section, reasons_line) if part)
+
+
+def start_alert_followup(alert_state, pending_lookups):
+    """Waits for the queued alert, then runs the lookups + edit, in the background."""
+    task = asyncio.create_task(enrich_sent_alert(alert_state, pending_lookups))
+    alert_enrichment_tasks.add(task)
+    task.add_done_callback(alert_enrichment_tasks.discard)
+
+
+async def enrich_sent_alert(alert_state, pending_lookups):
+    """
+    Lookups start right away, in parallel with the queued delivery. Once the alert
+    is out, the missing token infos are awaited (within the budget) and the alert
+    is edited if anything changed.
+    """
+    trace = alert_state["trace"]
+    lookups = None
+    try:
+        if pending_lookups:
+            lookups_started = time.monotonic()
+            lookups = asyncio.ensure_future(asyncio.gather(*(fetch_token_info_coalesced(contract) for contract in pending_lookups)))
+        alert_state["message"] = await alert_state["delivery"]
+        if alert_state["message"] is None:
+            return # Not delivered, nothing to edit
+        trace["sent"] = time.time()
+        if lookups is None:
+            return
+        try:
+            # The lookups themselves are shared (single-flight), so giving up here doesn't cancel them
+            results = await asyncio.wait_for(lookups, max(0.0, ENRICHMENT_BUDGET_SECONDS - (time.monotonic() - lookups_started)))
+        except asyncio.TimeoutError:
+            alert_enrichment_stats["over_budget"] += 1
+            logger.info(f"[Alert Enrichment] post {alert_state['tweet_id']}: lookups exceeded {ENRICHMENT_BUDGET_SECONDS}s budget, alert stays as sent")
+            return
+        alert_state["token_infos"].update(zip(pending_lookups, results))
+        ticker_section, contract_section, _, image_url = format_token_info(alert_state["tweet_content"], alert_state["token_infos"])
+        new_text = compose_alert_text(alert_state["message_head"], ticker_section, contract_section, alert_state["reasons_line"])
+        new_image_url = image_url or alert_state["image_url"]
+        if new_text == alert_state["text"] and new_image_url == alert_state["image_url"]:
+            alert_enrichment_stats["unchanged"] += 1
+            return # Lookups brought nothing new
+        edited = await submit_telegram_job(
+            lambda: edit_alert_message(alert_state["message"], new_text, new_image_url, alert_state["image_url"], alert_state["reply_markup"]),
+            TELEGRAM_PRIORITY_EDIT)
+        if edited:
+            alert_enrichment_stats["edited"] += 1
+            trace["enriched"] = time.time()
+            logger.info(f"[Alert Enrichment] post {alert_state['tweet_id']} updated {trace['enriched'] - trace['sent']:.2f}s after sending")
+    except Exception as e_enrich:
+        logger.warning(f"[Alert Enrichment] Could not enrich alert for post {alert_state['tweet_id']}: {e_enrich}")
+    finally:
+        if lookups is not None and not lookups.done():
+            lookups.cancel()
+        record_post_latency(trace)
+
+
+async def edit_alert_message(message, text, image_url, previous_image_url, reply_markup):
+    """
+    Edits a sent alert. Photo alerts get edit_message_media (new image) or
+    edit_message_caption; text alerts get edit_message_text, with a new image
+    shown as link preview. The keyboard is passed again, Telegram drops it otherwise.
+    Runs as a delivery job, so edits share the rate limits with new messages.
+    """
+    full_text = f"{text}\n" # send_telegram_message appends a newline as well
+    if message.photo:
+        if len(full_text) > TELEGRAM_CAPTION_LIMIT:
+            logger.info(f"[Alert Enrichment] Enriched caption too long ({len(full_text)}), keeping the first version.")
+            return False
+        if image_url and image_url != previous_image_url:
+            photo, photo_keys, _ = resolve_telegram_photo(image_url)
+            edited_message = await telegram_api_call("edit_message_media", chat_id=message.chat_id, message_id=message.message_id,
+                                                     media=InputMediaPhoto(media=photo, caption=full_text, parse_mode=ParseMode.HTML), reply_markup=reply_markup)
+            remember_photo_file_id(photo_keys, edited_message)
+        else:
+            await telegram_api_call("edit_message_caption", chat_id=message.chat_id, message_id=message.message_id,
+                                    caption=full_text, parse_mode=ParseMode.HTML, reply_markup=reply_markup)
+        return True
+
+    if (message.text or "").startswith("🖼️"): # Sent as text because the caption was too long
+        full_text = f"🖼️ {full_text}"
+    if image_url: # Invisible link -> Telegram shows the image as preview
+        full_text = f"<a href=\"{html.escape(image_url)}\">​</a>{full_text}"
+    if len(full_text) > TELEGRAM_TEXT_LIMIT:
+        logger.info(f"[Alert Enrichment] Alert was split into several messages, not editing.")
+        return False
+    await telegram_api_call("edit_message_text", chat_id=message.chat_id, message_id=message.message_id, text=full_text,
+                            parse_mode=ParseMode.HTML, disable_web_page_preview=not image_url, reply_markup=reply_markup)
+    return True
+# ===> END Alert Enrichment <===
+
+
+# ===> Digest Mode <===
+# Optional burst coalescing for shill waves. The first relevant post about a token
+# goes out as a normal alert and opens a group (key: its CA or its ticker). Further
+# posts with the same key during the next digest_window_seconds are collected and
+# sent as ONE digest: authors with counts, post links, token info - or as a media
+# group when the posts carry several different images. Posts without a key are
+# never delayed.
+DIGEST_GROUP_KEYS = ("ca", "ticker")
+DIGEST_MAX_LINKS = 20
+DIGEST_MAX_MEDIA = 10 # Telegram limit per media group
+digest_mode_enabled = False
+digest_window_seconds = 60
+digest_group_by = "ca"
+digest_groups = {} # key -> {"opened": epoch seconds, "entries": [...], "timer": TimerHandle}
+digest_flush_tasks = set() # Strong references to running flushes
+digest_stats = {"digests": 0, "coalesced_posts": 0}
+
+
+def digest_group_key(tweet_text):
+    """Grouping key of a post: first valid CA or first ticker (see digest_group_by), or None."""
+    tickers, contracts = scan_token_candidates(tweet_text)
+    if digest_group_by == "ticker":
+        return tickers[0].upper() if tickers else None
+    return contracts[0][0] if contracts else None
+
+
+def add_to_digest(key, entry):
+    """
+    Returns True if the post was taken into an open digest (don't send it now).
+    False means the post opens a new group and should be sent as a normal alert.
+    """
+    group = digest_groups.get(key)
+    if group is not None:
+        group["entries"].append(entry)
+        return True
+    timer = asyncio.get_running_loop().call_later(digest_window_seconds, _start_digest_flush, key)
+    digest_groups[key] = {"opened": time.time(), "entries": [], "timer": timer}
+    return False
+
+
+def _start_digest_flush(key):
+    task = asyncio.create_task(flush_digest_group(key))
+    digest_flush_tasks.add(task)
+    task.add_done_callback(digest_flush_tasks.discard)
+
+
+async def flush_all_digest_groups(timeout=15):
+    """Shutdown: sends every open digest now instead of dropping posts that are already marked processed."""
+    for group in digest_groups.values():
+        group["timer"].cancel()
+    for key in list(digest_groups):
+        _start_digest_flush(key)
+    if digest_flush_tasks:
+        print(f"[Digest] Sending {len(digest_flush_tasks)} open digest group(s) before exit...")
+        done, pending = await asyncio.wait(set(digest_flush_tasks), timeout=timeout)
+        if pending:
+            print(f"[Digest] {len(pending)} digest group(s) not sent (timeout).")
+
+
+async def flush_digest_group(key):
+    """Window over: sends the collected posts (one alone goes out as its normal alert)."""
+    group = digest_groups.pop(key, None)
+    if not group or not group["entries"]:
+        return
+    entries = group["entries"]
+    if len(entries) == 1:
+        entry = entries[0]
+        delivery = queue_telegram_message(entry["text"], entry["images"], entry["tweet_url"], reply_markup=entry["reply_markup"], priority=TELEGRAM_PRIORITY_ALERT)
+    else:
+        digest_text, digest_images = build_digest(key, entries, time.time() - group["opened"])
+        delivery = submit_telegram_job(lambda: _deliver_digest(digest_text, digest_images), TELEGRAM_PRIORITY_ALERT)
+        digest_stats["digests"] += 1
+        digest_stats["coalesced_posts"] += len(entries)
+        logger.info(f"[Digest] {len(entries)} posts for {key} coalesced into one message")
+    sent_message = await delivery
+    for entry in entries:
+        if sent_message is not None:
+            entry["trace"]["sent"] = time.time()
+        record_post_latency(entry["trace"])
+
+
+def build_digest(key, entries, window_seconds):
+    """Digest text (HTML) and the distinct images (first image of each post, in order)."""
+    author_counts = {}
+    for entry in entries:
+        author_counts[entry["author_handle"]] = author_counts.get(entry["author_handle"], 0) + 1
+    authors = ", ".join(f"{html.escape(handle)}{f' ×{count}' if count > 1 else ''}"
+                        for handle, count in sorted(author_counts.items(), key=lambda item: -item[1]))
+    links = " · ".join(f"<a href='{entry['tweet_url']}'>{number}</a>" for number, entry in enumerate(entries[:DIGEST_MAX_LINKS], 1))
+    if len(entries) > DIGEST_MAX_LINKS:
+        links += f" · +{len(entries) - DIGEST_MAX_LINKS}"
+    latest_text = entries[-1]["tweet_content"]
+    token_infos = {contract: enrichment_cache_get(contract, count=False) # The post's own lookup was counted in handle_post_record
+                   for contract, chain in scan_token_candidates(latest_text)[1] if chain == 'solana'}
+    ticker_section, contract_section, _, _ = format_token_info(latest_text, token_infos)
+    reasons = sorted({reason for entry in entries for reason in entry["reasons"]})
+    message_parts = [
+        f"🌊 <b>Digest</b> · <code>{html.escape(key)}</code> · {len(entries)} more posts in {window_seconds:.0f}s",
+        f"👥 {authors}",
+        f"🌐 Posts: {links}",
+    ]
+    text = compose_alert_text("\n".join(message_parts), ticker_section, contract_section, f"💎 {', '.join(reasons)} 💎" if reasons else "")
+
+    images = []
+    for entry in entries:
+        if entry["images"] and entry["images"][0] not in images:
+            images.append(entry["images"][0])
+    return text, images[:DIGEST_MAX_MEDIA]
+
+
+async def _deliver_digest(text, images):
+    """Delivery job: media group (caption on the first photo if it fits) or a normal message."""
+    if len(images) >= 2:
+        caption_fits = len(text) < TELEGRAM_CAPTION_LIMIT
+        try:
+            resolved = [resolve_telegram_photo(image_url) for image_url in images]
+            media = [InputMediaPhoto(media=photo) for photo, _, _ in resolved]
+            if caption_fits:
+                media[0] = InputMediaPhoto(media=resolved[0][0], caption=text, parse_mode=ParseMode.HTML)
+            for _ in range(len(media) - 1): # Every photo of the group counts against the rate limit
+                await acquire_telegram_slot(CHANNEL_ID)
+            messages = await telegram_api_call("send_media_group", chat_id=CHANNEL_ID, media=media)
+            for (_, photo_keys, _), sent_photo in zip(resolved, messages):
+                remember_photo_file_id(photo_keys, sent_photo)
+            if caption_fits:
+                return messages[0]
+            return await _deliver_telegram_message(text)
+        except telegram.error.RetryAfter as flood_error:
+            logger.warning(f"[Digest] Flood control, digest dropped: {flood_error}")
+            return None
+        except Exception as e_media:
+            logger.warning(f"[Digest] Media group failed ({e_media}), sending as normal message.")
+    return await _deliver_telegram_message(text, images[:1])
+# ===> END Digest Mode <===
+
+
+# ===> Filter Rules <===
+# Relevance is decided by an ordered list of rule expressions; a post is sent
+# if any rule matches. Without custom rules, one rule is derived from the
+# search toggles and the rating filter, so /modeca, /searchtickers etc. keep working.
+#
+# Atoms:  keyword  keyword:WORD  ca  ticker  repost  rated  unrated
+#         author:handle1,handle2  avg>=N  ratings>=N  (also > < <= =)
+# Operators: NOT, AND, OR and parentheses (NOT binds tightest, then AND).
+#
+# Rules are compiled once per configuration into predicate closures. Inside
+# every AND/OR, cheap checks (record fields, rating lookup) run before text
+# scans, and evaluation short-circuits. Text facts are computed lazily, and
+# DexScreener is only queried after a rule matched.
+FILTER_RULES_FILE = "filter_rules.json"
+FILTER_RULE_COSTS = {"record": 1, "rating": 2, "text": 5}
+filter_rules = [] # Custom rule expressions (empty = derived from toggles)
+filter_rule_program = None # (config key, [compiled rules])
+filter_eval_samples = deque(maxlen=1000) # Seconds per post
+filter_eval_counts = {"evaluated": 0, "passed": 0}
+
+_RULE_TOKEN_PATTERN = re.compile(r"\(|\)|[^\s()]+")
+_RULE_COMPARISON_PATTERN = re.compile(r"^(avg|ratings)(>=|<=|>|<|=)(\d+(?:\.\d+)?)$", re.IGNORECASE)
+_RULE_COMPARATORS = {
+    ">=": lambda a, b: a >= b, "<=": lambda a, b: a <= b,
+    ">": lambda a, b: a > b, "<": lambda a, b: a < b, "=": lambda a, b: a == b,
+}
+
+
+def load_filter_rules():
+    """Loads custom filter rules, dropping (and reporting) rules that no longer compile."""
+    global filter_rules
+    try:
+        if os.path.exists(FILTER_RULES_FILE):
+            with open(FILTER_RULES_FILE, 'r') as f:
+                loaded = json.load(f)
+            filter_rules = []
+            for expression in loaded if isinstance(loaded, list) else []:
+                try:
+                    compile_filter_rule(str(expression))
+                    filter_rules.append(str(expression))
+                except ValueError as e_rule:
+                    print(f"WARNING: Ignoring invalid filter rule '{expression}': {e_rule}")
+            print(f"[Filter Rules] {len(filter_rules)} custom rule(s) loaded.")
+    except (json.JSONDecodeError, Exception) as e:
+        print(f"Error loading filter rules: {e}. Using search toggles.")
+        filter_rules = []
+
+
+def save_filter_rules():
+    """Saves the custom filter rules."""
+    try:
+        with open(FILTER_RULES_FILE, 'w') as f:
+            json.dump(filter_rules, f, indent=4)
+    except Exception as e:
+        print(f"Error saving filter rules: {e}")
+
+
+def author_rating_stats(author_handle):
+    """(average, total ratings) of an author from the reputation index; (None, 0) if unrated."""
+    aggregate = rating_index.get(author_handle)
+    if not aggregate or aggregate["count"] <= 0:
+        return None, 0
+    return aggregate["avg"], aggregate["count"]
+
+
+def _rule_fact(facts, name):
+    """Computes a fact for the rule evaluation on first use."""
+    if name not in facts:
+        if name == "keywords":
+            facts[name] = find_keyword_matches(facts["text"], facts.get("automaton"))
+        elif name == "tokens":
+            facts[name] = scan_token_candidates(facts["text"])
+        elif name == "rating":
+            facts[name] = author_rating_stats(facts["record"]["author_handle"])
+    return facts[name]
+
+
+def _compile_rule_atom(word):
+    """One atom -> (cost, predicate(facts), reason atoms)."""
+    lowered = word.lower()
+    if lowered == "keyword":
+        return FILTER_RULE_COSTS["text"], lambda facts: bool(_rule_fact(facts, "keywords")), {"keyword"}
+    if lowered.startswith("keyword:") and len(word) > 8:
+        term = word[8:]
+        automaton = build_keyword_automaton([term], keyword_case_fold)
+        return FILTER_RULE_COSTS["text"], lambda facts: bool(find_keyword_matches(facts["text"], automaton)), {word}
+    if lowered == "ca":
+        return FILTER_RULE_COSTS["text"], lambda facts: bool(_rule_fact(facts, "tokens")[1]), {"ca"}
+    if lowered == "ticker":
+        return FILTER_RULE_COSTS["text"], lambda facts: bool(_rule_fact(facts, "tokens")[0]), {"ticker"}
+    if lowered == "repost":
+        return FILTER_RULE_COSTS["record"], lambda facts: bool(facts["record"]["is_repost"]), set()
+    if lowered.startswith("author:") and len(word) > 7:
+        handles = {handle.strip().lstrip("@").lower() for handle in word[7:].split(",") if handle.strip()}
+        return FILTER_RULE_COSTS["record"], lambda facts: (facts["record"]["author_handle"] or "").lstrip("@").lower() in handles, set()
+    if lowered == "rated":
+        return FILTER_RULE_COSTS["rating"], lambda facts: _rule_fact(facts, "rating")[0] is not None, set()
+    if lowered == "unrated":
+        return FILTER_RULE_COSTS["rating"], lambda facts: _rule_fact(facts, "rating")[0] is None, set()
+    comparison = _RULE_COMPARISON_PATTERN.match(word)
+    if comparison:
+        field, op, value = comparison.group(1).lower(), comparison.group(2), float(comparison.group(3))
+        compare = _RULE_COMPARATORS[op]
+        if field == "avg": # Unrated authors never pass an average comparison
+            return FILTER_RULE_COSTS["rating"], lambda facts: _rule_fact(facts, "rating")[0] is not None and compare(_rule_fact(facts, "rating")[0], value), set()
+        return FILTER_RULE_COSTS["rating"], lambda facts: compare(_rule_fact(facts, "rating")[1], value), set()
+    raise ValueError(f"unknown condition '{word}'")
+
+
+def _combine_rule_nodes(nodes, use_all):
+    """AND/OR node: children sorted cheapest first, evaluation short-circuits."""
+    if len(nodes) == 1:
+        return nodes[0]
+    nodes = sorted(nodes, key=lambda node: node[0])
+    predicates = [node[1] for node in nodes]
+    reason_atoms = set().union(*(node[2] for node in nodes))
+    if use_all:
+        return sum(node[0] for node in nodes), lambda facts: all(p(facts) for p in predicates), reason_atoms
+    return sum(node[0] for node in nodes), lambda facts: any(p(facts) for p in predicates), reason_atoms
+
+
+def compile_filter_rule(expression):
+    """
+    Compiles a rule expression into {"expression", "cost", "predicate", "reasons"}.
+    Raises ValueError with a readable message on syntax errors.
+    """
+    tokens = _RULE_TOKEN_PATTERN.findall(expression)
+    position = 0
+
+    def peek():
+        return tokens[position].upper() if position < len(tokens) else None
+
+    def parse_or():
+        nonlocal position
+        nodes = [parse_and()]
+        while peek() == "OR":
+            position += 1
+            nodes.append(parse_and())
+        return _combine_rule_nodes(nodes, use_all=False)
+
+    def parse_and():
+        nonlocal position
+        nodes = [parse_not()]
+        while peek() == "AND":
+            position += 1
+            nodes.append(parse_not())
+        return _combine_rule_nodes(nodes, use_all=True)
+
+    def parse_not():
+        nonlocal position
+        token = peek()
+        if token is None:
+            raise ValueError("rule ends unexpectedly")
+        if token == "NOT":
+            position += 1
+            cost, predicate, _ = parse_not()
+            return cost, lambda facts: not predicate(facts), set()
+        if token == "(":
+            position += 1
+            node = parse_or()
+            if peek() != ")":
+                raise ValueError("missing ')'")
+            position += 1
+            return node
+        if token in ("AND", "OR", ")"):
+            raise ValueError(f"unexpected '{tokens[position]}'")
+        position += 1
+        return _compile_rule_atom(tokens[position - 1])
+
+    if not tokens:
+        raise ValueError("empty rule")
+    cost, predicate, reason_atoms = parse_or()
+    if position != len(tokens):
+        raise ValueError(f"unexpected '{tokens[position]}'")
+    return {"expression": expression, "cost": cost, "predicate": predicate, "reasons": reason_atoms}
+
+
+def default_filter_rule():
+    """The rule equivalent to the search toggles and rating filter (None if all searches are off)."""
+    content = [name for name, enabled in (("keyword", search_keywords_enabled), ("ca", search_ca_enabled), ("ticker", search_tickers_enabled)) if enabled]
+    if not content:
+        return None
+    rating_gate = f"avg>={min_average_rating_for_posts:g}"
+    if show_posts_from_unrated_enabled:
+        rating_gate = f"(unrated OR {rating_gate})"
+    return f"({' OR '.join(content)}) AND {rating_gate}"
+
+
+def effective_filter_rules():
+    """Rule expressions currently in force."""
+    if filter_rules:
+        return list(filter_rules)
+    default_rule = default_filter_rule()
+    return [default_rule] if default_rule else []
+
+
+def get_filter_program():
+    """Compiled rules, recompiled only when rules, toggles or keyword options change."""
+    global filter_rule_program
+    expressions = effective_filter_rules()
+    key = (tuple(expressions), keyword_case_fold)
+    if filter_rule_program is None or filter_rule_program[0] != key:
+        compiled = []
+        for index, expression in enumerate(expressions):
+            try:
+                rule = compile_filter_rule(expression)
+                rule["index"] = index
+                compiled.append(rule)
+            except ValueError as e_rule:
+                logger.warning(f"[Filter Rules] Skipping invalid rule '{expression}': {e_rule}")
+        filter_rule_program = (key, compiled)
+    return filter_rule_program[1]
+
+
+def evaluate_filter_rules(record, text, track_stats=True, program=None, automaton=None):
+    """
+    Returns (first matching rule or None, facts computed on the way). Timed per post.
+    program/automaton: snapshots taken on the event loop (replay thread); default the live ones.
+    """
+    start = time.perf_counter()
+    facts = {"record": record, "text": text, "automaton": automaton}
+    matched_rule = None
+    for rule in program if program is not None else get_filter_program():
+        if rule["predicate"](facts):
+            matched_rule = rule
+            break
+    if not track_stats: # Replay runs must not skew the live statistics
+        return matched_rule, facts
+    filter_eval_samples.append(time.perf_counter() - start)
+    filter_eval_counts["evaluated"] += 1
+    if matched_rule:
+        filter_eval_counts["passed"] += 1
+    _rule_fact(facts, "rating") # The message header shows the author rating
+    return matched_rule, facts
+
+
+def filter_rule_reasons(rule, facts):
+    """Display reasons (keywords, CA, Ticker) for the content conditions of a matched rule."""
+    reasons = []
+    for atom in rule["reasons"]:
+        if atom == "keyword":
+            reasons.extend(kw for kw, _, _ in _rule_fact(facts, "keywords"))
+        elif atom == "ca" and _rule_fact(facts, "tokens")[1]:
+            reasons.append("CA")
+        elif atom == "ticker" and _rule_fact(facts, "tokens")[0]:
+            reasons.append("Ticker")
+        elif atom.lower().startswith("keyword:"):
+            if find_keyword_matches(facts["text"], build_keyword_automaton([atom[8:]], keyword_case_fold)):
+                reasons.append(atom[8:])
+    return sorted(set(reasons))
+
+
+def format_filter_rule_stats():
+    """Evaluation timing summary for /filterrules."""
+    if not filter_eval_samples:
+        return "No posts evaluated yet."
+    values = sorted(filter_eval_samples)
+    return (f"{filter_eval_counts['evaluated']} posts evaluated, {filter_eval_counts['passed']} passed\n"
+            f"Eval time: p50 {_percentile(values, 0.50) * 1e6:.0f}µs | p95 {_percentile(values, 0.95) * 1e6:.0f}µs | "
+            f"max {values[-1] * 1e6:.0f}µs (last {len(values)})")
+# ===> END Filter Rules <===
+
+
+# ===> Post Archive & Replay <===
+# Every new (non-stale) post record is appended to a gzip-compressed JSONL
+# archive, partitioned by UTC hour: post_archive/YYYY-MM-DD-HH.jsonl.gz.
+# Records are buffered and written as one gzip member per flush.
+# /replay streams a range of partitions through the current keyword matcher
+# and filter rules in a worker thread - no browser, no network, no sending.
+# Retention: when a new hour starts, partitions older than ARCHIVE_RETENTION_DAYS
+# are deleted, then the oldest ones until the folder fits ARCHIVE_MAX_MB (0 = no limit).
+ARCHIVE_DIR = "post_archive"
+ARCHIVE_FLUSH_EVERY = 50 # Records
+ARCHIVE_FLUSH_SECONDS = 60
+ARCHIVE_REPLAY_SAMPLE_HITS = 5
+ARCHIVE_RETENTION_DAYS = int(os.getenv("ARCHIVE_RETENTION_DAYS", "14"))
+ARCHIVE_MAX_MB = int(os.getenv("ARCHIVE_MAX_MB", "500"))
+archive_buffer = []
+archive_last_flush = time.time()
+archive_current_partition = None # Partition of the last flush; a change triggers pruning
+
+
+def archive_partition_path(moment):
+    """Archive file for the UTC hour of a datetime."""
+    return os.path.join(ARCHIVE_DIR, moment.astimezone(timezone.utc).strftime("%Y-%m-%d-%H") + ".jsonl.gz")
+
+
+def archive_post_record(record):
+    """Buffers a record for the archive; flushes by size or age."""
+    if record.get("is_stale"):
+        return
+    archived = {key: value for key, value in record.items() if key != "trace"}
+    archived["archived_at"] = datetime.now(timezone.utc).isoformat()
+    archive_buffer.append(archived)
+    if len(archive_buffer) >= ARCHIVE_FLUSH_EVERY or time.time() - archive_last_flush >= ARCHIVE_FLUSH_SECONDS:
+        flush_post_archive()
+
+
+def flush_post_archive():
+    """Appends the buffered records to their hourly partitions."""
+    global archive_buffer, archive_last_flush, archive_current_partition
+    archive_last_flush = time.time()
+    if not archive_buffer:
+        return
+    pending, archive_buffer = archive_buffer, []
+    by_partition = {}
+    for archived in pending:
+        path = archive_partition_path(datetime.fromisoformat(archived["archived_at"]))
+        by_partition.setdefault(path, []).append(json.dumps(archived, ensure_ascii=False))
+    try:
+        os.makedirs(ARCHIVE_DIR, exist_ok=True)
+        for path, lines in by_partition.items():
+            with gzip.open(path, 'at', encoding='utf-8') as f:
+                f.write("\n".join(lines) + "\n")
+    except Exception as e:
+        print(f"Error writing post archive: {e}")
+    latest_partition = max(by_partition)
+    if latest_partition != archive_current_partition:
+        archive_current_partition = latest_partition
+        prune_post_archive(latest_partition)
+
+
+def prune_post_archive(current_partition):
+    """Deletes partitions past the retention period, then the oldest ones above the size limit."""
+    try:
+        names = sorted(name for name in os.listdir(ARCHIVE_DIR) if name.endswith(".jsonl.gz"))
+        paths = [os.path.join(ARCHIVE_DIR, name) for name in names]
+        removed = []
+        if ARCHIVE_RETENTION_DAYS > 0:
+            cutoff = archive_partition_path(datetime.now(timezone.utc) - timedelta(days=ARCHIVE_RETENTION_DAYS))
+            removed = [path for path in paths if path < cutoff]
+        kept = [path for path in paths if path not in removed]
+        if ARCHIVE_MAX_MB > 0:
+            total_bytes = sum(os.path.getsize(path) for path in kept)
+            while total_bytes > ARCHIVE_MAX_MB * 1024 * 1024 and kept and kept[0] != current_partition:
+                total_bytes -= os.path.getsize(kept[0])
+                removed.append(kept.pop(0))
+        for path in removed:
+            os.remove(path)
+        if removed:
+            print(f"[Post Archive] Pruned {len(removed)} old partition(s), {len(kept)} kept.")
+    except Exception as e:
+        print(f"Error pruning post archive: {e}")
+
+
+def archive_partitions_between(start, end):
+    """Archive files whose hour lies in [start, end], oldest first."""
+    if not os.path.isdir(ARCHIVE_DIR):
+        return []
+    first = archive_partition_path(start.replace(minute=0, second=0, microsecond=0))
+    last = archive_partition_path(end)
+    return [os.path.join(ARCHIVE_DIR, name) for name in sorted(os.listdir(ARCHIVE_DIR))
+            if name.endswith(".jsonl.gz") and first <= os.path.join(ARCHIVE_DIR, name) <= last]
+
+
+def replay_post_archive(paths, program, automaton):
+    """
+    Runs archived records through the given compiled rules and keyword automaton.
+    Blocking (CPU only) - call via asyncio.to_thread with get_filter_program() and
+    keyword_automaton taken on the event loop, so the thread never compiles rules
+    or touches the live program. Returns a summary dict.
+    """
+    summary = {"files": len(paths), "posts": 0, "ads": 0, "hits": 0, "reasons": {}, "rules": {}, "samples": [], "errors": 0}
+    start = time.perf_counter()
+    for path in paths:
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        summary["errors"] += 1
+                        continue
+                    summary["posts"] += 1
+                    if record.get("is_ad"):
+                        summary["ads"] += 1
+                        continue
+                    matched_rule, facts = evaluate_filter_rules(record, record.get("text") or "", track_stats=False, program=program, automaton=automaton)
+                    if matched_rule is None:
+                        continue
+                    summary["hits"] += 1
+                    summary["rules"][matched_rule["expression"]] = summary["rules"].get(matched_rule["expression"], 0) + 1
+                    for reason in filter_rule_reasons(matched_rule, facts):
+                        summary["reasons"][reason] = summary["reasons"].get(reason, 0) + 1
+                    if len(summary["samples"]) < ARCHIVE_REPLAY_SAMPLE_HITS:
+                        summary["samples"].append(record.get("url"))
+        except (OSError, EOFError) as e_file: # EOFError: partition still being written / truncated
+            print(f"[Replay] Could not read {path} completely: {e_file}")
+            summary["errors"] += 1
+    summary["seconds"] = time.perf_counter() - start
+    return summary
+# ===> END Post Archive & Replay <===
+
+
+# ===> Latency Tracing <===
+# Every post record carries a trace of wall-clock timestamps (seconds):
+# created (Snowflake ID) -> detected (seen in page/network) -> extracted (record built)
+# -> matched (filter rules) -> sent -> enriched (DexScreener data edited into the sent alert).
+# Durations between consecutive stages go into rolling windows for p50/p95/p99.
+LATENCY_STAGES = ("created", "detected", "extracted", "matched", "sent", "enriched")
+LATENCY_WINDOW = 1000 # Durations kept per stage
+LATENCY_METRICS_FILE = "latency_metrics.json"
+LATENCY_WRITE_EVERY = 10 # Write the metrics file after this many traces
+latency_samples = {stage: deque(maxlen=LATENCY_WINDOW) for stage in LATENCY_STAGES[1:] + ("total",)}
+latency_traces_since_write = 0
+
+
+def new_post_trace(tweet_id, detected_ms=None):
+    """Starts a latency trace for a freshly extracted record."""
+    created_time = snowflake_to_datetime(tweet_id)
+    now = time.time()
+    return {
+        "created": created_time.timestamp() if created_time else None,
+        "detected": detected_ms / 1000 if detected_ms else now,
+        "extracted": now,
+    }
+
+
+def record_post_latency(trace):
+    """Adds the stage durations of a finished trace to the rolling windows."""
+    global latency_traces_since_write
+    previous = None
+    for stage in LATENCY_STAGES:
+        stamp = trace.get(stage)
+        if stamp is None:
+            continue
+        if previous is not None and stage != "created":
+            latency_samples[stage].append(max(0.0, stamp - previous))
+        previous = stamp
+    if trace.get("sent") and trace.get("created"):
+        latency_samples["total"].append(max(0.0, trace["sent"] - trace["created"]))
+
+    latency_traces_since_write += 1
+    if latency_traces_since_write >= LATENCY_WRITE_EVERY:
+        save_latency_metrics()
+
+
+def _percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    index = min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def latency_percentiles():
+    """{stage: {"count", "p50", "p95", "p99"}} for all stages with samples."""
+    result = {}
+    for stage, samples in latency_samples.items():
+        if not samples:
+            continue
+        values = sorted(samples)
+        result[stage] = {
+            "count": len(values),
+            "p50": round(_percentile(values, 0.50), 3),
+            "p95": round(_percentile(values, 0.95), 3),
+            "p99": round(_percentile(values, 0.99), 3),
+        }
+    return result
+
+
+def format_latency_summary():
+    """Plain text lines for /stats and /status."""
+    percentiles = latency_percentiles()
+    if not percentiles:
+        return "No traced posts yet."
+    lines = []
+    for stage in LATENCY_STAGES[1:] + ("total",):
+        data = percentiles.get(stage)
+        if data:
+            lines.append(f"{stage}: p50 {data['p50']:.2f}s | p95 {data['p95']:.2f}s | p99 {data['p99']:.2f}s (n={data['count']})")
+    return "\n".join(lines)
+
+
+def _latency_total_display():
+    """Short created -> sent summary for /status."""
+    data = latency_percentiles().get("total")
+    if not data:
+        return "no data yet"
+    return f"p50 {data['p50']:.1f}s / p95 {data['p95']:.1f}s / p99 {data['p99']:.1f}s (n={data['count']}, details in /stats)"
+
+
+def save_latency_metrics():
+    """Writes the current percentiles to the metrics file."""
+    global latency_traces_since_write
+    try:
+        with open(LATENCY_METRICS_FILE, 'w') as f:
+            json.dump({"updated": datetime.now(timezone.utc).isoformat(), "window": LATENCY_WINDOW,
+                       "stages": latency_percentiles()}, f, indent=4)
+        latency_traces_since_write = 0
+    except Exception as e:
+        print(f"Error saving latency metrics: {e}")
+# ===> END Latency Tracing <===
+
+
+# ===> Post Pipeline <===
+# The scanner (process_tweets / process_feed_records) only extracts and prefilters
+# records and puts them into a bounded queue. Worker tasks do matching, enrichment,
+# rendering and sending, so scan cadence no longer depends on API latency.
+POST_PIPELINE_QUEUE_SIZE = 100 # Scanner waits (backpressure) when this many posts are pending
+POST_PIPELINE_WORKERS = 2
+post_pipeline_queue = asyncio.Queue(maxsize=POST_PIPELINE_QUEUE_SIZE)
+post_pipeline_tasks = []
+post_pipeline_in_flight = {} # worker number -> post ID being handled
+
+
+async def submit_post_record(record):
+    """Scanner stage entry. Returns None if the post was filtered out early (ad / too old), True once queued."""
+    global posts_queued_total
+    archive_post_record(record)
+    if not prefilter_post_record(record):
+        return None
+    posts_queued_total += 1
+    if post_pipeline_queue.full():
+        print(f"[Pipeline] Queue full ({POST_PIPELINE_QUEUE_SIZE}), scanner waits for workers...")
+    await post_pipeline_queue.put(record)
+    return True
+
+
+async def post_pipeline_worker(worker_number):
+    """Takes records from the pipeline queue and runs them through handle_post_record."""
+    while True:
+        record = await post_pipeline_queue.get()
+        post_pipeline_in_flight[worker_number] = record["id"]
+        try:
+            await handle_post_record(record)
+        except Exception as e_worker:
+            logger.error(f"[Pipeline] Worker {worker_number} failed on post {record.get('id')}: {e_worker}", exc_info=True)
+        finally:
+            post_pipeline_in_flight.pop(worker_number, None)
+            post_pipeline_queue.task_done()
+
+
+def start_post_pipeline_workers():
+    """Starts the pipeline worker tasks (once)."""
+    global post_pipeline_tasks
+    post_pipeline_tasks = [task for task in post_pipeline_tasks if not task.done()]
+    for worker_number in range(len(post_pipeline_tasks) + 1, POST_PIPELINE_WORKERS + 1):
+        post_pipeline_tasks.append(asyncio.create_task(post_pipeline_worker(worker_number)))
+    logger.info(f"[Pipeline] {len(post_pipeline_tasks)} worker(s) running.")
+
+
+async def drain_post_pipeline(timeout=15):
+    """
+    Shutdown: lets the workers finish the queued posts (the scanner already marked
+    them processed). Posts still unhandled after the timeout are unmarked, so
+    they are picked up again after a restart instead of being skipped for good.
+    """
+    if post_pipeline_queue.qsize() or post_pipeline_in_flight:
+        print(f"[Pipeline] Handling {post_pipeline_queue.qsize() + len(post_pipeline_in_flight)} pending post(s) before exit...")
+        if any(not task.done() for task in post_pipeline_tasks):
+            try:
+                await asyncio.wait_for(post_pipeline_queue.join(), timeout=timeout)
+            except asyncio.TimeoutError:
+                print(f"[Pipeline] Timeout after {timeout}s.")
+    unhandled_ids = list(post_pipeline_in_flight.values()) # Before cancelling: the workers' finally clears it
+    for task in post_pipeline_tasks:
+        task.cancel()
+    await asyncio.gather(*post_pipeline_tasks, return_exceptions=True)
+    while not post_pipeline_queue.empty():
+        unhandled_ids.append(post_pipeline_queue.get_nowait()["id"])
+        post_pipeline_queue.task_done()
+    if unhandled_ids:
+        print(f"[Pipeline] {unmark_tweet_processed(unhandled_ids)} unhandled post(s) will be scanned again after restart.")
+# ===> END Post Pipeline <===
+
+
+async def process_tweets():
+    """
+    Process posts in the timeline. Optimized to only search when necessary,
+    scrolls down, and extracts all visible posts per scroll step with a single
+    execute_script call (see extract_visible_posts), so no element references
+    can go stale while a post is processed.
+    """
+    global driver, is_scraping_paused, first_run, processed_tweets, KEYWORDS, search_mode, ratings_data
+    global last_feed_resync_time
+
+    if is_scraping_paused: return
+    if driver is None:
+        logger.warning("process_tweets called but driver is None. Skipping.")
+        return
+
+    try:
+        # --- Push modes: drain the page feed / captured timeline JSON instead of polling/scrolling ---
+        if scan_mode in PUSH_SCAN_MODES:
+            source_name = "Feed Observer" if scan_mode == "observer" else "Network Capture"
+            feed_records = None
+            try:
+                feed_records = collect_pushed_records()
+            except Exception as e_feed:
+                print(f"[{source_name}] Error, falling back to DOM scan: {e_feed}")
+
+            if feed_records is not None:
+                await process_feed_records(feed_records, source=source_name)
+                if time.time() - last_feed_resync_time < FEED_RESYNC_SECONDS:
+                    return
+                print(f"[{source_name}] Periodic DOM resync round.")
+            last_feed_resync_time = time.time()
+
+        button_tweet_count = await check_new_tweets_button()
+        should_search_and_process = first_run or button_tweet_count > 0
+
+        if not should_search_and_process:
+            return
+
+        print("Searching and processing new posts (with scrolling)...") # Translated
+        target_new_button_tweets = button_tweet_count
+        processed_in_this_round = set()
+        newly_processed_count = 0
+        #  Counter for posts processed since the button click
+        processed_since_button_click = 0
+        max_scroll_attempts = 20 # Keep safety limit
+        scroll_attempt = 0
+        consecutive_scrolls_without_new = 0
+        max_consecutive_scrolls_without_new = 3 # Keep fallback limit
+        target_met_flag = False # Flag to break outer loop when target is met
+        # Newest post seen in earlier rounds. Snapshot, because the live value advances during this round.
+        round_watermark = get_timeline_watermark()
+        reached_known_posts = False # Flag to break outer loop at the watermark / age limit
+
+        # The loop runs until the target is reached OR fallbacks trigger
+        while scroll_attempt < max_scroll_attempts:
+            # The primary break condition is checked *inside* the loop
+            scroll_attempt += 1
+            found_in_this_scroll = 0
+            current_records = []
+            try:
+                if scan_mode == "snapshot":
+                    # One page_source transfer, parsed in a worker thread
+                    current_records = await extract_posts_from_snapshot()
+                else:
+                    # One round trip for every visible article instead of ~10 WebDriver calls per post
+                    current_records = extract_visible_posts()
+                if not current_records:
+                    print(f"Scroll attempt {scroll_attempt}/{max_scroll_attempts}: No post containers found.") # Translated
+                    await asyncio.sleep(1)
+                    continue
+            except Exception as e_find:
+                 print(f"Error extracting post containers (Scroll loop {scroll_attempt}): {e_find}") # Translated
+                 break
+
+            print(f"Scroll attempt {scroll_attempt}/{max_scroll_attempts}: {len(current_records)} containers found. Processing new ones...") # Translated
 
-                    else: # Belongs to 'if is_relevant:'
-                        print(f"    post {tweet_id} skipped (no keywords/token)") # Translated
-                        process_success = True # Belongs to skipping
+            for record in current_records:
+                # === 1. ID and URL (already extracted in the batch) ===
+                tweet_id = record["id"]
+                tweet_url = record["url"]
 
-                except StaleElementReferenceException:
-                    print(f"    WARNING: Stale Element during detail processing of {tweet_id}. Skipping.") # Translated
-                    process_success = False
-                except Exception as e_process:
-                    print(f"    !!!!!!!! ERROR during detail processing of post {tweet_id} !!!!!!!! : {e_process}") # Translated
-                    logger.error(f"Error processing details for post {tweet_id}", exc_info=True)
-                    process_success = False
+                # === High-watermark stop (the Following timeline is chronological) ===
+                # Reposts and ads can carry old IDs at any position, so only regular posts end the round
+                if not record["is_repost"] and not record["is_ad"]:
+                    if record["is_stale"] or int(tweet_id) <= round_watermark:
+                        stop_reason = "age limit" if record["is_stale"] else f"watermark {round_watermark}"
+                        print(f"Reached {stop_reason} at post {tweet_id}. Everything below is older, stopping round.")
+                        reached_known_posts = True
+                        break # Exit the inner 'for' loop
+
+                # === 2. Check if already processed ===
+                if is_tweet_processed(tweet_id) or tweet_id in processed_in_this_round:
+                    continue
+
+
+                # === TARGET COUNTING AND CHECK ===
+                # This is a NEW post for this round. Increment counter if target exists.
+                if target_new_button_tweets > 0:
+                    processed_since_button_click += 1
+                    print(f"    (Target Counter: {processed_since_button_click}/{target_new_button_tweets})") # Optional debug log
+
+                    # Check if target is met *before* processing details
+                    if processed_since_button_click > target_new_button_tweets:
+                         # This handles cases where the button count was slightly off
+                         # or we already processed enough in previous iterations of the *outer* loop.
+                         print(f"Target of {target_new_button_tweets} already met or exceeded. Setting flag and breaking inner loop.")
+                         target_met_flag = True
+                         break # Exit the inner 'for' loop
+
+                    # If exactly the target number is reached now, process this one last post
+                    # and then set the flag to break the outer loop afterwards.
+                    if processed_since_button_click == target_new_button_tweets:
+                        print(f"Target of {target_new_button_tweets} will be met after processing this post.")
+                        # We don't break here yet, process this post first.
+                        # The flag will be checked after the inner loop.
+                        target_met_flag = True # Set flag to break outer loop *after* this inner loop finishes
+
+                # === 3. Process post IMMEDIATELY ===
+                print(f"  -> Processing new post: {tweet_id}") # Translated
+                increment_scanned_count()
+
+                process_success = await submit_post_record(record)
+                if process_success is None:
+                    processed_in_this_round.add(tweet_id)
+                    mark_tweet_processed(tweet_id)
+                    found_in_this_scroll += 1
+                    continue
 
                 # === 4. Mark as processed ===
                 processed_in_this_round.add(tweet_id)
-                processed_tweets.append(tweet_id)
+                mark_tweet_processed(tweet_id)
+                if not record["is_repost"] and not record["is_ad"]:
+                    advance_timeline_watermark(tweet_id)
                 found_in_this_scroll += 1
                 if process_success:
                     newly_processed_count += 1
@@ -8946,7 +11004,7 @@ async def process_tweets():
                     # Note: We increment 'processed_since_button_click' here, AFTER potentially skipping old/ad tweets
                     # This ensures we count towards the target only potentially relevant new tweets.
                     # If you want to count *every* single new post encountered, move this increment
-                    # right after the "if tweet_id in processed_tweets..." check.
+                    # right after the "if is_tweet_processed(tweet_id)..." check.
                     # Let's stick to counting potentially relevant ones for now:
                     # processed_since_button_click += 1 # Moved this counter logic earlier
 
@@ -8959,6 +11017,10 @@ async def process_tweets():
             # --- End of loop over current containers ---
 
 
+            # --- Check if the watermark / age limit was reached inside the inner loop ---
+            if reached_known_posts:
+                break # Exit the outer 'while' loop
+
             # --- Check if the target was met inside the inner loop ---
             if target_met_flag:
                 print("Target met flag is True. Breaking outer scroll loop.")
@@ -8991,6 +11053,9 @@ async def process_tweets():
                 break
         # --- End of while scroll loop ---
 
+        if timeline_watermarks_dirty:
+            save_watermarks()
+
         if first_run and newly_processed_count > 0:
             first_run = False
             print("First scan round completed, switching to optimized mode") # Translated
@@ -9065,9 +11130,10 @@ async def show_keywords(update: Update):
     await resume_scraping()
 
 async def save_keywords():
-    """Saves the keywords to a file"""
+    """Saves the keywords to a file and recompiles the keyword matcher"""
     with open(KEYWORDS_FILE, 'w') as f:
         json.dump(KEYWORDS, f)
+    rebuild_keyword_matcher()
 
 async def add_keyword(update: Update, keyword_text: str):
     """Adds one or more comma-separated keywords"""
@@ -9121,6 +11187,295 @@ async def remove_keyword(update: Update, keyword_text: str):
     await show_keywords(update)
     await resume_scraping()
 
+# ===> Telegram Delivery <===
+# Channel messages go through a priority queue served by a small worker pool, so
+# alert bursts never block the scan and alerts overtake status messages and edits.
+# Every Bot API call (telegram_api_call) takes a token from a global bucket and from
+# the bucket of its chat (Telegram allows ~30 msg/s overall, ~20 msg/min per group
+# or channel). RetryAfter pauses the chat for the time Telegram asks for, then the
+# call is retried. TELEGRAM_API_BASE_URL can point to a local fake Bot API server.
+TELEGRAM_API_BASE_URL = os.getenv("TELEGRAM_API_BASE_URL", "")
+TELEGRAM_PRIORITY_ALERT = 0
+TELEGRAM_PRIORITY_STATUS = 1
+TELEGRAM_PRIORITY_EDIT = 2
+TELEGRAM_DELIVERY_WORKERS = 3
+TELEGRAM_GLOBAL_RATE = 25 # Messages per second, all chats
+TELEGRAM_GLOBAL_BURST = 25
+TELEGRAM_CHAT_RATE = 20 / 60 # Messages per second, per chat
+TELEGRAM_CHAT_BURST = 5
+TELEGRAM_MAX_RETRY_AFTER = 3 # RetryAfter retries per call before giving up
+telegram_delivery_queue = asyncio.PriorityQueue() # (priority, sequence, deliver coroutine function, future)
+telegram_delivery_tasks = []
+telegram_delivery_sequence = 0 # FIFO order within one priority
+telegram_buckets = {} # "global" / chat_id -> {"tokens", "updated", "blocked_until"}
+telegram_delivery_stats = {"calls": 0, "retry_after": 0, "throttled_seconds": 0.0}
+
+
+async def acquire_telegram_slot(chat_id):
+    """Waits until both the global and the chat bucket have a token, then takes one from each."""
+    while True:
+        now = time.monotonic()
+        wait = 0.0
+        buckets = ((_telegram_bucket("global", TELEGRAM_GLOBAL_BURST), TELEGRAM_GLOBAL_RATE, TELEGRAM_GLOBAL_BURST),
+                   (_telegram_bucket(chat_id, TELEGRAM_CHAT_BURST), TELEGRAM_CHAT_RATE, TELEGRAM_CHAT_BURST))
+        for bucket, rate, burst in buckets:
+            bucket["tokens"] = min(burst, bucket["tokens"] + (now - bucket["updated"]) * rate)
+            bucket["updated"] = now
+            wait = max(wait, bucket["blocked_until"] - now, (1 - bucket["tokens"]) / rate)
+        if wait <= 0:
+            for bucket, _, _ in buckets:
+                bucket["tokens"] -= 1
+            return
+        telegram_delivery_stats["throttled_seconds"] += wait
+        await asyncio.sleep(wait)
+
+
+def _telegram_bucket(key, burst):
+    bucket = telegram_buckets.get(key)
+    if bucket is None:
+        bucket = telegram_buckets[key] = {"tokens": float(burst), "updated": time.monotonic(), "blocked_until": 0.0}
+    return bucket
+
+
+async def telegram_api_call(method, chat_id, **kwargs):
+    """Rate-limited application.bot.<method>(chat_id=..., ...); retries after RetryAfter."""
+    for attempt in range(TELEGRAM_MAX_RETRY_AFTER + 1):
+        await acquire_telegram_slot(chat_id)
+        telegram_delivery_stats["calls"] += 1
+        try:
+            return await getattr(application.bot, method)(chat_id=chat_id, **kwargs)
+        except telegram.error.RetryAfter as e:
+            retry_after = e.retry_after.total_seconds() if isinstance(e.retry_after, timedelta) else float(e.retry_after)
+            telegram_delivery_stats["retry_after"] += 1
+            _telegram_bucket(chat_id, TELEGRAM_CHAT_BURST)["blocked_until"] = time.monotonic() + retry_after
+            logger.warning(f"[Telegram Delivery] RetryAfter {retry_after:.0f}s for {method} in chat {chat_id} (attempt {attempt + 1})")
+            if attempt == TELEGRAM_MAX_RETRY_AFTER:
+                raise
+
+
+def queue_telegram_message(text, images=None, tweet_url=None, reply_markup=None, priority=TELEGRAM_PRIORITY_STATUS):
+    """Queues a channel message; returns a future with the sent Message (or None)."""
+    return submit_telegram_job(lambda: _deliver_telegram_message(text, images, tweet_url, reply_markup), priority)
+
+
+async def send_telegram_message(text, images=None, tweet_url=None, reply_markup=None, priority=TELEGRAM_PRIORITY_STATUS):
+    """
+    Sends a message to the Telegram channel through the delivery queue and waits for it.
+    Returns the sent Message (the last one if the text was split), or None.
+    """
+    return await queue_telegram_message(text, images, tweet_url, reply_markup, priority)
+
+
+def submit_telegram_job(deliver, priority):
+    """Queues deliver() (a coroutine function doing Bot API calls); returns a future with its result."""
+    global telegram_delivery_sequence
+    start_telegram_delivery_workers()
+    future = asyncio.get_running_loop().create_future()
+    telegram_delivery_sequence += 1
+    telegram_delivery_queue.put_nowait((priority, telegram_delivery_sequence, deliver, future))
+    return future
+
+
+async def telegram_delivery_worker(worker_number):
+    """Runs queued deliveries in priority order. Failures resolve the future with None, like the old inline sends."""
+    while True:
+        _, _, deliver, future = await telegram_delivery_queue.get()
+        try:
+            result = await deliver()
+            if not future.done():
+                future.set_result(result)
+        except Exception as e_delivery:
+            logger.error(f"[Telegram Delivery] Worker {worker_number} failed: {e_delivery}", exc_info=True)
+            if not future.done():
+                future.set_result(None)
+        finally:
+            telegram_delivery_queue.task_done()
+
+
+def start_telegram_delivery_workers():
+    """Starts the delivery workers (once, on the first queued message)."""
+    global telegram_delivery_tasks
+    telegram_delivery_tasks = [task for task in telegram_delivery_tasks if not task.done()]
+    for worker_number in range(len(telegram_delivery_tasks) + 1, TELEGRAM_DELIVERY_WORKERS + 1):
+        telegram_delivery_tasks.append(asyncio.create_task(telegram_delivery_worker(worker_number)))
+
+
+async def stop_telegram_delivery(timeout=15):
+    """Shutdown: lets queued messages go out (up to timeout seconds), then stops the workers."""
+    if telegram_delivery_tasks and not telegram_delivery_queue.empty():
+        print(f"[Telegram Delivery] Sending {telegram_delivery_queue.qsize()} queued message(s) before exit...")
+        try:
+            await asyncio.wait_for(telegram_delivery_queue.join(), timeout)
+        except asyncio.TimeoutError:
+            print(f"[Telegram Delivery] {telegram_delivery_queue.qsize()} message(s) not sent (timeout).")
+    for task in telegram_delivery_tasks:
+        task.cancel()
+
+
+def format_telegram_delivery_status():
+    """One line for /status."""
+    chat_bucket = telegram_buckets.get(CHANNEL_ID)
+    blocked_for = max(0.0, chat_bucket["blocked_until"] - time.monotonic()) if chat_bucket else 0.0
+    line = (f"{telegram_delivery_queue.qsize()} queued, {sum(1 for t in telegram_delivery_tasks if not t.done())} worker(s), "
+            f"{telegram_delivery_stats['calls']} API calls, {telegram_delivery_stats['retry_after']} RetryAfter")
+    return line + (f", paused {blocked_for:.0f}s" if blocked_for else "")
+# ===> END Telegram Delivery <===
+
+
+# ===> Telegram File ID Cache <===
+# Photos Telegram already has are resent by file_id instead of by URL, so Telegram
+# doesn't refetch the DexScreener/X image and a slow image host can't fail the send.
+# A photo that isn't cached yet is sent by URL as before (Telegram fetches it
+# server-side) and the returned file_id is stored under that URL.
+# DexScreener token images often come from several URLs; when a lookup returns an
+# image URL, it is downloaded and hashed in the background (sha256), so a new URL
+# with known content maps to the existing file_id before any alert needs it.
+# Nothing is downloaded on the sending path. Bounded LRU (OrderedDict, most recent
+# last), persisted to telegram_file_ids.json.
+TELEGRAM_FILE_ID_CACHE_FILE = "telegram_file_ids.json"
+TELEGRAM_FILE_ID_CACHE_MAX_ENTRIES = 1000
+TELEGRAM_FILE_ID_SAVE_EVERY = 10 # New entries between saves
+TELEGRAM_PHOTO_MAX_BYTES = 10 * 1024 * 1024 # Bot API limit for photos
+TELEGRAM_PHOTO_DOWNLOAD_TIMEOUT = 5
+telegram_file_ids = OrderedDict() # "url:<url>" / "sha256:<hex>" -> file_id
+telegram_photo_hashes = OrderedDict() # image URL -> "sha256:<hex>" (hashed, no file_id yet)
+telegram_photo_hash_tasks = set() # Strong references to running background hashes
+telegram_file_id_stats = {"url_hits": 0, "hash_hits": 0, "url_sends": 0, "hashed": 0, "stale": 0}
+telegram_file_ids_unsaved = 0
+
+
+def load_telegram_file_ids():
+    """Loads the persisted file_id cache."""
+    global telegram_file_ids
+    try:
+        if os.path.exists(TELEGRAM_FILE_ID_CACHE_FILE):
+            with open(TELEGRAM_FILE_ID_CACHE_FILE, 'r') as f:
+                loaded = json.load(f)
+            telegram_file_ids = OrderedDict((key, file_id) for key, file_id in loaded if isinstance(file_id, str)) if isinstance(loaded, list) else OrderedDict()
+            print(f"[File ID Cache] {len(telegram_file_ids)} cached Telegram photo IDs loaded.")
+    except (json.JSONDecodeError, Exception) as e:
+        print(f"Error loading Telegram file_id cache: {e}. Starting empty.")
+        telegram_file_ids = OrderedDict()
+
+
+def save_telegram_file_ids():
+    """Writes the cache as a list of [key, file_id] in LRU order (tmp file + replace)."""
+    global telegram_file_ids_unsaved
+    try:
+        tmp_file = TELEGRAM_FILE_ID_CACHE_FILE + ".tmp"
+        with open(tmp_file, 'w') as f:
+            json.dump(list(telegram_file_ids.items()), f)
+        os.replace(tmp_file, TELEGRAM_FILE_ID_CACHE_FILE)
+        telegram_file_ids_unsaved = 0
+    except Exception as e:
+        print(f"Error saving Telegram file_id cache: {e}")
+
+
+def _cached_file_id(key):
+    file_id = telegram_file_ids.get(key)
+    if file_id is not None:
+        telegram_file_ids.move_to_end(key)
+    return file_id
+
+
+def _store_file_id(keys, file_id):
+    """Inserts file_id under the keys as most recent, evicts down to the size limit and saves periodically."""
+    global telegram_file_ids_unsaved
+    for key in keys:
+        telegram_file_ids[key] = file_id
+        telegram_file_ids.move_to_end(key)
+        telegram_file_ids_unsaved += 1
+    while len(telegram_file_ids) > TELEGRAM_FILE_ID_CACHE_MAX_ENTRIES:
+        telegram_file_ids.popitem(last=False)
+    if telegram_file_ids_unsaved >= TELEGRAM_FILE_ID_SAVE_EVERY:
+        save_telegram_file_ids()
+
+
+def remember_photo_file_id(photo_keys, message):
+    """Stores the file_id of a sent photo message under all its keys (largest size, any is fine for resending)."""
+    photo_sizes = getattr(message, "photo", None)
+    if photo_sizes:
+        _store_file_id(photo_keys, photo_sizes[-1].file_id)
+
+
+def forget_photo_file_id(photo_keys):
+    """Drops entries whose file_id Telegram rejected (e.g. after a bot token change)."""
+    for key in photo_keys:
+        telegram_file_ids.pop(key, None)
+    telegram_file_id_stats["stale"] += 1
+
+
+def resolve_telegram_photo(image_url):
+    """
+    Returns (photo, keys, from_cache): photo is the cached file_id or the URL itself;
+    keys go to remember_photo_file_id() (the URL, plus the content hash if known).
+    """
+    url_key = f"url:{image_url}"
+    photo_keys = [url_key] + ([telegram_photo_hashes[image_url]] if image_url in telegram_photo_hashes else [])
+    file_id = _cached_file_id(url_key)
+    if file_id is not None:
+        telegram_file_id_stats["url_hits"] += 1
+        return file_id, photo_keys, True
+    telegram_file_id_stats["url_sends"] += 1
+    return image_url, photo_keys, False
+
+
+def start_photo_hash_prefetch(image_url):
+    """Hashes a DexScreener image in the background (no-op if its URL is already known)."""
+    if not image_url or f"url:{image_url}" in telegram_file_ids or image_url in telegram_photo_hashes:
+        return
+    task = asyncio.create_task(prefetch_photo_hash(image_url))
+    telegram_photo_hash_tasks.add(task)
+    task.add_done_callback(telegram_photo_hash_tasks.discard)
+
+
+async def prefetch_photo_hash(image_url):
+    """Downloads + hashes an image; known content links the URL to the existing file_id."""
+    try:
+        response = await http_get(image_url, timeout=TELEGRAM_PHOTO_DOWNLOAD_TIMEOUT)
+        response.raise_for_status()
+        content = response.content
+        if not content or len(content) > TELEGRAM_PHOTO_MAX_BYTES:
+            return
+    except Exception as e_download:
+        logger.info(f"[File ID Cache] Could not hash {image_url}: {e_download}")
+        return
+    hash_key = f"sha256:{hashlib.sha256(content).hexdigest()}"
+    telegram_file_id_stats["hashed"] += 1
+    file_id = _cached_file_id(hash_key)
+    if file_id is not None:
+        telegram_file_id_stats["hash_hits"] += 1
+        _store_file_id([f"url:{image_url}"], file_id)
+        return
+    telegram_photo_hashes[image_url] = hash_key
+    while len(telegram_photo_hashes) > TELEGRAM_FILE_ID_CACHE_MAX_ENTRIES:
+        telegram_photo_hashes.popitem(last=False)
+
+
+async def send_photo_cached(chat_id, photo_url, **kwargs):
+    """send_photo by file_id when Telegram already has the image; a rejected file_id is dropped and the URL retried."""
+    photo, photo_keys, from_cache = resolve_telegram_photo(photo_url)
+    try:
+        message = await telegram_api_call("send_photo", chat_id=chat_id, photo=photo, **kwargs)
+    except telegram.error.BadRequest as e_file_id:
+        if not from_cache:
+            raise
+        logger.warning(f"[File ID Cache] Cached file_id for {photo_url} rejected ({e_file_id}), sending the URL.")
+        forget_photo_file_id(photo_keys)
+        message = await telegram_api_call("send_photo", chat_id=chat_id, photo=photo_url, **kwargs)
+    remember_photo_file_id(photo_keys, message)
+    return message
+
+
+def format_telegram_file_id_stats():
+    """Plain text line for /cachestats."""
+    stats = telegram_file_id_stats
+    return (f"Photo file_ids: {len(telegram_file_ids)}/{TELEGRAM_FILE_ID_CACHE_MAX_ENTRIES} keys, "
+            f"{stats['url_hits']} hits, {stats['url_sends']} sent by URL, "
+            f"{stats['hash_hits']}/{stats['hashed']} DexScreener images matched by content, {stats['stale']} stale")
+# ===> END Telegram File ID Cache <===
+
+
 async def _send_long_message(application, chat_id, text, reply_markup, tweet_url):
     """
     Sends text messages, splitting them if necessary (> 4096 chars)
@@ -9137,22 +11492,22 @@ async def _send_long_message(application, chat_id, text, reply_markup, tweet_url
             for i, chunk in enumerate(chunks):
                 # Add buttons only to the last chunk
                 current_reply_markup = reply_markup if i == len(chunks) - 1 else None
-                message_sent = await application.bot.send_message(
+                message_sent = await telegram_api_call("send_message",
                     chat_id=chat_id,
                     text=chunk,
                     parse_mode=ParseMode.HTML,
                     disable_web_page_preview=True,
                     reply_markup=current_reply_markup
                 )
-                await asyncio.sleep(0.5) # Avoid rate limits
 
             # Store post URL if buttons were on the last message
             if reply_markup and tweet_url:
                  last_tweet_urls[chat_id] = tweet_url
+            return message_sent
 
         else:
             # Message is short enough, send in one go
-            message_sent = await application.bot.send_message(
+            message_sent = await telegram_api_call("send_message",
                 chat_id=chat_id,
                 text=text,
                 parse_mode=ParseMode.HTML,
@@ -9162,13 +11517,18 @@ async def _send_long_message(application, chat_id, text, reply_markup, tweet_url
              # Store post URL if buttons were present
             if reply_markup and tweet_url:
                 last_tweet_urls[chat_id] = tweet_url
+            return message_sent
 
+    except telegram.error.RetryAfter as flood_error:
+        # Retries are used up (see telegram_api_call); fallbacks would only hit the same limit again
+        print(f"Telegram flood control, message dropped: {flood_error}")
+        return None
     except Exception as send_error:
         print(f"Error sending Telegram message (Text): {send_error}")
         # Fallback 1: Try sending without HTML parsing
         try:
             plain_text_fallback = html.unescape(text) # Try to remove HTML entities for plain text
-            await application.bot.send_message(
+            message_sent = await telegram_api_call("send_message",
                 chat_id=chat_id,
                 text=plain_text_fallback, # Send plain text
                 parse_mode=None,
@@ -9179,6 +11539,7 @@ async def _send_long_message(application, chat_id, text, reply_markup, tweet_url
             # Store post URL here too if buttons were present
             if reply_markup and tweet_url:
                  last_tweet_urls[chat_id] = tweet_url
+            return message_sent
         except Exception as plain_error:
             print(f"Sending without HTML parsing also failed: {plain_error}")
             # Fallback 2: Send a very short, simple message
@@ -9186,15 +11547,16 @@ async def _send_long_message(application, chat_id, text, reply_markup, tweet_url
                 # Extract the first part of the original text as a hint
                 error_indicator_text = text.split('\n')[0] # First line as a clue
                 simple_text = error_indicator_text[:200] + "... [Error sending]"
-                await application.bot.send_message(chat_id=chat_id, text=simple_text)
+                await telegram_api_call("send_message", chat_id=chat_id, text=simple_text)
             except Exception as final_error:
                 print(f"Final attempt to send simple error message failed: {final_error}")
 
-async def send_telegram_message(text, images=None, tweet_url=None, reply_markup=None):
+async def _deliver_telegram_message(text, images=None, tweet_url=None, reply_markup=None):
     """
-    Sends a message to Telegram.
+    Sends a message to Telegram (runs in a delivery worker, see Telegram Delivery).
     If images are present AND the text is > 1024 characters long,
     a text message with a 🖼️ emoji is sent instead.
+    Returns the sent Message (the last one if the text was split), or None.
     """
     global application, last_tweet_urls # Access global variables
 
@@ -9214,8 +11576,6 @@ async def send_telegram_message(text, images=None, tweet_url=None, reply_markup=
         final_reply_markup = reply_markup
         # --- End Button Logic ---
 
-        await asyncio.sleep(0.5) # Reduce potential conflicts
-
         caption_limit = 1024
         image_emoji = "🖼️" # Emoji indicating images were present
 
@@ -9225,9 +11585,9 @@ async def send_telegram_message(text, images=None, tweet_url=None, reply_markup=
             if text_length <= caption_limit:
                 # Case 1: Images present, text short enough -> Send with send_photo
                 try:
-                    await application.bot.send_photo(
+                    sent_message = await send_photo_cached(
                         chat_id=CHANNEL_ID,
-                        photo=images[0], # Send only the first image
+                        photo_url=images[0], # Send only the first image (by file_id if Telegram has it)
                         caption=full_text, # Entire text fits
                         parse_mode=ParseMode.HTML,
                         reply_markup=final_reply_markup
@@ -9235,33 +11595,28 @@ async def send_telegram_message(text, images=None, tweet_url=None, reply_markup=
                     # Store post URL since image was sent and buttons might be present
                     if tweet_url:
                         last_tweet_urls[CHANNEL_ID] = tweet_url
+                    return sent_message
+                except telegram.error.RetryAfter as flood_error:
+                    print(f"Telegram flood control, photo dropped (no text fallback): {flood_error}")
+                    return None
                 except Exception as send_photo_error:
                     print(f"Error sending photo (despite fitting length): {send_photo_error}")
                     # Fallback: Try sending as text message with emoji
                     modified_text = f"{image_emoji} {full_text}"
-                    await _send_long_message(application, CHANNEL_ID, modified_text, final_reply_markup, tweet_url)
+                    return await _send_long_message(application, CHANNEL_ID, modified_text, final_reply_markup, tweet_url)
 
             else:
                 # Case 2: Images present, text too long for caption -> Send as text with emoji
                 print(f"Message too long for caption ({text_length} > {caption_limit}), sending as text with emoji.")
                 modified_text = f"{image_emoji} {full_text}" # Prepend emoji
-                await _send_long_message(application, CHANNEL_ID, modified_text, final_reply_markup, tweet_url)
+                return await _send_long_message(application, CHANNEL_ID, modified_text, final_reply_markup, tweet_url)
 
         else:
             # Case 3: No images -> Send as normal text message
-            await _send_long_message(application, CHANNEL_ID, full_text, final_reply_markup, tweet_url)
+            return await _send_long_message(application, CHANNEL_ID, full_text, final_reply_markup, tweet_url)
 
     except Exception as e:
-        print(f"Unexpected error in send_telegram_message: {e}")
-
-def detect_chain(contract):
-    """Detect which blockchain a contract address belongs to"""
-    if re.match(r'^[1-9A-HJ-NP-Za-km-z]{32,44}$', contract):
-        return 'solana'
-    elif re.match(r'^0x[a-fA-F0-9]{40}$', contract):
-        return 'bsc'
-    return 'unknown'
-
+        print(f"Unexpected error in _deliver_telegram_message: {e}")
 
 async def process_full_text_request(query, context, tweet_url): # Added context
     """Processes the request to get full post text and update the message."""
@@ -9273,7 +11628,7 @@ async def process_full_text_request(query, context, tweet_url): # Added context
         await pause_scraping()
 
         # --- Get Full Text ---
-        full_text = await get_full_tweet_text(tweet_url) # This function now handles navigation back
+        full_text = await single_flight(("fulltext", tweet_url), lambda: get_full_tweet_text(tweet_url)) # This function now handles navigation back
 
         if full_text is None:
             await query.answer("Could not load full text. Please try again.")
@@ -9840,7 +12195,7 @@ async def check_and_process_queue(application):
                 success = await repost_tweet(tweet_url)
                 result_message_for_log = f"Repost {'succeeded' if success else 'failed'} for {tweet_id}"
             elif action_type == "full" and tweet_url and chat_id and message_id:
-                full_text = await get_full_tweet_text(tweet_url)
+                full_text = await single_flight(("fulltext", tweet_url), lambda: get_full_tweet_text(tweet_url))
                 if full_text:
                     escaped_full_text = html.escape(full_text)
                     try:
@@ -10175,6 +12530,118 @@ async def end_adhoc_session_command(update: Update, context: ContextTypes.DEFAUL
     # Wir müssen hier nicht mehr application.stop() oder sys.exit() aufrufen.
 
 
+# ===> Adaptive Poll Scheduler <===
+# Learns the post arrival rate per account and hour of day from the scan history
+# (EWMA of new posts per minute, persisted) and scales it with the weekday profile
+# from posts_count. The run loop polls fast during bursts and backs off when quiet.
+ACTIVITY_FILE = "scan_activity.json"
+ACTIVITY_EWMA_ALPHA = 0.05 # Weight of the newest round in the per-hour rate estimate
+ACTIVITY_SAVE_EVERY_ROUNDS = 50
+POLL_MIN_SECONDS = 0.3 # Delay between rounds during a burst
+POLL_MAX_SECONDS = 10.0 # Delay cap during quiet hours
+POLL_DEFAULT_SECONDS = 1.0 # Delay while there is no history for this hour yet
+POLLS_PER_EXPECTED_POST = 4 # Target number of rounds per expected new post
+scan_activity = {} # {"account": {"0".."23": {"rate": posts_per_min, "rounds": n}}}
+posts_queued_total = 0 # Incremented by submit_post_record, diffed per round
+poll_state = {"last_round_time": None, "last_queued_total": 0, "empty_rounds": 0, "rounds_since_save": 0, "delay": POLL_DEFAULT_SECONDS}
+
+
+def load_scan_activity():
+    """Loads the recorded arrival rates."""
+    global scan_activity
+    try:
+        if os.path.exists(ACTIVITY_FILE):
+            with open(ACTIVITY_FILE, 'r') as f:
+                loaded = json.load(f)
+            scan_activity = loaded if isinstance(loaded, dict) else {}
+            print(f"Scan activity history loaded for {len(scan_activity)} account(s).")
+        else:
+            scan_activity = {}
+            print(f"No scan activity file found ({ACTIVITY_FILE}), adaptive polling starts without history.")
+    except (json.JSONDecodeError, Exception) as e:
+        print(f"Error loading scan activity ({type(e).__name__}): {e}. Starting without history.")
+        scan_activity = {}
+
+
+def save_scan_activity():
+    """Saves the recorded arrival rates."""
+    try:
+        with open(ACTIVITY_FILE, 'w') as f:
+            json.dump(scan_activity, f, indent=4)
+        poll_state["rounds_since_save"] = 0
+    except Exception as e:
+        print(f"Error saving scan activity: {e}")
+
+
+def _weekday_activity_factor():
+    """Today's average found posts relative to the average weekday (posts_count), clamped to 0.5-2.0."""
+    averages = {day: data["count"] / data["days"] for day, data in posts_count.get("weekdays", {}).items() if data.get("days")}
+    if not averages:
+        return 1.0
+    overall = sum(averages.values()) / len(averages)
+    today = averages.get(datetime.now().strftime("%A"))
+    if not overall or today is None:
+        return 1.0
+    return min(2.0, max(0.5, today / overall))
+
+
+def expected_arrival_rate():
+    """Expected new posts per minute for the current account and hour, None without history."""
+    entry = scan_activity.get(current_account_key(), {}).get(str(datetime.now().hour))
+    if not entry or entry.get("rounds", 0) < 10:
+        return None
+    return entry["rate"] * _weekday_activity_factor()
+
+
+def record_scan_round():
+    """Feeds the number of posts queued since the last round into the rate estimate and updates the poll delay."""
+    now = time.time()
+    new_posts = posts_queued_total - poll_state["last_queued_total"]
+    poll_state["last_queued_total"] = posts_queued_total
+    last_round_time, poll_state["last_round_time"] = poll_state["last_round_time"], now
+    if last_round_time is None:
+        return
+    elapsed = now - last_round_time
+    if 0 < elapsed <= 600: # Longer gaps (pauses, restarts) say nothing about the arrival rate
+        hours = scan_activity.setdefault(current_account_key(), {})
+        entry = hours.setdefault(str(datetime.now().hour), {"rate": 0.0, "rounds": 0})
+        round_rate = new_posts / (elapsed / 60)
+        entry["rate"] = round_rate if entry["rounds"] == 0 else (1 - ACTIVITY_EWMA_ALPHA) * entry["rate"] + ACTIVITY_EWMA_ALPHA * round_rate
+        entry["rounds"] += 1
+
+    poll_state["empty_rounds"] = 0 if new_posts else poll_state["empty_rounds"] + 1
+    poll_state["delay"] = next_poll_delay()
+
+    poll_state["rounds_since_save"] += 1
+    if poll_state["rounds_since_save"] >= ACTIVITY_SAVE_EVERY_ROUNDS:
+        save_scan_activity()
+
+
+def next_poll_delay():
+    """Seconds to wait before the next round: minimum during a burst, otherwise rate-based with quiet backoff."""
+    if poll_state["empty_rounds"] == 0:
+        return POLL_MIN_SECONDS # Posts just arrived, more usually follow
+    rate = expected_arrival_rate()
+    if rate is None:
+        baseline = POLL_DEFAULT_SECONDS
+    elif rate <= 0:
+        baseline = POLL_MAX_SECONDS
+    else:
+        baseline = 60 / (rate * POLLS_PER_EXPECTED_POST)
+    backoff = 1 + poll_state["empty_rounds"] / 10 # Grows slowly while nothing arrives
+    return min(POLL_MAX_SECONDS, max(POLL_MIN_SECONDS, baseline * backoff))
+
+
+async def adaptive_poll_wait():
+    """Waits the current poll delay, but returns early when a button action is queued."""
+    deadline = time.time() + poll_state["delay"]
+    while time.time() < deadline:
+        if not action_queue.empty():
+            return
+        await asyncio.sleep(min(0.25, max(0.0, deadline - time.time())))
+# ===> END Adaptive Poll Scheduler <===
+
+
 async def run():
     """Main loop with correct state handling for pause/resume."""
     global application, global_followed_users_set, is_scraping_paused, is_schedule_pause, pause_event, manual_session_login_confirmed
@@ -10197,7 +12664,10 @@ async def run():
         print("Initializing Telegram Bot...")
         global ACTIVE_BOT_TOKEN
         if not ACTIVE_BOT_TOKEN: print("ERROR: No active bot token!"); return
-        application = ApplicationBuilder().token(ACTIVE_BOT_TOKEN).connect_timeout(30).read_timeout(30).build()
+        application_builder = ApplicationBuilder().token(ACTIVE_BOT_TOKEN).connect_timeout(30).read_timeout(30)
+        if TELEGRAM_API_BASE_URL: # e.g. a local fake Bot API server
+            application_builder = application_builder.base_url(TELEGRAM_API_BASE_URL)
+        application = application_builder.build()
         # ... Add handlers ...
           # --- Register Command Handlers (ALL via the Admin Helper) ---
         # Syntax: add_admin_command_handler(application, "command_name", function_name)
@@ -10218,6 +12688,7 @@ async def run():
         add_admin_command_handler(application, "rates", show_ratings_command) # Maybe leave ratings public?
         add_admin_command_handler(application, "backupfollowers", backup_followers_command)
         add_admin_command_handler(application, "setmaxage", set_max_age_command)
+        add_admin_command_handler(application, "scanmode", scan_mode_command)
 
         # Following Database Commands
         add_admin_command_handler(application, "scrapefollowing", scrape_following_command)
@@ -10227,6 +12698,13 @@ async def run():
         # Converted Commands
         add_admin_command_handler(application, "keywords", keywords_command) # Maybe leave list public?
         add_admin_command_handler(application, "addkeyword", add_keyword_command)
+        add_admin_command_handler(application, "keywordmode", keyword_mode_command)
+        add_admin_command_handler(application, "filterrules", filter_rules_command)
+        add_admin_command_handler(application, "addrule", add_rule_command)
+        add_admin_command_handler(application, "removerule", remove_rule_command)
+        add_admin_command_handler(application, "replay", replay_command)
+        add_admin_command_handler(application, "cachestats", cache_stats_command)
+        add_admin_command_handler(application, "digest", digest_command)
         add_admin_command_handler(application, "removekeyword", remove_keyword_command)
         add_admin_command_handler(application, "follow", follow_command)
         add_admin_command_handler(application, "unfollow", unfollow_command)
@@ -10308,6 +12786,8 @@ async def run():
 
         print("Loading settings, counters, and lists...")
         load_settings(); load_posts_count(); load_schedule(); load_ratings(); load_link_display_config()
+        load_processed_tweets(); load_watermarks(); load_scan_activity(); load_filter_rules(); load_enrichment_cache(); load_telegram_file_ids()
+        rebuild_keyword_matcher() # Matching options come from settings.json
         load_following_database() # Load Following DB
         load_admins() # Load Admin list
         global_followed_users_set = load_set_from_file(GLOBAL_FOLLOWED_FILE)
@@ -10504,6 +12984,8 @@ async def run():
         # --- End Initial Queue Check ---
 
 
+        start_post_pipeline_workers() # Matching/enrichment/sending run beside the scan loop
+
         # --- Main Loop ---
         print("Starting main loop...")
         while not bot_should_exit: # Prüfe hier die neue Variable
@@ -10860,8 +13342,12 @@ async def run():
                 # --- Scroll to Top before processing ---
                 try:
                     #print("[Run Loop] Scrolling to top...") # Optional Debug
-                    driver.execute_script("window.scrollTo(0, 0);")
-                    await asyncio.sleep(random.uniform(0.5, 1.0)) # Short wait after scroll up
+                    if scan_mode in PUSH_SCAN_MODES:
+                        # X only renders (and the feed observer only sees) new posts near the top
+                        driver.execute_script("if (window.scrollY > 0) window.scrollTo(0, 0);")
+                    else:
+                        driver.execute_script("window.scrollTo(0, 0);")
+                        await asyncio.sleep(random.uniform(0.5, 1.0)) # Short wait after scroll up
                 except Exception as scroll_err:
                     print(f"Error scrolling to top: {scroll_err}")
                 # --- End Scroll to Top ---
@@ -10872,6 +13358,7 @@ async def run():
                     continue # Start next loop iteration immediately after button action
                 # --- Main Scraping Logic ---
                 await process_tweets()
+                record_scan_round() # Feeds the adaptive poll scheduler
 
                 # --- Queue Check 2: After post Processing ---
                 action_was_processed = await check_and_process_queue(application)
@@ -10888,7 +13375,10 @@ async def run():
 
                 # Decide if scrolling happens in this iteration
                 # Scroll ONLY if the bot is NOT paused by any mechanism (manual, schedule, OR by a sub-task like backup/sync)
-                if not is_scraping_paused: # is_scraping_paused is True if any task like backup/sync is running
+                if not is_scraping_paused and scan_mode in PUSH_SCAN_MODES:
+                    # New posts are pushed (page-side feed / captured timeline JSON), so stay at the top and just poll
+                    await adaptive_poll_wait()
+                elif not is_scraping_paused: # is_scraping_paused is True if any task like backup/sync is running
                     if random.random() < 0.8: # Scrolls in 80% of cases WHEN ACTIVELY SCRAPING (not paused by sub-task)
                         try:
                             # Random scroll distance
@@ -10904,7 +13394,7 @@ async def run():
                             print(f"Error scrolling in run loop: {scroll_err}")
                     else:
                         # print("[Run Loop] Skipping scroll this iteration (random chance or paused).") # Optional: Keep or remove log
-                        await asyncio.sleep(random.uniform(0.5, 1.5)) # Still wait even if not scrolling
+                        pass # The adaptive pause at the end of the loop still applies
                 else:
                     # If paused (e.g., by backup_followers_logic), just wait briefly instead of scrolling.
                     # This prevents the run loop from interfering with the backup's scrolling.
@@ -10917,8 +13407,11 @@ async def run():
                 if action_was_processed:
                     continue # Start next loop iteration immediately after button action
 
-                # --- Short pause at the end of the loop ---
-                await asyncio.sleep(random.uniform(0.1, 0.3))
+                # --- Adaptive pause at the end of the loop (short in bursts, long in quiet hours) ---
+                if not is_scraping_paused and scan_mode not in PUSH_SCAN_MODES:
+                    await adaptive_poll_wait()
+                else:
+                    await asyncio.sleep(random.uniform(0.1, 0.3))
 
             except Exception as e:
                 # ... (Your error handling as before) ...
@@ -10927,7 +13420,7 @@ async def run():
                 traceback.print_exc()
                 # Network error logic etc.
                 current_time = time.time()
-                if isinstance(e, (requests.exceptions.ConnectionError, TimeoutException, OSError)): # OSError for DNS etc.
+                if isinstance(e, (requests.exceptions.ConnectionError, httpx.TransportError, TimeoutException, OSError)): # OSError for DNS etc.
                     network_error_count += 1
                     print(f"Network error detected ({network_error_count}). Waiting longer...")
                     await asyncio.sleep(60 * network_error_count) # Longer pause for repeated errors
@@ -11016,51 +13509,17 @@ async def manual_login_complete_command(update: Update, context: ContextTypes.DE
 async def show_ratings_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Displays the collected ratings, including Top 3."""
     global ratings_data
-    load_ratings() # Ensure the latest data is loaded
 
     if not ratings_data:
         await update.message.reply_text("📊 No ratings available yet.")
         await resume_scraping() # Resume after command
         return
 
-    source_averages = []
-    # Calculate average for all sources first
-    for source_key, data in ratings_data.items():
-        # Ensure 'ratings' exists and is a dictionary
-        rating_counts = data.get("ratings", {})
-        if not isinstance(rating_counts, dict):
-            print(f"WARNING: Invalid rating data for {source_key}, skipping.")
-            continue
-
-        # Get the name, fall back to the key if not present
-        display_name = data.get("name", source_key)
-
-        total_ratings = 0
-        weighted_sum = 0
-        for star_str, count in rating_counts.items():
-            try:
-                star = int(star_str)
-                if 1 <= star <= 5:
-                    total_ratings += count
-                    weighted_sum += star * count
-            except ValueError:
-                continue # Ignore invalid keys
-
-        if total_ratings > 0:
-            average = weighted_sum / total_ratings
-            source_averages.append({
-                "key": source_key,
-                "name": display_name,
-                "average": average,
-                "total_ratings": total_ratings,
-                "counts": rating_counts # Keep counts for detail view
-            })
-        else:
-             # Optional: Add sources without ratings if desired (not relevant for Top 3 here)
-             pass
-
-    # Sort by average (descending)
-    sorted_averages = sorted(source_averages, key=lambda item: item["average"], reverse=True)
+    # Best rated sources come straight from the reputation index (already sorted)
+    sorted_averages = [
+        {"key": source_key, "name": ratings_data.get(source_key, {}).get("name", source_key), "average": average, "total_ratings": total_ratings}
+        for source_key, average, total_ratings in top_rated_authors(3)
+    ]
 
     output_messages = []
     current_message = ""
@@ -11080,6 +13539,7 @@ async def show_ratings_command(update: Update, context: ContextTypes.DEFAULT_TYP
             top_3_output += (f"{medal} {html.escape(item['name'])} ({html.escape(item['key'])}) "
                              f"~ {item['average']:.2f} 💎 ({item['total_ratings']} Ratings)\n")
     top_3_output += "     ⚜️⚜️⚜️\n"
+    top_3_output += f"{count_authors_with_avg_at_least(min_average_rating_for_posts)} of {len(rating_ranking)} rated sources reach the min. average ({min_average_rating_for_posts:.1f})\n"
     current_message += top_3_output
     # === END Top 3 Section ===
 
@@ -11098,18 +13558,14 @@ async def show_ratings_command(update: Update, context: ContextTypes.DEFAULT_TYP
 
         source_output = f"\n<b>{html.escape(display_name)} ({html.escape(source_key)})</b>\n"
 
-        total_ratings = 0
-        weighted_sum = 0
         details = ""
         for star in range(1, 6):
             star_str = str(star)
             count = rating_counts.get(star_str, 0)
             details += f"{star} 💎 - {count}\n"
-            total_ratings += count
-            weighted_sum += star * count
 
-        if total_ratings > 0:
-            average = weighted_sum / total_ratings
+        average, total_ratings = author_rating_stats(source_key)
+        if average is not None:
             avg_str = f"💎 ~ {average:.2f}"
         else:
             avg_str = "💎 ~ N/A"
@@ -11237,6 +13693,207 @@ async def set_max_age_command(update: Update, context: ContextTypes.DEFAULT_TYPE
         await update.message.reply_text(f"❌ Error setting max age: {e}")
         logger.error(f"Error setting max post age to '{context.args[0]}': {e}", exc_info=True)
 
+async def scan_mode_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Shows or sets how new posts are picked up from the timeline."""
+    global scan_mode
+    # pause/resume is handled by the admin wrapper
+
+    if not context.args or len(context.args) != 1:
+        await update.message.reply_text(
+            f"ℹ️ Current scan mode: `{scan_mode}`\n\n"
+            f"Format: `/scanmode <{'|'.join(SCAN_MODES)}>`\n\n"
+            f"`dom` - 'Show N posts' button + scrolling\n"
+            f"`observer` - in-page feed of newly inserted posts (falls back to `dom`)\n"
+            f"`network` - reads X's timeline JSON from the network log (restarts WebDriver, falls back to `dom`)\n"
+            f"`snapshot` - like `dom`, but parses the page source with BeautifulSoup in a worker thread",
+            parse_mode=ParseMode.MARKDOWN
+        )
+        return
+
+    new_mode = context.args[0].lower()
+    if new_mode not in SCAN_MODES:
+        await update.message.reply_text(f"❌ Unknown scan mode '{new_mode}'. Valid: {', '.join(SCAN_MODES)}")
+        return
+
+    needs_restart = (new_mode == "network") != (scan_mode == "network") # Performance log is a driver capability
+    scan_mode = new_mode
+    save_settings()
+    logger.info(f"Scan mode set to {new_mode} by user {update.message.from_user.id}")
+    if needs_restart:
+        await update.message.reply_text(f"✅ Scan mode set to {new_mode.upper()}. Restarting WebDriver...")
+        await restart_driver_and_login(update)
+    else:
+        await update.message.reply_text(f"✅ Scan mode set to {new_mode.upper()}.")
+
+async def keyword_mode_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Shows or sets the keyword matching options (whole words / case folding)."""
+    global keyword_whole_words, keyword_case_fold
+    # pause/resume is handled by the admin wrapper
+
+    args = [arg.lower() for arg in (context.args or [])]
+    if len(args) != 2 or args[0] not in ("words", "case") or args[1] not in ("on", "off"):
+        await update.message.reply_text(
+            f"ℹ️ Keyword matching: whole words `{'on' if keyword_whole_words else 'off'}`, "
+            f"ignore case `{'on' if keyword_case_fold else 'off'}`\n\n"
+            f"Format: `/keywordmode words on|off` or `/keywordmode case on|off`\n\n"
+            f"`words on` - 'sol' matches 'sol' but not 'solid'\n"
+            f"`case off` - 'PEPE' only matches 'PEPE'",
+            parse_mode=ParseMode.MARKDOWN
+        )
+        return
+
+    enabled = args[1] == "on"
+    if args[0] == "words":
+        keyword_whole_words = enabled
+    else:
+        keyword_case_fold = enabled
+    save_settings()
+    rebuild_keyword_matcher()
+    logger.info(f"Keyword matching option '{args[0]}' set to {args[1]} by user {update.message.from_user.id}")
+    await update.message.reply_text(f"✅ Keyword matching: {args[0]} {args[1].upper()}.")
+
+async def filter_rules_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Shows the filter rules in force and their evaluation timing."""
+    # pause/resume is handled by the admin wrapper
+    expressions = effective_filter_rules()
+    source = "custom" if filter_rules else "derived from search toggles"
+    rules_text = "\n".join(f"{i + 1}. {html.escape(expr)}" for i, expr in enumerate(expressions)) or "(none - nothing is sent)"
+    await update.message.reply_text(
+        f"🧮 <b>Filter Rules</b> ({source})\n{rules_text}\n\n"
+        f"{html.escape(format_filter_rule_stats())}\n\n"
+        "<code>/addrule ca AND avg&gt;=3</code>\n"
+        "<code>/addrule keyword:pepe AND author:alice,bob</code>\n"
+        "<code>/removerule 1</code> or <code>/removerule all</code>\n"
+        "Conditions: keyword, keyword:WORD, ca, ticker, repost, rated, unrated, author:h1,h2, avg>=N, ratings>=N; "
+        "combine with NOT, AND, OR, ( ). A post is sent if any rule matches.",
+        parse_mode=ParseMode.HTML
+    )
+
+async def add_rule_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Adds a custom filter rule (replaces the toggle-derived rule)."""
+    # pause/resume is handled by the admin wrapper
+    expression = " ".join(context.args or []).strip()
+    if not expression:
+        await update.message.reply_text("ℹ️ Format: `/addrule <rule>`, e.g. `/addrule ca AND avg>=3`", parse_mode=ParseMode.MARKDOWN)
+        return
+    try:
+        compile_filter_rule(expression)
+    except ValueError as e_rule:
+        await update.message.reply_text(f"❌ Invalid rule: {e_rule}")
+        return
+    filter_rules.append(expression)
+    save_filter_rules()
+    logger.info(f"Filter rule added by user {update.message.from_user.id}: {expression}")
+    await update.message.reply_text(f"✅ Rule #{len(filter_rules)} added: {expression}")
+
+async def remove_rule_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Removes a custom filter rule by number, or all of them."""
+    # pause/resume is handled by the admin wrapper
+    arg = (context.args or [""])[0].lower()
+    if arg == "all":
+        filter_rules.clear()
+        save_filter_rules()
+        await update.message.reply_text("✅ All custom rules removed, using the search toggles again.")
+        return
+    if not arg.isdigit() or not 1 <= int(arg) <= len(filter_rules):
+        await update.message.reply_text(f"ℹ️ Format: `/removerule <1-{max(1, len(filter_rules))}|all>`", parse_mode=ParseMode.MARKDOWN)
+        return
+    removed = filter_rules.pop(int(arg) - 1)
+    save_filter_rules()
+    logger.info(f"Filter rule removed by user {update.message.from_user.id}: {removed}")
+    await update.message.reply_text(f"🗑️ Rule removed: {removed}")
+
+async def replay_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Replays archived posts through the current keywords and filter rules."""
+    # pause/resume is handled by the admin wrapper
+    args = context.args or []
+    now = datetime.now(timezone.utc)
+    try:
+        if len(args) == 1 and args[0].isdigit():
+            start, end = now - timedelta(hours=int(args[0])), now
+        elif 1 <= len(args) <= 2:
+            parse = lambda value: datetime.strptime(value, "%Y-%m-%d-%H" if value.count("-") == 3 else "%Y-%m-%d").replace(tzinfo=timezone.utc)
+            start = parse(args[0])
+            end = parse(args[1]) if len(args) == 2 else start
+            if args[-1].count("-") == 2: # Whole last day
+                end = end + timedelta(hours=23)
+        else:
+            raise ValueError
+    except ValueError:
+        await update.message.reply_text(
+            "ℹ️ Format: `/replay <hours>` or `/replay YYYY-MM-DD[-HH] [YYYY-MM-DD[-HH]]` (UTC)\n"
+            "Example: `/replay 24` - what the current keywords/rules would have caught in the last 24h",
+            parse_mode=ParseMode.MARKDOWN
+        )
+        return
+
+    flush_post_archive() # Include the records still in the buffer
+    paths = archive_partitions_between(start, end)
+    if not paths:
+        await update.message.reply_text(f"📼 No archived posts between {start:%Y-%m-%d %H}:00 and {end:%Y-%m-%d %H}:59 UTC.")
+        return
+    await update.message.reply_text(f"📼 Replaying {len(paths)} archive hour(s)...")
+    summary = await asyncio.to_thread(replay_post_archive, paths, get_filter_program(), keyword_automaton)
+
+    rate = summary["posts"] / summary["seconds"] if summary["seconds"] > 0 else 0
+    hit_rate = summary["hits"] / max(1, summary["posts"] - summary["ads"]) * 100
+    top_reasons = sorted(summary["reasons"].items(), key=lambda item: item[1], reverse=True)[:10]
+    lines = [
+        f"📼 Replay {start:%Y-%m-%d %H}:00 - {end:%Y-%m-%d %H}:59 UTC",
+        f"Posts: {summary['posts']} ({summary['ads']} ads skipped)",
+        f"Hits: {summary['hits']} ({hit_rate:.1f}%)",
+        f"Throughput: {rate:,.0f} posts/s ({summary['seconds']:.2f}s)",
+    ]
+    if summary["rules"]:
+        lines.append("\nBy rule:")
+        lines.extend(f"{count}x {expression}" for expression, count in summary["rules"].items())
+    if top_reasons:
+        lines.append("\nTop reasons:")
+        lines.extend(f"{count}x {reason}" for reason, count in top_reasons)
+    if summary["samples"]:
+        lines.append("\nSample hits:")
+        lines.extend(summary["samples"])
+    if summary["errors"]:
+        lines.append(f"\n⚠️ {summary['errors']} unreadable line(s)/file(s)")
+    await update.message.reply_text("\n".join(lines), disable_web_page_preview=True)
+
+async def cache_stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Shows the enrichment cache statistics; '/cachestats clear' empties the cache."""
+    # pause/resume is handled by the admin wrapper
+    if context.args and context.args[0].lower() == "clear":
+        enrichment_cache.clear()
+        save_enrichment_cache()
+        await update.message.reply_text("🗑️ Enrichment cache cleared.")
+        return
+    await update.message.reply_text(f"{format_enrichment_cache_stats()}\n{format_telegram_file_id_stats()}")
+
+async def digest_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Shows or sets digest mode: /digest on|off, /digest window <seconds>, /digest by ca|ticker."""
+    global digest_mode_enabled, digest_window_seconds, digest_group_by
+    # pause/resume is handled by the admin wrapper
+
+    args = [arg.lower() for arg in (context.args or [])]
+    if len(args) == 1 and args[0] in ("on", "off"):
+        digest_mode_enabled = args[0] == "on"
+    elif len(args) == 2 and args[0] == "window" and args[1].isdigit() and 5 <= int(args[1]) <= 600:
+        digest_window_seconds = int(args[1])
+    elif len(args) == 2 and args[0] == "by" and args[1] in DIGEST_GROUP_KEYS:
+        digest_group_by = args[1]
+    else:
+        await update.message.reply_text(
+            f"ℹ️ Digest mode: `{'on' if digest_mode_enabled else 'off'}`, window `{digest_window_seconds}s`, grouped by `{digest_group_by}`\n"
+            f"{digest_stats['coalesced_posts']} posts coalesced into {digest_stats['digests']} digests, {len(digest_groups)} group(s) open\n\n"
+            f"Format: `/digest on|off`, `/digest window 60` (5-600s) or `/digest by ca|ticker`\n\n"
+            f"The first post about a token is sent right away; more posts with the same CA/ticker "
+            f"within the window are sent together as one digest.",
+            parse_mode=ParseMode.MARKDOWN
+        )
+        return
+    save_settings()
+    logger.info(f"Digest settings changed to {' '.join(args)} by user {update.message.from_user.id}")
+    await update.message.reply_text(
+        f"✅ Digest mode {'ON' if digest_mode_enabled else 'OFF'} ({digest_window_seconds}s window, grouped by {digest_group_by}).")
+
 # --- Headless Mode Toggle Command ---
 async def toggle_headless_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Toggles the Headless mode ON/OFF (requires restart)."""
@@ -11409,6 +14066,19 @@ async def restart_driver_and_login(update_or_query):
 async def cleanup():
     """Clean up resources on exit"""
     global driver
+    await drain_post_pipeline() # Before saving processed IDs: queued posts are already marked
+    if processed_tweets_unsaved:
+        save_processed_tweets()
+    save_scan_activity()
+    flush_ratings()
+    flush_post_archive()
+    if enrichment_cache_unsaved:
+        save_enrichment_cache()
+    await flush_all_digest_groups()
+    await stop_telegram_delivery()
+    if telegram_file_ids_unsaved:
+        save_telegram_file_ids()
+    await close_http_client()
     print("Attempting to close WebDriver...")
     if driver:
         try:
@@ -0,0 +1,70 @@
+"""
+main.py runs the bot on import (config.env, accounts, Telegram), so the tests
+compile only the parts they need: whole "# ===> Name <===" sections and/or
+single top-level definitions, executed into a fresh namespace per test.
+"""
+import ast
+import asyncio
+import base64
+import bisect
+import gzip
+import hashlib
+import html
+import json
+import logging
+import math
+import os
+import re
+import time
+from collections import deque, OrderedDict
+from datetime import datetime, timezone, timedelta
+from pathlib import Path
+from typing import Union
+from urllib.parse import urlparse
+
+import pytest
+
+MAIN_PATH = Path(__file__).resolve().parent.parent / "main.py"
+_SOURCE = MAIN_PATH.read_text(encoding="utf-8")
+_TREE = ast.parse(_SOURCE)
+_LINES = _SOURCE.splitlines()
+
+
+def _section_range(name):
+    """Line range of a section; the opening marker may add a note, e.g. '# ===> Feed Observer (scan_mode "observer") <==='."""
+    start = next(number for number, line in enumerate(_LINES, 1)
+                 if line == f"# ===> {name} <===" or (line.startswith(f"# ===> {name} (") and line.endswith(") <===")))
+    end = _LINES.index(f"# ===> END {name} <===") + 1
+    return start, end
+
+
+def _node_name(node):
+    if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+        return node.name
+    if isinstance(node, ast.Assign) and isinstance(node.targets[0], ast.Name):
+        return node.targets[0].id
+    return None
+
+
+def load_main(sections=(), names=(), **overrides):
+    """Namespace with the given sections/definitions of main.py; overrides stub the rest (bot, constants...)."""
+    namespace = {
+        "asyncio": asyncio, "base64": base64, "bisect": bisect, "gzip": gzip, "hashlib": hashlib, "html": html,
+        "json": json, "math": math, "os": os, "re": re, "time": time, "deque": deque, "OrderedDict": OrderedDict,
+        "datetime": datetime, "timezone": timezone, "timedelta": timedelta, "Union": Union, "urlparse": urlparse,
+        "logger": logging.getLogger("main"),
+    }
+    namespace.update(overrides) # Also before exec: annotations and defaults are evaluated at definition time
+    ranges = [_section_range(section) for section in sections]
+    nodes = [node for node in _TREE.body
+             if any(start <= node.lineno <= end for start, end in ranges) or _node_name(node) in names]
+    missing = set(names) - {_node_name(node) for node in nodes}
+    assert not missing, f"not found in main.py: {missing}"
+    exec(compile(ast.Module(body=nodes, type_ignores=[]), str(MAIN_PATH), "exec"), namespace)
+    namespace.update(overrides)
+    return namespace
+
+
+@pytest.fixture
+def main_loader():
+    return load_main
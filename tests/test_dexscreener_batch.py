@@ -0,0 +1,96 @@
+"""Batched DexScreener lookups against a local stub of the /tokens/v1 endpoint."""
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+httpx = pytest.importorskip("httpx")
+
+SOLANA_CAS = [f"CA{index:03d}pump" for index in range(65)]
+
+
+class StubDexScreener(BaseHTTPRequestHandler):
+    requests_seen = []
+    fail = False
+
+    def do_GET(self):
+        type(self).requests_seen.append(self.path)
+        if type(self).fail:
+            self.send_response(503)
+            self.end_headers()
+            return
+        addresses = self.path.rsplit("/", 1)[1].split(",")
+        pairs = [{
+            "chainId": "solana", "dexId": "raydium", "pairAddress": f"PAIR-{address}",
+            "baseToken": {"address": address, "symbol": address[:5].upper(), "name": address},
+            "quoteToken": {"address": "So11111111111111111111111111111111111111112", "symbol": "SOL"},
+            "info": {"openGraph": f"https://cdn.example/{address}.png"}, "liquidity": {"usd": 12345.0},
+        } for address in addresses if not address.startswith("unknown")]
+        body = json.dumps(pairs).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    StubDexScreener.requests_seen = []
+    StubDexScreener.fail = False
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubDexScreener)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+
+
+@pytest.fixture
+def dexscreener(main_loader, stub_server):
+    return main_loader(
+        sections=("Circuit Breaker", "HTTP Client", "DexScreener Batch Lookups"),
+        names=("parse_dexscreener_search",),
+        httpx=httpx, DEXSCREENER_API_BASE=f"http://127.0.0.1:{stub_server.server_port}",
+        DEXSCREENER_BATCH_WINDOW_SECONDS=0.05,
+    )
+
+
+def run_lookups(namespace, contracts):
+    async def lookups():
+        try:
+            return await asyncio.gather(*(namespace["fetch_dexscreener_token"](contract) for contract in contracts))
+        finally:
+            await namespace["close_http_client"]()
+    return asyncio.run(lookups())
+
+
+def test_concurrent_lookups_share_batched_requests(dexscreener):
+    results = run_lookups(dexscreener, SOLANA_CAS)
+
+    assert [len(path.rsplit("/", 1)[1].split(",")) for path in StubDexScreener.requests_seen] == [30, 30, 5]
+    assert all(path.startswith("/tokens/v1/solana/") for path in StubDexScreener.requests_seen)
+    assert dexscreener["dexscreener_batch_stats"] == {"requests": 3, "addresses": 65}
+    for contract, token_info in zip(SOLANA_CAS, results):
+        assert token_info["found"] is True
+        assert token_info["pair_address"] == f"PAIR-{contract}"
+        assert token_info["image_url"] == f"https://cdn.example/{contract}.png"
+        assert token_info["liquidity_usd"] == 12345.0
+
+
+def test_unknown_token_is_not_found(dexscreener):
+    known, unknown = run_lookups(dexscreener, [SOLANA_CAS[0], "unknown111pump"])
+
+    assert len(StubDexScreener.requests_seen) == 1
+    assert known["found"] is True
+    assert unknown["found"] is False and unknown["pair_address"] is None
+
+
+def test_api_error_resolves_every_waiter_with_none(dexscreener):
+    StubDexScreener.fail = True
+
+    assert run_lookups(dexscreener, SOLANA_CAS[:3]) == [None, None, None]
+    assert not dexscreener["dexscreener_batch_pending"]
+    assert not dexscreener["dexscreener_batch_tasks"]
@@ -0,0 +1,78 @@
+"""Digest mode: grouping a burst and not losing open groups on shutdown."""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+CA = "So11111111111111111111111111111111111111112"
+
+
+@pytest.fixture
+def digest(main_loader):
+    sent = []
+    latencies = []
+
+    def queue_telegram_message(text, images=None, tweet_url=None, reply_markup=None, priority=0):
+        sent.append(("alert", text))
+        future = asyncio.get_running_loop().create_future()
+        future.set_result(SimpleNamespace(text=text))
+        return future
+
+    def submit_telegram_job(deliver, priority):
+        return asyncio.ensure_future(deliver())
+
+    async def deliver_telegram_message(text, images=None, tweet_url=None, reply_markup=None):
+        sent.append(("digest", text))
+        return SimpleNamespace(text=text)
+
+    namespace = main_loader(
+        sections=("Digest Mode",), names=("compose_alert_text",),
+        scan_token_candidates=lambda text: (["$PEPE"], [(CA, "solana")]),
+        enrichment_cache_get=lambda contract, count=True: None,
+        format_token_info=lambda text, token_infos: ("$PEPE", f"📝 {CA}", True, None),
+        queue_telegram_message=queue_telegram_message, submit_telegram_job=submit_telegram_job,
+        _deliver_telegram_message=deliver_telegram_message, record_post_latency=latencies.append,
+        TELEGRAM_PRIORITY_ALERT=0, TELEGRAM_CAPTION_LIMIT=1024,
+    )
+    namespace["sent"], namespace["latencies"] = sent, latencies
+    return namespace
+
+
+def post(handle, number):
+    return {"author_handle": handle, "tweet_url": f"https://x.com/{handle}/status/{number}", "tweet_content": f"{CA} go",
+            "text": f"alert {number}", "images": [], "reply_markup": None, "reasons": ["CA"], "trace": {}}
+
+
+def test_burst_after_the_first_post_becomes_one_digest(digest):
+    digest["digest_window_seconds"] = 0.05
+
+    async def main():
+        assert digest["add_to_digest"](CA, post("@a", 0)) is False # Opens the group, sent normally
+        assert all(digest["add_to_digest"](CA, post(handle, number)) for number, handle in enumerate(["@a", "@b", "@a"], 1))
+        await asyncio.sleep(0.2)
+
+    asyncio.run(main())
+
+    assert len(digest["sent"]) == 1
+    kind, text = digest["sent"][0]
+    assert kind == "digest" and "3 more posts" in text and "@a ×2, @b" in text
+    assert len(digest["latencies"]) == 3 and all("sent" in trace for trace in digest["latencies"])
+    assert not digest["digest_groups"] and not digest["digest_flush_tasks"]
+
+
+def test_shutdown_flushes_open_groups(digest):
+    digest["digest_window_seconds"] = 600
+
+    async def main():
+        digest["add_to_digest"](CA, post("@a", 0))
+        digest["add_to_digest"](CA, post("@b", 1))
+        digest["add_to_digest"]("$WIF", post("@c", 2))
+        digest["add_to_digest"]("$WIF", post("@d", 3))
+        digest["add_to_digest"]("$WIF", post("@e", 4))
+        await digest["flush_all_digest_groups"](timeout=5)
+
+    asyncio.run(main())
+
+    assert sorted(kind for kind, _ in digest["sent"]) == ["alert", "digest"] # One post alone goes out as its alert
+    assert len(digest["latencies"]) == 3
+    assert not digest["digest_groups"]
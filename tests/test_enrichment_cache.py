@@ -0,0 +1,34 @@
+"""Enrichment cache: each post lookup is counted once in the /cachestats numbers."""
+import time
+
+import pytest
+
+FOUND = {"found": True, "pair_address": "PAIR"}
+
+
+@pytest.fixture
+def cache(main_loader, tmp_path):
+    return main_loader(sections=("Enrichment Cache",), ENRICHMENT_CACHE_FILE=str(tmp_path / "enrichment_cache.json"),
+                       start_photo_hash_prefetch=lambda url: None)
+
+
+def test_hits_misses_and_expiry_are_counted(cache):
+    cache["enrichment_cache_put"]("A", FOUND)
+    cache["enrichment_cache_put"]("B", {"found": False})
+    cache["enrichment_cache"]["C"] = {"info": FOUND, "expires": time.time() - 1}
+
+    assert cache["enrichment_cache_get"]("A") == FOUND
+    assert cache["enrichment_cache_get"]("B") == {"found": False}
+    assert cache["enrichment_cache_get"]("C") is None
+    assert cache["enrichment_cache_get"]("D") is None
+
+    stats = cache["enrichment_cache_stats"]
+    assert (stats["hits"], stats["negative_hits"], stats["misses"], stats["expired"]) == (1, 1, 2, 1)
+
+
+def test_uncounted_reads_leave_the_stats_alone(cache):
+    cache["enrichment_cache_put"]("A", FOUND)
+
+    assert cache["enrichment_cache_get"]("A", count=False) == FOUND
+    assert cache["enrichment_cache_get"]("Z", count=False) is None
+    assert all(value == 0 for value in cache["enrichment_cache_stats"].values())
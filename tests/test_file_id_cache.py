@@ -0,0 +1,106 @@
+"""Telegram file_id cache: URL sends on a miss, file_id on repeats, background content hashing."""
+import asyncio
+import hashlib
+from types import SimpleNamespace
+
+import pytest
+
+
+class BadRequest(Exception):
+    pass
+
+
+class Response:
+    def __init__(self, content):
+        self.content = content
+
+    def raise_for_status(self):
+        pass
+
+
+@pytest.fixture
+def file_ids(main_loader, tmp_path):
+    downloads = []
+    photos_sent = []
+
+    async def http_get(url, timeout=None):
+        downloads.append(url)
+        return Response(b"same token image" if "dexscreener" in url else url.encode())
+
+    async def telegram_api_call(method, chat_id, photo, **kwargs):
+        photos_sent.append(photo)
+        if photo == "expired-file-id":
+            raise BadRequest("Wrong file identifier/http url specified")
+        return SimpleNamespace(photo=[SimpleNamespace(file_id="thumb"), SimpleNamespace(file_id=f"file-{len(photos_sent)}")])
+
+    namespace = main_loader(
+        sections=("Telegram File ID Cache",), http_get=http_get, telegram_api_call=telegram_api_call,
+        telegram=SimpleNamespace(error=SimpleNamespace(BadRequest=BadRequest)),
+        TELEGRAM_FILE_ID_CACHE_FILE=str(tmp_path / "telegram_file_ids.json"),
+    )
+    namespace["downloads"], namespace["photos_sent"] = downloads, photos_sent
+    return namespace
+
+
+def test_miss_sends_url_without_downloading_then_repeats_use_file_id(file_ids):
+    async def main():
+        await file_ids["send_photo_cached"](-1, "https://pbs.twimg.com/media/a.jpg", caption="first")
+        await file_ids["send_photo_cached"](-1, "https://pbs.twimg.com/media/a.jpg", caption="again")
+
+    asyncio.run(main())
+
+    assert file_ids["photos_sent"] == ["https://pbs.twimg.com/media/a.jpg", "file-1"]
+    assert file_ids["downloads"] == []
+
+
+def test_dexscreener_content_hash_links_a_new_url_to_the_known_file_id(file_ids):
+    first_url = "https://dd.dexscreener.com/ds-data/tokens/solana/abc.png?key=1"
+    second_url = "https://dd.dexscreener.com/ds-data/tokens/solana/abc.png?key=2"
+
+    async def main():
+        file_ids["start_photo_hash_prefetch"](first_url)
+        await asyncio.gather(*file_ids["telegram_photo_hash_tasks"])
+        await file_ids["send_photo_cached"](-1, first_url)
+        file_ids["start_photo_hash_prefetch"](second_url)
+        await asyncio.gather(*file_ids["telegram_photo_hash_tasks"])
+        await file_ids["send_photo_cached"](-1, second_url)
+
+    asyncio.run(main())
+
+    assert file_ids["photos_sent"] == [first_url, "file-1"]
+    assert file_ids["telegram_file_id_stats"]["hash_hits"] == 1
+
+
+def test_rejected_file_id_is_dropped_and_url_retried(file_ids):
+    file_ids["telegram_file_ids"]["url:https://x.test/b.png"] = "expired-file-id"
+
+    message = asyncio.run(file_ids["send_photo_cached"](-1, "https://x.test/b.png"))
+
+    assert file_ids["photos_sent"] == ["expired-file-id", "https://x.test/b.png"]
+    assert file_ids["telegram_file_ids"]["url:https://x.test/b.png"] == message.photo[-1].file_id
+
+
+def test_cache_survives_a_restart(file_ids, main_loader):
+    asyncio.run(file_ids["send_photo_cached"](-1, "https://x.test/c.png"))
+    file_ids["save_telegram_file_ids"]()
+
+    reloaded = main_loader(sections=("Telegram File ID Cache",), TELEGRAM_FILE_ID_CACHE_FILE=file_ids["TELEGRAM_FILE_ID_CACHE_FILE"])
+    reloaded["load_telegram_file_ids"]()
+
+    assert reloaded["resolve_telegram_photo"]("https://x.test/c.png")[:1] == ("file-1",)
+
+
+def test_hash_hits_respect_the_lru_bound(file_ids):
+    known_key = "sha256:" + hashlib.sha256(b"same token image").hexdigest()
+    new_key = "url:https://dd.dexscreener.com/ds-data/tokens/solana/new.png"
+    file_ids["TELEGRAM_FILE_ID_CACHE_MAX_ENTRIES"] = 3
+    file_ids["telegram_file_ids"].update({known_key: "file-known", "url:https://x.test/1.png": "file-1", "url:https://x.test/2.png": "file-2"})
+
+    async def main():
+        file_ids["start_photo_hash_prefetch"]("https://dd.dexscreener.com/ds-data/tokens/solana/new.png")
+        await asyncio.gather(*file_ids["telegram_photo_hash_tasks"])
+
+    asyncio.run(main())
+
+    assert list(file_ids["telegram_file_ids"]) == ["url:https://x.test/2.png", known_key, new_key] # Least recently used went out
+    assert file_ids["telegram_file_ids"][new_key] == "file-known"
@@ -0,0 +1,138 @@
+"""Filter rules: expression compiler, evaluator, the toggle-derived default rule and archive replay."""
+import gzip
+import itertools
+import json
+
+import pytest
+
+CA = "So11111111111111111111111111111111111111112"
+
+
+def fake_scan_token_candidates(text):
+    tickers = [word for word in text.split() if word.startswith("$")]
+    contracts = [(word, "solana") for word in text.split() if word == CA]
+    return tickers, contracts
+
+
+@pytest.fixture
+def rules(main_loader):
+    return main_loader(
+        sections=("Keyword Matcher", "Filter Rules", "Post Archive & Replay"),
+        KEYWORDS=["moon", "launch"], keyword_case_fold=True, keyword_whole_words=True,
+        scan_token_candidates=fake_scan_token_candidates,
+        rating_index={"@good": {"avg": 4.5, "count": 10}, "@bad": {"avg": 1.5, "count": 4}},
+        search_keywords_enabled=True, search_ca_enabled=True, search_tickers_enabled=True,
+        min_average_rating_for_posts=3.0, show_posts_from_unrated_enabled=True,
+    )
+
+
+def post(author="@anon", is_repost=False):
+    return {"author_handle": author, "is_repost": is_repost}
+
+
+def matches(rules, expression, text, record=None):
+    return rules["compile_filter_rule"](expression)["predicate"]({"record": record or post(), "text": text})
+
+
+@pytest.mark.parametrize("expression, text, expected", [
+    ("ca OR ticker AND keyword", CA, True), # AND binds tighter than OR
+    ("ca OR ticker AND keyword", "$PEPE", False),
+    ("(ca OR ticker) AND keyword", "$PEPE", False),
+    ("(ca OR ticker) AND keyword", "$PEPE to the moon", True),
+    ("NOT ca AND ticker", "$PEPE", True), # NOT binds tightest: (NOT ca) AND ticker
+    ("NOT ca AND ticker", f"$PEPE {CA}", False),
+    ("NOT (ca AND ticker)", CA, True),
+    ("NOT NOT keyword", "moon", True),
+    ("not keyword or ticker", "$WIF", True), # Operators are case-insensitive
+    ("((keyword))", "launch", True),
+    ("keyword:Gem", "new GEM", True),
+    ("keyword:gem", "gems", False), # keyword_whole_words applies to keyword: atoms too
+])
+def test_precedence_and_parentheses(rules, expression, text, expected):
+    assert matches(rules, expression, text) is expected
+
+
+@pytest.mark.parametrize("expression, author, expected", [
+    ("avg>=4.5", "@good", True), ("avg>4.5", "@good", False), ("avg<2", "@bad", True), ("avg<=1.5", "@bad", True),
+    ("avg=4.5", "@good", True), ("avg>=0", "@anon", False), # Unrated authors never pass an average comparison
+    ("ratings>=10", "@good", True), ("ratings<5", "@bad", True), ("ratings=0", "@anon", True), ("ratings>0", "@anon", False),
+    ("rated", "@bad", True), ("unrated", "@bad", False), ("unrated", "@anon", True),
+    ("author:good,@BAD", "@bad", True), ("author:good", "@anon", False),
+])
+def test_comparisons_and_author_atoms(rules, expression, author, expected):
+    assert matches(rules, expression, "", post(author)) is expected
+
+
+def test_repost_atom(rules):
+    assert matches(rules, "repost", "", post(is_repost=True)) is True
+    assert matches(rules, "NOT repost", "", post(is_repost=True)) is False
+
+
+@pytest.mark.parametrize("expression, message", [
+    ("", "empty rule"), ("ca AND", "rule ends unexpectedly"), ("(ca OR ticker", "missing ')'"),
+    ("ca ticker", "unexpected 'ticker'"), ("ca)", "unexpected ')'"), ("OR ca", "unexpected 'OR'"),
+    ("() ", "unexpected ')'"), ("avg>=high", "unknown condition 'avg>=high'"), ("keyword:", "unknown condition 'keyword:'"),
+    ("ca AND AND ticker", "unexpected 'AND'"),
+])
+def test_parse_errors_are_readable(rules, expression, message):
+    with pytest.raises(ValueError, match=message.replace("(", r"\(").replace(")", r"\)")):
+        rules["compile_filter_rule"](expression)
+
+
+def baseline_is_relevant(rules, record, text):
+    """The relevance check the search toggles and rating filter used before filter rules existed."""
+    tickers, contracts = fake_scan_token_candidates(text)
+    is_relevant = ((rules["search_keywords_enabled"] and bool(rules["find_keyword_matches"](text)))
+                   or (rules["search_ca_enabled"] and bool(contracts))
+                   or (rules["search_tickers_enabled"] and bool(tickers)))
+    if not is_relevant:
+        return False
+    rating = rules["rating_index"].get(record["author_handle"])
+    if rating is None:
+        return rules["show_posts_from_unrated_enabled"]
+    return rating["avg"] >= rules["min_average_rating_for_posts"]
+
+
+def test_default_rule_matches_the_toggle_logic(rules):
+    texts = ["gm", "to the moon", "$PEPE", CA, f"$PEPE {CA} launch"]
+    authors = ["@anon", "@good", "@bad"]
+    checked = 0
+    for keywords, ca, tickers, unrated, min_avg in itertools.product([True, False], [True, False], [True, False], [True, False], [0, 3.0, 5]):
+        rules.update(search_keywords_enabled=keywords, search_ca_enabled=ca, search_tickers_enabled=tickers,
+                     show_posts_from_unrated_enabled=unrated, min_average_rating_for_posts=min_avg)
+        for text, author in itertools.product(texts, authors):
+            matched_rule, _ = rules["evaluate_filter_rules"](post(author), text)
+            assert (matched_rule is not None) == baseline_is_relevant(rules, post(author), text), (rules["effective_filter_rules"](), text, author)
+            checked += 1
+    assert checked == 2 * 2 * 2 * 2 * 3 * len(texts) * len(authors)
+
+
+def test_custom_rules_replace_the_default_and_first_match_wins(rules):
+    rules["filter_rules"][:] = ["author:good AND ticker", "ca"]
+
+    first, facts = rules["evaluate_filter_rules"](post("@good"), f"$PEPE {CA}")
+    second, _ = rules["evaluate_filter_rules"](post("@bad"), f"$PEPE {CA}")
+
+    assert first["index"] == 0 and rules["filter_rule_reasons"](first, facts) == ["Ticker"]
+    assert second["index"] == 1
+    assert rules["evaluate_filter_rules"](post("@bad"), "$PEPE")[0] is None
+    assert rules["filter_eval_counts"] == {"evaluated": 3, "passed": 2}
+
+
+def test_replay_uses_the_program_passed_in(rules, tmp_path):
+    path = tmp_path / "2024-10-16-08.jsonl.gz"
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        for record in [{**post("@good"), "text": "$PEPE", "url": "u1"}, {**post(), "text": "gm", "url": "u2"},
+                       {**post(), "text": CA, "url": "u3", "is_ad": True}]:
+            f.write(json.dumps(record) + "\n")
+    program, automaton = rules["get_filter_program"](), rules["keyword_automaton"]
+
+    def live_program():
+        raise AssertionError("replay must not compile rules in its worker thread")
+    rules["get_filter_program"] = live_program
+
+    summary = rules["replay_post_archive"]([str(path)], program, automaton)
+
+    assert (summary["posts"], summary["ads"], summary["hits"], summary["samples"]) == (3, 1, 1, ["u1"])
+    assert summary["reasons"] == {"Ticker": 1}
+    assert rules["filter_eval_counts"] == {"evaluated": 0, "passed": 0} # Replays don't touch the live stats
@@ -0,0 +1,71 @@
+"""Keyword matcher: one Aho-Corasick pass over the post text (matches come out ordered by end position)."""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+
+@pytest.fixture
+def matcher(main_loader, tmp_path):
+    replies = []
+
+    async def no_op(*args, **kwargs):
+        pass
+
+    async def reply_text(text, **kwargs):
+        replies.append(text)
+
+    namespace = main_loader(
+        sections=("Keyword Matcher",), names=("save_keywords", "add_keyword_command", "remove_keyword_command"),
+        KEYWORDS=["sol"], keyword_case_fold=True, keyword_whole_words=False, KEYWORDS_FILE=str(tmp_path / "keywords.json"),
+        Update=object, ContextTypes=SimpleNamespace(DEFAULT_TYPE=object), ParseMode=SimpleNamespace(MARKDOWN="Markdown"),
+        pause_scraping=no_op, resume_scraping=no_op, keywords_command=no_op,
+    )
+    namespace["update"] = SimpleNamespace(message=SimpleNamespace(reply_text=reply_text))
+    return namespace
+
+
+def matches(matcher, keywords, text, **options):
+    automaton = matcher["build_keyword_automaton"](keywords, options.pop("case_fold", True))
+    return matcher["find_keyword_matches"](text, automaton, **options)
+
+
+def test_overlapping_and_nested_keywords_are_all_found(matcher):
+    text = "ushers said she is here"
+
+    found = matches(matcher, ["he", "she", "his", "hers", "usher"], text, whole_words=False)
+
+    assert found == [("she", 1, 4), ("he", 2, 4), ("usher", 0, 5), ("hers", 2, 6), ("she", 12, 15), ("he", 13, 15), ("he", 19, 21)]
+    assert all(text[start:end] == keyword for keyword, start, end in found)
+
+
+def test_whole_words_skip_keywords_glued_to_letters_digits_or_underscores(matcher):
+    text = "solid SOL, sol2 $sol _sol (sol)"
+
+    found = matches(matcher, ["sol"], text, whole_words=True)
+
+    assert [text[start:end] for _, start, end in found] == ["SOL", "sol", "sol"]
+    assert [start for _, start, _ in found] == [6, 17, 27]
+
+
+def test_casefold_matches_expanded_characters_and_maps_back_to_the_original_text(matcher):
+    text = "Die STRASSE und die Straße"
+
+    found = matches(matcher, ["straße"], text, whole_words=True)
+
+    assert [text[start:end] for _, start, end in found] == ["STRASSE", "Straße"]
+    assert matches(matcher, ["Straße"], text, whole_words=False, case_fold=False) == [("Straße", 20, 26)]
+
+
+def test_add_and_remove_keyword_commands_rebuild_the_automaton(matcher):
+    def run(command, *args):
+        asyncio.run(matcher[command](matcher["update"], SimpleNamespace(args=list(args))))
+
+    assert matcher["find_keyword_matches"]("PEPE and wif") == []
+
+    run("add_keyword_command", "Pepe,", "wif")
+    assert [keyword for keyword, _, _ in matcher["find_keyword_matches"]("PEPE and wif")] == ["pepe", "wif"]
+
+    run("remove_keyword_command", "pepe")
+    assert [keyword for keyword, _, _ in matcher["find_keyword_matches"]("PEPE and wif")] == ["wif"]
+    assert matcher["KEYWORDS"] == ["sol", "wif"]
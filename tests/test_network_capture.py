@@ -0,0 +1,75 @@
+"""Network capture: recorded HomeLatestTimeline responses parsed into post records."""
+import json
+from pathlib import Path
+
+import pytest
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures" / "home_latest_timeline"
+CA = "7GCihgDB8fe6KNjn2MYtkzZcRjQy3t9GHdC8uHYmW2hr"
+
+
+@pytest.fixture
+def capture(main_loader):
+    return main_loader(
+        sections=("Network Capture",),
+        names=("collect_pushed_records", "_normalize_raw_records", "normalize_post_record", "_handle_from_href"),
+        new_post_trace=lambda tweet_id, detected_ms=None: {"detected": detected_ms}, scan_mode="network",
+    )
+
+
+def records(capture, fixture):
+    raw_records = capture["parse_home_timeline_response"]((FIXTURES / fixture).read_text())
+    return [capture["normalize_post_record"](raw) for raw in raw_records]
+
+
+def test_repost_shows_the_original_post_and_names_the_reposter(capture):
+    [record] = records(capture, "repost.json")
+
+    assert record["id"] == "1846000000000000001"
+    assert record["url"] == "https://x.com/alice_sol/status/1846000000000000001"
+    assert record["is_repost"] and record["reposter_handle"] == "@bob_calls" and record["reposter_name"] == "bob"
+    assert record["author_handle"] == "@alice_sol" and record["author_name"] == "Alice"
+    assert record["text"] == f"new launch {CA}"
+    assert record["images"] == ["https://pbs.twimg.com/media/GaAbC1.jpg"] # Video thumbnail skipped
+    assert record["datetime"] == "2024-10-16T08:30:00.000Z"
+
+
+def test_promoted_entry_is_flagged_and_regular_posts_are_kept(capture):
+    regular, ad, limited = records(capture, "promoted.json")
+
+    assert (regular["is_ad"], ad["is_ad"], limited["is_ad"]) == (False, True, False)
+    assert ad["author_handle"] == "@some_brand"
+    assert regular["text"] == "gm & wagmi $WIF https://dexscreener.com/solana/abc"
+    assert regular["author_handle"] == "@alice_sol"
+    assert limited["id"] == "1846000000000000200" and limited["author_name"] == "Bob" # Legacy user layout
+
+
+def test_note_tweet_uses_the_full_long_form_text(capture):
+    [record] = records(capture, "note_tweet.json")
+
+    assert record["text"].endswith(f"CA: {CA}")
+    assert "…" not in record["text"] and not record["show_more"]
+
+
+def test_conversation_module_yields_every_post(capture):
+    posts = records(capture, "conversation.json")
+
+    assert [post["id"] for post in posts] == ["1846000000000000401", "1846000000000000402", "1846000000000000400"]
+    assert posts[1]["text"] == f"this one {CA}" # Reply mention cut by display_text_range
+    assert not any(post["is_repost"] or post["is_ad"] for post in posts)
+
+
+def test_captured_responses_become_records(capture):
+    capture["capture_timeline_responses"] = lambda: [json.loads((FIXTURES / name).read_text())
+                                                     for name in ("repost.json", "note_tweet.json")]
+
+    pushed = capture["collect_pushed_records"]()
+
+    assert [record["id"] for record in pushed] == ["1846000000000000001", "1846000000000000301"]
+
+
+@pytest.mark.parametrize("payloads", [[], [{"data": {}}], None])
+def test_empty_or_missing_capture_falls_back_to_the_dom_scan(capture, payloads):
+    capture["capture_timeline_responses"] = lambda: payloads
+
+    assert capture["collect_pushed_records"]() is None
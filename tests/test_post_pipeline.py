@@ -0,0 +1,62 @@
+"""Post pipeline shutdown: queued posts are handled or unmarked, never silently lost."""
+import asyncio
+from collections import deque
+
+import pytest
+
+
+@pytest.fixture
+def pipeline(main_loader, tmp_path):
+    handled = []
+
+    async def handle_post_record(record):
+        if record.get("slow"):
+            await asyncio.sleep(60)
+        handled.append(record["id"])
+
+    namespace = main_loader(
+        sections=("Post Pipeline",), names=("_remember_processed_id", "mark_tweet_processed", "unmark_tweet_processed"),
+        handle_post_record=handle_post_record, archive_post_record=lambda record: None,
+        prefilter_post_record=lambda record: True, posts_queued_total=0,
+        processed_tweets=deque(), processed_tweet_ids=set(), processed_tweets_unsaved=0,
+        PROCESSED_TWEETS_MAXLEN=100, PROCESSED_TWEETS_COMPACT_EVERY=1000,
+        processed_tweets_log=None, PROCESSED_TWEETS_LOG_FILE=str(tmp_path / "processed_tweets.log"), POST_PIPELINE_WORKERS=1,
+    )
+    namespace["handled"] = handled
+    return namespace
+
+
+async def scan(pipeline, records):
+    """What the scanner does: queue, then mark processed right away."""
+    for record in records:
+        await pipeline["submit_post_record"](record)
+        pipeline["mark_tweet_processed"](record["id"])
+
+
+def test_drain_handles_queued_posts_before_exit(pipeline):
+    async def main():
+        pipeline["post_pipeline_queue"] = asyncio.Queue()
+        pipeline["start_post_pipeline_workers"]()
+        await scan(pipeline, [{"id": str(number)} for number in range(5)])
+        await pipeline["drain_post_pipeline"](timeout=5)
+
+    asyncio.run(main())
+
+    assert pipeline["handled"] == ["0", "1", "2", "3", "4"]
+    assert pipeline["processed_tweet_ids"] == {"0", "1", "2", "3", "4"}
+    assert all(task.done() for task in pipeline["post_pipeline_tasks"])
+
+
+def test_posts_not_handled_in_time_are_unmarked(pipeline):
+    async def main():
+        pipeline["post_pipeline_queue"] = asyncio.Queue()
+        pipeline["start_post_pipeline_workers"]()
+        await scan(pipeline, [{"id": "1"}, {"id": "2", "slow": True}, {"id": "3"}])
+        await pipeline["drain_post_pipeline"](timeout=0.1)
+
+    asyncio.run(main())
+
+    assert pipeline["handled"] == ["1"]
+    assert pipeline["processed_tweet_ids"] == {"1"} # 2 was in flight, 3 still queued
+    assert list(pipeline["processed_tweets"]) == ["1"]
+    assert pipeline["processed_tweets_unsaved"] > 0 and not pipeline["post_pipeline_in_flight"]
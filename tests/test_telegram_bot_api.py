@@ -0,0 +1,112 @@
+"""Telegram delivery against a local fake Bot API server (HTTP 429 / retry_after, fallbacks)."""
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+import pytest
+
+telegram = pytest.importorskip("telegram")
+from telegram.constants import ParseMode
+
+TOKEN = "123456:TEST"
+CHANNEL = -100123
+
+
+class FakeBotApi(BaseHTTPRequestHandler):
+    """Answers /bot<token>/<method>; canned error responses are used first, in order."""
+    calls = [] # (seconds since start, method, params)
+    errors = []
+    started = 0.0
+
+    def do_POST(self):
+        method = self.path.rsplit("/", 1)[1]
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0)).decode()
+        if self.headers.get("Content-Type", "").startswith("application/json"):
+            params = json.loads(body or "{}")
+        else:
+            params = {key: values[0] for key, values in parse_qs(body).items()}
+        if method == "getMe":
+            return self.reply(200, {"ok": True, "result": {"id": 123456, "is_bot": True, "first_name": "Fake", "username": "fake_bot"}})
+        type(self).calls.append((time.monotonic() - type(self).started, method, params))
+        if type(self).errors:
+            status, description, retry_after = type(self).errors.pop(0)
+            response = {"ok": False, "error_code": status, "description": description}
+            if retry_after is not None:
+                response["parameters"] = {"retry_after": retry_after}
+            return self.reply(status, response)
+        self.reply(200, {"ok": True, "result": {"message_id": len(type(self).calls), "date": int(time.time()),
+                                                "chat": {"id": CHANNEL, "type": "channel"}, "text": params.get("text", "")}})
+
+    def reply(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def bot_api(main_loader):
+    FakeBotApi.calls, FakeBotApi.errors, FakeBotApi.started = [], [], time.monotonic()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeBotApi)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    bot = telegram.Bot(TOKEN, base_url=f"http://127.0.0.1:{server.server_port}/bot")
+    namespace = main_loader(
+        sections=("Telegram Delivery",), names=("_send_long_message",),
+        telegram=telegram, CHANNEL_ID=CHANNEL,
+        ParseMode=ParseMode, last_tweet_urls={},
+    )
+    namespace["application"] = type("Application", (), {"bot": bot})()
+    yield namespace
+    server.shutdown()
+
+
+def send(bot_api, text):
+    """One channel message through the queue, the way _deliver_telegram_message sends text."""
+    async def main():
+        try:
+            await bot_api["application"].bot.initialize()
+            deliver = lambda: bot_api["_send_long_message"](bot_api["application"], CHANNEL, text, None, None)
+            return await bot_api["submit_telegram_job"](deliver, bot_api["TELEGRAM_PRIORITY_ALERT"])
+        finally:
+            await bot_api["stop_telegram_delivery"]()
+            await bot_api["application"].bot.shutdown()
+    return asyncio.run(main())
+
+
+def test_http_429_pauses_the_chat_for_retry_after_then_retries(bot_api):
+    FakeBotApi.errors.append((429, "Too Many Requests: retry after 1", 1))
+
+    message = send(bot_api, "<b>alert</b>")
+
+    assert message.text == "<b>alert</b>" and message.message_id == 2
+    (first_at, _, _), (retried_at, _, params) = FakeBotApi.calls
+    assert retried_at - first_at >= 0.95
+    assert params["parse_mode"] == "HTML"
+    assert bot_api["telegram_delivery_stats"]["retry_after"] == 1
+
+
+def test_flood_control_failure_does_not_fall_back_into_the_same_chat(bot_api):
+    bot_api["TELEGRAM_MAX_RETRY_AFTER"] = 1
+    FakeBotApi.errors.extend([(429, "Too Many Requests: retry after 1", 1)] * 2)
+
+    assert send(bot_api, "<b>alert</b>") is None
+    assert [method for _, method, _ in FakeBotApi.calls] == ["sendMessage", "sendMessage"] # No plain-text or error-note fallback
+
+
+def test_other_errors_still_fall_back_to_plain_text(bot_api):
+    FakeBotApi.errors.append((400, "Bad Request: can't parse entities: unsupported start tag", None))
+
+    message = send(bot_api, "<b>alert &amp; more")
+
+    assert message is not None
+    first, fallback = (params for _, _, params in FakeBotApi.calls)
+    assert first["parse_mode"] == "HTML" and "parse_mode" not in fallback
+    assert fallback["text"] == "<b>alert & more"
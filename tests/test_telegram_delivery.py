@@ -0,0 +1,137 @@
+"""Telegram delivery queue: priorities, token buckets and RetryAfter, against a stubbed application.bot."""
+import asyncio
+import time
+from datetime import timedelta
+from types import SimpleNamespace
+
+import pytest
+
+CHANNEL = -100123
+
+
+class RetryAfter(Exception):
+    def __init__(self, retry_after):
+        super().__init__(f"Flood control exceeded. Retry in {retry_after} seconds")
+        self.retry_after = retry_after
+
+
+class BadRequest(Exception):
+    pass
+
+
+class StubBot:
+    """Records (seconds since start, chat_id, text); raises the queued errors first."""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.sent = []
+        self.errors = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        if self.errors:
+            raise self.errors.pop(0)
+        self.sent.append((time.monotonic() - self.started, chat_id, text))
+        return SimpleNamespace(chat_id=chat_id, text=text)
+
+
+@pytest.fixture
+def delivery(main_loader):
+    bot = StubBot()
+    telegram = SimpleNamespace(error=SimpleNamespace(RetryAfter=RetryAfter, BadRequest=BadRequest))
+    namespace = main_loader(sections=("Telegram Delivery",), telegram=telegram,
+                            application=SimpleNamespace(bot=bot), CHANNEL_ID=CHANNEL)
+
+    async def deliver(text, images=None, tweet_url=None, reply_markup=None):
+        return await namespace["telegram_api_call"]("send_message", chat_id=CHANNEL, text=text)
+
+    namespace["_deliver_telegram_message"] = deliver
+    namespace["bot"] = bot
+    return namespace
+
+
+def run(delivery, coroutine_function):
+    async def main():
+        try:
+            return await coroutine_function()
+        finally:
+            await delivery["stop_telegram_delivery"]()
+    return asyncio.run(main())
+
+
+def test_alerts_overtake_queued_status_messages_and_edits(delivery):
+    delivery["TELEGRAM_DELIVERY_WORKERS"] = 1
+
+    async def main():
+        queued = [
+            delivery["queue_telegram_message"]("status 1"),
+            delivery["submit_telegram_job"](lambda: delivery["_deliver_telegram_message"]("edit"), delivery["TELEGRAM_PRIORITY_EDIT"]),
+            delivery["queue_telegram_message"]("status 2"),
+            delivery["queue_telegram_message"]("alert 1", priority=delivery["TELEGRAM_PRIORITY_ALERT"]),
+            delivery["queue_telegram_message"]("alert 2", priority=delivery["TELEGRAM_PRIORITY_ALERT"]),
+        ]
+        return await asyncio.gather(*queued)
+
+    results = run(delivery, main)
+
+    assert [text for _, _, text in delivery["bot"].sent] == ["alert 1", "alert 2", "status 1", "status 2", "edit"]
+    assert [message.text for message in results] == ["status 1", "edit", "status 2", "alert 1", "alert 2"]
+
+
+def test_chat_bucket_allows_a_burst_then_paces_messages(delivery):
+    delivery["TELEGRAM_CHAT_RATE"] = 20 # per second, so the test stays fast
+    delivery["TELEGRAM_CHAT_BURST"] = 3
+
+    run(delivery, lambda: asyncio.gather(*(delivery["send_telegram_message"](f"m{index}") for index in range(7))))
+
+    times = [sent_at for sent_at, _, _ in delivery["bot"].sent]
+    assert len(times) == 7
+    assert times[2] < 0.03 # The burst goes out at once
+    assert times[-1] >= (7 - 3) / 20 - 0.01 # The rest at the chat rate
+    assert delivery["telegram_delivery_stats"]["throttled_seconds"] > 0
+
+
+def test_global_bucket_limits_across_chats(delivery):
+    delivery["TELEGRAM_GLOBAL_RATE"] = 20
+    delivery["TELEGRAM_GLOBAL_BURST"] = 2
+
+    async def main():
+        return await asyncio.gather(*(delivery["telegram_api_call"]("send_message", chat_id=chat_id, text=str(chat_id))
+                                      for chat_id in range(6)))
+
+    run(delivery, main)
+
+    assert {chat_id for _, chat_id, _ in delivery["bot"].sent} == set(range(6))
+    assert delivery["bot"].sent[-1][0] >= (6 - 2) / 20 - 0.01
+
+
+@pytest.mark.parametrize("retry_after", [0.2, timedelta(seconds=0.2)])
+def test_retry_after_pauses_the_chat_and_retries(delivery, retry_after):
+    delivery["bot"].errors.append(RetryAfter(retry_after))
+
+    message = run(delivery, lambda: delivery["send_telegram_message"]("after flood"))
+
+    assert message.text == "after flood"
+    assert delivery["bot"].sent[0][0] >= 0.19
+    assert delivery["telegram_delivery_stats"]["retry_after"] == 1
+    assert delivery["telegram_delivery_stats"]["calls"] == 2
+
+
+def test_gives_up_after_max_retry_after_and_resolves_none(delivery):
+    delivery["TELEGRAM_MAX_RETRY_AFTER"] = 1
+    delivery["bot"].errors.extend([RetryAfter(0.01), RetryAfter(0.01)])
+
+    assert run(delivery, lambda: delivery["send_telegram_message"]("dropped")) is None
+    assert delivery["bot"].sent == []
+
+
+def test_stop_sends_queued_messages_first(delivery):
+    async def main():
+        for index in range(3):
+            delivery["queue_telegram_message"](f"queued {index}")
+        await delivery["stop_telegram_delivery"](timeout=5)
+        return delivery["telegram_delivery_tasks"]
+
+    tasks = asyncio.run(main())
+
+    assert len(delivery["bot"].sent) == 3
+    assert all(task.cancelled() or task.done() for task in tasks)